@@ -0,0 +1,300 @@
+#! /usr/bin/env python
+"""
+Benchmark suite for the Python PerfRepo model and REST layers.
+
+Measures parse and serialize costs of the model objects at realistic
+scales, search response parsing throughput and end-to-end create/search
+throughput against the in-process fake PerfRepo server. Results can be
+saved as a baseline and later runs compared against it.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+from __future__ import print_function
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import os
+import re
+import sys
+import gc
+import json
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                ".."))
+
+import perfrepo
+from perfrepo.Common import timer
+from perfrepo.FakeServer import PerfRepoFakeServer
+from perfrepo.SearchParser import parse_search_response
+from perfrepo.Aggregation import aggregate
+from xml.etree import ElementTree
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+BENCHMARKS = []
+
+def benchmark(name, scales, quick_scales=None):
+    def register(setup):
+        BENCHMARKS.append((name, scales, quick_scales or scales[:1], setup))
+        return setup
+    return register
+
+def make_execution(num_values, num_params=2, exec_id=None):
+    texec = perfrepo.PerfRepoTestExecution()
+    texec.set_id(exec_id)
+    texec.set_name("bench execution")
+    texec.set_testUid("bench_test")
+    texec.set_started("2016-01-01T00:00:00")
+    texec.set_comment("benchmark")
+    texec.add_tag("bench")
+    texec.add_tag("kernel-4.2")
+    texec.add_parameter("hostname", "host.example.com")
+    for i in range(num_values):
+        value = perfrepo.PerfRepoValue()
+        value.set_metricName("metric%d" % (i % 10))
+        value.set_comparator("HB")
+        value.set_result(float(i))
+        for p in range(num_params):
+            value.add_parameter("param%d" % p, str(i))
+        texec.add_value(value)
+    return texec
+
+def make_test(num_metrics):
+    test = perfrepo.PerfRepoTest()
+    test.set_id("1")
+    test.set_name("bench test")
+    test.set_uid("bench_test")
+    test.set_groupid("bench")
+    test.set_description("benchmark test")
+    for i in range(num_metrics):
+        metric = perfrepo.PerfRepoMetric()
+        metric.set_id(str(i))
+        metric.set_name("metric%d" % i)
+        metric.set_comparator("HB")
+        metric.set_description("metric %d" % i)
+        test.add_metric(metric)
+    return test
+
+def make_report(num_properties):
+    report = perfrepo.PerfRepoReport()
+    report.set_id("1")
+    report.set_name("bench report")
+    report.set_type("Metric")
+    report.set_user("bench")
+    chart_num = 0
+    #every chart has 2 properties of its own and 3 per series
+    while (chart_num + 1) * 5 <= max(num_properties, 5):
+        report.add_chart("chart %d" % chart_num, "1")
+        report.add_series(None, "series", "1", ["bench", "tag"])
+        chart_num += 1
+    return report
+
+@benchmark("texec_serialize", [1, 100, 10000, 100000], [1, 100, 10000])
+def bench_texec_serialize(scale):
+    texec = make_execution(scale)
+    return texec.to_xml_string
+
+@benchmark("texec_array_serialize", [100, 10000, 100000], [100, 10000])
+def bench_texec_array_serialize(scale):
+    #parsing builds value arrays of metrics with many values
+    data = make_execution(scale, exec_id="1").to_xml_string()
+    texec = perfrepo.PerfRepoTestExecution(data, value_arrays=True)
+    return texec.to_xml_string
+
+@benchmark("texec_parse", [1, 100, 10000, 100000], [1, 100, 10000])
+def bench_texec_parse(scale):
+    data = make_execution(scale, exec_id="1").to_xml_string()
+    return lambda: perfrepo.PerfRepoTestExecution(data)
+
+@benchmark("test_serialize", [10, 100, 1000])
+def bench_test_serialize(scale):
+    return make_test(scale).to_xml_string
+
+@benchmark("test_parse", [10, 100, 1000])
+def bench_test_parse(scale):
+    data = make_test(scale).to_xml_string()
+    return lambda: perfrepo.PerfRepoTest(data)
+
+@benchmark("report_serialize", [10, 1000, 10000], [10, 1000])
+def bench_report_serialize(scale):
+    return make_report(scale).to_xml_string
+
+@benchmark("report_parse", [10, 1000, 10000], [10, 1000])
+def bench_report_parse(scale):
+    data = make_report(scale).to_xml_string()
+    return lambda: perfrepo.PerfRepoReport(data)
+
+@benchmark("search_parse", [100, 1000, 10000], [100, 1000])
+def bench_search_parse(scale):
+    root = ElementTree.Element("testExecutions")
+    for i in range(scale):
+        root.append(make_execution(10, exec_id=str(i)).to_xml())
+    data = ElementTree.tostring(root)
+    api = perfrepo.PerfRepoRESTAPI("http://localhost/", "bench", "bench")
+    return lambda: api._parse_texec_search(data)
+
+@benchmark("search_parse_pool", [1000, 10000, 100000], [1000])
+def bench_search_parse_pool(scale):
+    root = ElementTree.Element("testExecutions")
+    for i in range(scale):
+        root.append(make_execution(10, exec_id=str(i)).to_xml())
+    data = ElementTree.tostring(root)
+    return lambda: parse_search_response(data)
+
+@benchmark("aggregate", [100, 1000, 10000], [100, 1000])
+def bench_aggregate(scale):
+    texecs = [make_execution(10) for i in range(scale)]
+    return lambda: aggregate(texecs, ["tags", "param:hostname"])
+
+class _Server(object):
+    server = None
+
+    @classmethod
+    def api(cls):
+        '''Returns a client of the fake server with a fresh bench test'''
+        if cls.server is None:
+            cls.server = PerfRepoFakeServer()
+            cls.server.start()
+        cls.server.reset()
+        api = perfrepo.PerfRepoRESTAPI(cls.server.get_url(), "b", "b")
+        test = make_test(10)
+        test.set_id(None)
+        for metric in test.get_metrics():
+            metric.set_id(None)
+        api.test_create(test, log=False)
+        return api
+
+    @classmethod
+    def stop(cls):
+        if cls.server is not None:
+            cls.server.stop()
+            cls.server = None
+
+@benchmark("e2e_create", [10, 100])
+def bench_e2e_create(scale):
+    api = _Server.api()
+    texec = make_execution(scale)
+
+    def run():
+        texec.set_id(None)
+        api.testExecution_create(texec, log=False)
+    return run
+
+@benchmark("e2e_search", [10, 100, 1000], [10, 100])
+def bench_e2e_search(scale):
+    api = _Server.api()
+    for i in range(scale):
+        api.testExecution_create(make_execution(10), log=False)
+    criteria = perfrepo.PerfRepoTestExecutionSearch()
+    criteria.set_testUid("bench_test")
+    return lambda: api.testExecution_search(criteria, log=False)
+
+def measure(run, min_time, max_repeat):
+    times = []
+    total = 0.0
+    while total < min_time and len(times) < max_repeat:
+        gc.collect()
+        start = timer()
+        run()
+        elapsed = timer() - start
+        times.append(elapsed)
+        total += elapsed
+    times.sort()
+
+    peak = None
+    if tracemalloc is not None:
+        gc.collect()
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {"min": times[0],
+            "median": times[len(times) // 2],
+            "repeat": len(times),
+            "peak_memory": peak}
+
+def format_size(size):
+    if size is None:
+        return "n/a"
+    for unit in ["B", "KiB", "MiB"]:
+        if size < 1024:
+            return "%.1f%s" % (size, unit)
+        size /= 1024.0
+    return "%.1fGiB" % size
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, result in sorted(results.items()):
+        if key not in baseline:
+            continue
+        old = baseline[key]["median"]
+        ratio = result["median"] / old if old else float("inf")
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  REGRESSION"
+            regressions.append(key)
+        elif ratio < 1 - threshold:
+            mark = "  improvement"
+        print("%-32s %10.3fms -> %10.3fms  x%.2f%s" % (key, old * 1000,
+                                                       result["median"] * 1000,
+                                                       ratio, mark))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Python PerfRepo benchmarks")
+    parser.add_argument("-k", "--filter", default=None,
+                        help="run only benchmarks matching this regex")
+    parser.add_argument("--quick", action="store_true",
+                        help="run only the smaller scales")
+    parser.add_argument("--min-time", type=float, default=0.5,
+                        help="minimal measured time per case in seconds")
+    parser.add_argument("--max-repeat", type=int, default=50)
+    parser.add_argument("--save", metavar="FILE",
+                        help="save results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare results against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown reported as regression")
+    args = parser.parse_args()
+
+    results = {}
+    try:
+        for name, scales, quick_scales, setup in BENCHMARKS:
+            if args.filter and not re.search(args.filter, name):
+                continue
+            for scale in (quick_scales if args.quick else scales):
+                run = setup(scale)
+                result = measure(run, args.min_time, args.max_repeat)
+                key = "%s[%d]" % (name, scale)
+                results[key] = result
+                print("%-32s %10.3fms/op (min %.3fms, n=%d) peak %s" %\
+                      (key, result["median"] * 1000, result["min"] * 1000,
+                       result["repeat"], format_size(result["peak_memory"])))
+                sys.stdout.flush()
+    finally:
+        _Server.stop()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("")
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#! /usr/bin/env python
+"""
+Import time regression check for perfrepo-cli.
+
+Runs perfrepo-cli with -X importtime for commands that never talk to a
+PerfRepo server (help output, syntax errors) and fails if any of them
+imports a module that only the network path needs.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+from __future__ import print_function
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+CLI = os.path.join(ROOT, "perfrepo-cli")
+
+SCENARIOS = [["help"],
+             ["test", "help"],
+             ["testexec", "help"],
+             ["report", "help"],
+             ["testexec", "bogus"]]
+
+FORBIDDEN = ["requests", "urllib3", "xml.dom.minidom",
+             "perfrepo.PerfRepoRESTAPI"]
+
+def import_times(argv):
+    '''Returns {module: cumulative us} of the top level imports of a run'''
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    proc = subprocess.Popen([sys.executable, "-X", "importtime", CLI] + argv,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            env=env, cwd=ROOT)
+    _, err = proc.communicate()
+
+    modules = {}
+    total = 0
+    for line in err.decode("utf-8", "replace").splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        cumulative = int(fields[1])
+        modules[name.strip()] = cumulative
+        if not name.startswith("  "):
+            total += cumulative
+    return modules, total
+
+def main():
+    parser = argparse.ArgumentParser(description="perfrepo-cli import time "
+                                                 "check")
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="fail if any scenario imports for longer")
+    args = parser.parse_args()
+
+    if sys.version_info < (3, 7):
+        print("-X importtime requires Python 3.7+", file=sys.stderr)
+        return 0
+
+    failed = False
+    for argv in SCENARIOS:
+        modules, total = import_times(argv)
+        forbidden = [name for name in FORBIDDEN if name in modules]
+        status = "ok"
+        if forbidden:
+            status = "FAIL imports %s" % ", ".join(forbidden)
+            failed = True
+        elif args.max_ms is not None and total / 1000.0 > args.max_ms:
+            status = "FAIL over %.1fms" % args.max_ms
+            failed = True
+        print("%-24s %8.1fms  %s" % (" ".join(argv), total / 1000.0, status))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
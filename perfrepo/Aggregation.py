@@ -0,0 +1,239 @@
+"""
+This module contains aggregation of metric results across TestExecutions.
+
+Results are grouped by metric and any combination of keys:
+
+    tags            the sorted tuple of all execution tags
+    tag:NAME        whether the execution has the tag NAME
+    param:NAME      the value of the execution parameter NAME
+    vparam:NAME     the value of the PerfRepoValue parameter NAME
+
+The executions are flattened into result columns once, the statistics of
+all groups are then computed on whole arrays with numpy when it's
+installed, by a pure Python implementation of the same computation
+otherwise.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import math
+from array import array
+from perfrepo.Common import PerfRepoException
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_PERCENTILES = [50, 90, 99]
+
+STATS = ["count", "mean", "stddev", "min", "max"]
+
+def _parse_key(key):
+    if key == "tags":
+        return "tags", None
+    kind, sep, name = key.partition(":")
+    if not sep or not name or kind not in ["tag", "param", "vparam"]:
+        raise PerfRepoException("Invalid group key '%s'" % key)
+    return kind, name
+
+def _execution_key(texec, keys):
+    params = dict(texec.get_parameters())
+    tags = texec.get_tags()
+    ret = []
+    for kind, name in keys:
+        if kind == "tags":
+            ret.append(tuple(sorted(tags)))
+        elif kind == "tag":
+            ret.append(name in tags)
+        elif kind == "param":
+            ret.append(params.get(name))
+        else:
+            ret.append(None)
+    return ret
+
+def flatten(texecs, by=(), metrics=None):
+    '''Returns (group keys, group codes, results) of all metric results
+
+    Group keys are (metric, key values...) tuples in the order they were
+    first seen, codes index them for every result.'''
+    keys = [_parse_key(key) for key in by]
+    value_keys = [(num, name) for num, (kind, name) in enumerate(keys)
+                  if kind == "vparam"]
+    if metrics is not None:
+        metrics = set(metrics)
+    groups = {}
+    group_keys = []
+    #compact columns, numpy reads them through the buffer protocol
+    codes = array("l")
+    results = array("d")
+
+    def group_code(key):
+        code = groups.get(key)
+        if code is None:
+            code = groups[key] = len(group_keys)
+            group_keys.append(key)
+        return code
+
+    for texec in texecs:
+        #execution keys are the same for all of its values
+        exec_key = _execution_key(texec, keys)
+        for value in texec.get_values(expand=False):
+            metric = value.get_metricName()
+            if metrics is not None and metric not in metrics:
+                continue
+            if value_keys:
+                params = dict(value.get_parameters())
+                for num, name in value_keys:
+                    exec_key[num] = params.get(name)
+            codes.append(group_code((metric,) + tuple(exec_key)))
+            results.append(float(value.get_result()))
+
+        for value_array in texec.get_value_arrays():
+            metric = value_array.get_metricName()
+            if metrics is not None and metric not in metrics:
+                continue
+            results.extend(value_array.get_results())
+            if not value_keys:
+                code = group_code((metric,) + tuple(exec_key))
+                codes.extend([code] * len(value_array))
+                continue
+            columns = [value_array.get_parameter_column(name)
+                       for num, name in value_keys]
+            for params in zip(*columns):
+                for (num, name), param in zip(value_keys, params):
+                    exec_key[num] = param
+                codes.append(group_code((metric,) + tuple(exec_key)))
+    return group_keys, codes, results
+
+def _percentile_fields(percentiles):
+    return ["p%s" % ("%g" % q).replace(".", "_") for q in percentiles]
+
+def _numpy_stats(num_groups, codes, results, percentiles):
+    codes = numpy.asarray(codes).astype(numpy.intp)
+    results = numpy.asarray(results, dtype=numpy.float64)
+    counts = numpy.bincount(codes, minlength=num_groups)
+    means = numpy.bincount(codes, results, num_groups) / counts
+    squares = numpy.bincount(codes, (results - means[codes]) ** 2,
+                             num_groups)
+    stddevs = numpy.sqrt(squares / numpy.maximum(counts - 1, 1))
+
+    #results sorted by group and value, every group a contiguous run, a
+    #stable sort of the value order by group is faster than lexsort
+    order = numpy.argsort(results)
+    order = order[numpy.argsort(codes[order], kind="mergesort")]
+    ordered = results[order]
+    starts = numpy.concatenate(([0], numpy.cumsum(counts)[:-1]))
+    stats = {"count": counts,
+             "mean": means,
+             "stddev": stddevs,
+             "min": ordered[starts],
+             "max": ordered[starts + counts - 1]}
+    for q, field in zip(percentiles, _percentile_fields(percentiles)):
+        pos = starts + (counts - 1) * (q / 100.0)
+        low = numpy.floor(pos).astype(numpy.intp)
+        high = numpy.ceil(pos).astype(numpy.intp)
+        stats[field] = ordered[low] + \
+                       (ordered[high] - ordered[low]) * (pos - low)
+    return stats
+
+def _python_stats(num_groups, codes, results, percentiles):
+    grouped = [[] for i in range(num_groups)]
+    for code, result in zip(codes, results):
+        grouped[code].append(result)
+
+    stats = dict((field, []) for field in
+                 STATS + _percentile_fields(percentiles))
+    for group in grouped:
+        group.sort()
+        count = len(group)
+        mean = math.fsum(group) / count
+        squares = math.fsum((result - mean) ** 2 for result in group)
+        stats["count"].append(count)
+        stats["mean"].append(mean)
+        stats["stddev"].append(math.sqrt(squares / max(count - 1, 1)))
+        stats["min"].append(group[0])
+        stats["max"].append(group[-1])
+        for q, field in zip(percentiles, _percentile_fields(percentiles)):
+            pos = (count - 1) * (q / 100.0)
+            low = int(math.floor(pos))
+            high = int(math.ceil(pos))
+            stats[field].append(group[low] +
+                                (group[high] - group[low]) * (pos - low))
+    return stats
+
+class AggregationResult(object):
+    '''Statistics of the result groups
+
+    Fields are metric, the group keys, count, mean, stddev (sample, 0 for
+    single results), min, max and a pNN field for every percentile
+    (linearly interpolated).'''
+    def __init__(self, by, keys, stats, percentiles):
+        self._fields = ["metric"] + list(by) + STATS + \
+                       _percentile_fields(percentiles)
+        self._key_fields = ["metric"] + list(by)
+        self._keys = keys
+        self._stats = stats
+
+    def get_fields(self):
+        return self._fields
+
+    def __len__(self):
+        return len(self._keys)
+
+    def to_arrays(self):
+        '''Returns a dict of a column per field, statistics are numpy
+        arrays when numpy is installed'''
+        arrays = dict((field, [key[num] for key in self._keys])
+                      for num, field in enumerate(self._key_fields))
+        arrays.update(self._stats)
+        return arrays
+
+    def to_records(self):
+        '''Returns a list of a dict per group'''
+        records = []
+        stats = [(field, list(self._stats[field]))
+                 for field in self._fields[len(self._key_fields):]]
+        for num, key in enumerate(self._keys):
+            record = dict(zip(self._key_fields, key))
+            for field, column in stats:
+                value = column[num]
+                record[field] = int(value) if field == "count" else \
+                                float(value)
+            records.append(record)
+        return records
+
+    def __iter__(self):
+        return iter(self.to_records())
+
+def aggregate(texecs, by=(), metrics=None, percentiles=DEFAULT_PERCENTILES,
+              use_numpy=None):
+    '''Aggregates the metric results of TestExecutions
+
+    by is a list of group keys (see the module description), metrics
+    limits the aggregated metrics. use_numpy None uses numpy when it's
+    installed. Returns an AggregationResult.'''
+    for q in percentiles:
+        if not 0 <= q <= 100:
+            raise PerfRepoException("Percentiles must be between 0 and 100")
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    elif use_numpy and numpy is None:
+        raise PerfRepoException("numpy is not installed")
+
+    by = list(by)
+    keys, codes, results = flatten(texecs, by, metrics)
+    if not keys:
+        stats = dict((field, []) for field in
+                     STATS + _percentile_fields(percentiles))
+    elif use_numpy:
+        stats = _numpy_stats(len(keys), codes, results, percentiles)
+    else:
+        stats = _python_stats(len(keys), codes, results, percentiles)
+    return AggregationResult(by, keys, stats, percentiles)
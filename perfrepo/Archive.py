@@ -0,0 +1,365 @@
+"""
+This module contains export and import of tests with their executions.
+
+An archive is a gzip compressed stream of JSON lines records: the test
+definition first, then its executions (each followed by the chunks of its
+attachments when exported with them) and finally the reports referencing
+the test. Importing into another PerfRepo instance creates new objects and
+remaps the test, metric and execution ids referenced by the report charts,
+series and baselines.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import re
+import gzip
+import json
+import base64
+import tempfile
+import threading
+from multiprocessing.pool import ThreadPool
+from perfrepo.Common import PerfRepoException
+from perfrepo.PerfRepoTest import PerfRepoTest
+from perfrepo.PerfRepoTestExecution import PerfRepoTestExecution
+from perfrepo.PerfRepoTestExecution import PerfRepoTestExecutionSearch
+from perfrepo.PerfRepoReport import PerfRepoReport
+
+ARCHIVE_VERSION = 1
+ARCHIVE_CHUNK_SIZE = 256 * 1024
+
+class ArchiveException(PerfRepoException):
+    pass
+
+def _xml_str(obj):
+    xml = obj.to_xml_string()
+    if isinstance(xml, bytes):
+        xml = xml.decode("utf-8")
+    return xml
+
+class ArchiveWriter(object):
+    def __init__(self, path):
+        self._f = gzip.open(path, "wb")
+        self.write({"type": "archive", "version": ARCHIVE_VERSION})
+
+    def write(self, record):
+        line = json.dumps(record, sort_keys=True) + "\n"
+        self._f.write(line.encode("utf-8"))
+
+    def write_attachment(self, exec_id, attachment_id, filename, mimetype,
+                         chunks):
+        '''Writes the attachment content as records of at most
+        ARCHIVE_CHUNK_SIZE bytes, the last one marked with "last"'''
+        buf = b""
+        for chunk in chunks:
+            buf += chunk
+            while len(buf) > ARCHIVE_CHUNK_SIZE:
+                self._write_chunk(exec_id, attachment_id, filename, mimetype,
+                                  buf[:ARCHIVE_CHUNK_SIZE], False)
+                buf = buf[ARCHIVE_CHUNK_SIZE:]
+        self._write_chunk(exec_id, attachment_id, filename, mimetype, buf,
+                          True)
+
+    def _write_chunk(self, exec_id, attachment_id, filename, mimetype, data,
+                     last):
+        self.write({"type": "attachment",
+                    "execId": exec_id,
+                    "id": attachment_id,
+                    "filename": filename,
+                    "mimetype": mimetype,
+                    "data": base64.b64encode(data).decode("ascii"),
+                    "last": last})
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
+
+def read_archive(path):
+    '''Yields the records of an archive'''
+    with gzip.open(path, "rb") as f:
+        for num, line in enumerate(f):
+            record = json.loads(line.decode("utf-8"))
+            if num == 0:
+                if record.get("type") != "archive":
+                    raise ArchiveException("Not a PerfRepo archive")
+                if record.get("version") != ARCHIVE_VERSION:
+                    raise ArchiveException("Unsupported archive version %s" %\
+                                           record.get("version"))
+                continue
+            yield record
+
+def _windows(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i+size]
+
+def export_test(api, test_uid, path, attachments=False, reports=None, jobs=4,
+                progress=None):
+    '''Exports the test with test_uid and all its executions to path
+
+    Executions (and their attachments if requested) are fetched by jobs
+    parallel requests. reports is a list of ids of reports to include.
+    progress(type, id) is called after each exported object. Returns a dict
+    with the number of exported objects of each type.'''
+    test = api.test_get_by_uid(test_uid, log=False)
+    if test is None:
+        raise ArchiveException("Test '%s' not found" % test_uid)
+
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test_uid)
+    texecs = api.testExecution_search_iter(criteria, log=False)
+    if texecs is None:
+        raise ArchiveException("Search of the test executions failed")
+    exec_ids = [texec.get_id() for texec in texecs]
+
+    def fetch(exec_id):
+        texec = api.testExecution_get(exec_id, log=False)
+        if texec is None:
+            raise ArchiveException("Failed to get TestExecution %s" % exec_id)
+        files = []
+        if attachments:
+            for att_id, filename, mimetype in texec.get_attachments():
+                tmp = tempfile.SpooledTemporaryFile(ARCHIVE_CHUNK_SIZE)
+                chunks = api.testExecution_get_attachment(att_id, log=False)
+                if chunks is None:
+                    raise ArchiveException("Failed to get attachment %s" %\
+                                           att_id)
+                for chunk in chunks:
+                    tmp.write(chunk)
+                tmp.seek(0)
+                files.append((att_id, filename, mimetype, tmp))
+        return texec, files
+
+    stats = {"test": 1, "executions": 0, "attachments": 0, "reports": 0}
+    pool = ThreadPool(jobs)
+    try:
+        with ArchiveWriter(path) as archive:
+            archive.write({"type": "test", "xml": _xml_str(test)})
+
+            #windows keep the number of fetched objects in memory bounded
+            for window in _windows(exec_ids, jobs * 4):
+                for texec, files in pool.map(fetch, window):
+                    archive.write({"type": "execution",
+                                   "xml": _xml_str(texec)})
+                    stats["executions"] += 1
+                    for att_id, filename, mimetype, tmp in files:
+                        chunks = iter(lambda: tmp.read(ARCHIVE_CHUNK_SIZE),
+                                      b"")
+                        archive.write_attachment(texec.get_id(), att_id,
+                                                 filename, mimetype, chunks)
+                        tmp.close()
+                        stats["attachments"] += 1
+                    if progress is not None:
+                        progress("execution", texec.get_id())
+
+            for report_id in reports or []:
+                report = api.report_get_by_id(report_id, log=False)
+                if report is None:
+                    raise ArchiveException("Report %s not found" % report_id)
+                archive.write({"type": "report", "xml": _xml_str(report)})
+                stats["reports"] += 1
+                if progress is not None:
+                    progress("report", report_id)
+    finally:
+        pool.close()
+        pool.join()
+    return stats
+
+class ArchiveImportResult(object):
+    '''Ids of the created objects keyed by their ids in the archive,
+    failed holds (type, old id, error) of the objects not created'''
+    def __init__(self):
+        self.test_id = None
+        self.metrics = {}
+        self.executions = {}
+        self.attachments = {}
+        self.reports = {}
+        self.failed = []
+
+    def __str__(self):
+        return "test %s, %d executions, %d attachments, %d reports, "\
+               "%d failed" % (self.test_id, len(self.executions),
+                              len(self.attachments), len(self.reports),
+                              len(self.failed))
+
+def remap_report(report, test_ids, metric_ids, exec_ids):
+    '''Replaces the test, metric and execution ids a report refers to'''
+    for num, chart in report.get_charts():
+        if chart.get("test") in test_ids:
+            chart["test"] = test_ids[chart["test"]]
+        for key, item in chart.items():
+            if not isinstance(item, dict):
+                continue
+            if not re.match(r"(series|baseline)\d+$", key):
+                continue
+            if item.get("metric") in metric_ids:
+                item["metric"] = metric_ids[item["metric"]]
+            if item.get("execId") in exec_ids:
+                item["execId"] = exec_ids[item["execId"]]
+    return report
+
+def _error(e):
+    return "%s: %s" % (e.__class__.__name__, e)
+
+def import_test(api, path, jobs=4, progress=None):
+    '''Imports an archive created by export_test as new objects
+
+    Executions are created by jobs parallel requests, each followed by the
+    upload of its attachments, so only the attachments of the executions
+    being created are held in temporary files. Reports are created last
+    with their references remapped to the new ids. progress(type, old id,
+    new id) is called after each created object. Returns an
+    ArchiveImportResult.'''
+    result = ArchiveImportResult()
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(jobs * 2)
+    old_test_id = None
+    reports = []
+    #the execution being read and the attachments following it
+    current = None
+    attachment = None
+
+    def finish(kind, old_id, new_id, results, error=None):
+        with lock:
+            if new_id is None:
+                result.failed.append((kind, old_id, error))
+            else:
+                results[old_id] = new_id
+            if progress is not None:
+                progress(kind, old_id, new_id)
+
+    def upload_attachment(new_exec_id, item):
+        old_id, filename, mimetype, tmp = item
+        try:
+            if new_exec_id is None:
+                finish("attachment", old_id, None, result.attachments,
+                       "TestExecution wasn't created")
+                return
+            new_id = api.testExecution_add_attachment(new_exec_id, tmp,
+                                                      filename, mimetype,
+                                                      log=False)
+            if new_id is None:
+                finish("attachment", old_id, None, result.attachments,
+                       "Attachment upload failed")
+            else:
+                finish("attachment", old_id, new_id, result.attachments)
+        except Exception as e:
+            finish("attachment", old_id, None, result.attachments,
+                   _error(e))
+        finally:
+            tmp.close()
+
+    def create_execution(old_id, texec, attachments):
+        try:
+            new_id = None
+            try:
+                created = api.testExecution_create(texec, log=False)
+                if created is None:
+                    finish("execution", old_id, None, result.executions,
+                           "TestExecution create failed")
+                else:
+                    new_id = created.get_id()
+                    finish("execution", old_id, new_id, result.executions)
+            except Exception as e:
+                finish("execution", old_id, None, result.executions,
+                       _error(e))
+            for item in attachments:
+                upload_attachment(new_id, item)
+        finally:
+            slots.release()
+
+    def submit(current):
+        slots.acquire()
+        pool.apply_async(create_execution, current)
+
+    pool = ThreadPool(jobs)
+    try:
+        for record in read_archive(path):
+            if record["type"] == "test":
+                test = PerfRepoTest(record["xml"])
+                old_test_id = test.get_id()
+                old_metrics = dict((metric.get_name(), metric.get_id())
+                                   for metric in test.get_metrics())
+                test.set_id(None)
+                for metric in test.get_metrics():
+                    metric.set_id(None)
+                if api.test_create(test, log=False) is None:
+                    raise ArchiveException("Failed to create test '%s'" %\
+                                           test.get_uid())
+                new_test = api.test_get_by_id(test.get_id(), log=False)
+                for metric in new_test.get_metrics():
+                    old_id = old_metrics.get(metric.get_name())
+                    if old_id is not None:
+                        result.metrics[old_id] = metric.get_id()
+                result.test_id = test.get_id()
+                if progress is not None:
+                    progress("test", old_test_id, result.test_id)
+            elif record["type"] == "execution":
+                if result.test_id is None:
+                    raise ArchiveException("Execution before the test record")
+                if current is not None:
+                    submit(current)
+                texec = PerfRepoTestExecution(record["xml"])
+                old_id = texec.get_id()
+                texec.set_id(None)
+                texec.set_testId(result.test_id)
+                texec.set_testUid(None)
+                current = (old_id, texec, [])
+            elif record["type"] == "attachment":
+                if current is None or record["execId"] != current[0]:
+                    raise ArchiveException("Attachment %s doesn't follow "\
+                                           "its execution" % record["id"])
+                if attachment is None or attachment[0] != record["id"]:
+                    tmp = tempfile.SpooledTemporaryFile(ARCHIVE_CHUNK_SIZE)
+                    attachment = (record["id"], record["filename"],
+                                  record["mimetype"], tmp)
+                attachment[3].write(base64.b64decode(record["data"]))
+                if record["last"]:
+                    attachment[3].seek(0)
+                    current[2].append(attachment)
+                    attachment = None
+            elif record["type"] == "report":
+                reports.append(PerfRepoReport(record["xml"]))
+        if current is not None:
+            submit(current)
+            current = None
+
+        #reports need the ids of all created executions
+        for i in range(jobs * 2):
+            slots.acquire()
+    finally:
+        pool.close()
+        pool.join()
+        #left over when reading the archive failed
+        if current is not None:
+            for item in current[2]:
+                item[3].close()
+        if attachment is not None:
+            attachment[3].close()
+
+    test_ids = {old_test_id: result.test_id}
+    for report in reports:
+        old_id = report.get_id()
+        remap_report(report, test_ids, result.metrics, result.executions)
+        report.set_id(None)
+        try:
+            created = api.report_create(report, log=False)
+        except Exception as e:
+            finish("report", old_id, None, result.reports, _error(e))
+            continue
+        if created is None:
+            finish("report", old_id, None, result.reports,
+                   "Report create failed")
+        else:
+            finish("report", old_id, created.get_id(), result.reports)
+    return result
@@ -0,0 +1,228 @@
+"""
+This module contains helpers for streaming PerfRepo attachments.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import os
+import stat
+import hashlib
+import tempfile
+import threading
+import mimetypes
+from perfrepo.Common import PerfRepoException
+
+ATTACHMENT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MIMETYPE = "application/octet-stream"
+
+class AttachmentSource(object):
+    '''Uniform chunked reader over paths, file objects and buffers
+
+    Nothing is read until the object is iterated, and at most chunk_size
+    bytes are held in memory at a time.'''
+    def __init__(self, attachment, filename=None, mimetype=None,
+                 chunk_size=ATTACHMENT_CHUNK_SIZE):
+        self._chunk_size = chunk_size
+        self._file = None
+        self._buffer = None
+        self._close = False
+
+        if isinstance(attachment, str):
+            self._file = open(attachment, "rb")
+            self._close = True
+            if filename is None:
+                filename = os.path.basename(attachment)
+        elif hasattr(attachment, "read"):
+            self._file = attachment
+            if filename is None and isinstance(getattr(attachment, "name",
+                                                       None), str):
+                filename = os.path.basename(attachment.name)
+        else:
+            try:
+                self._buffer = memoryview(attachment)
+            except TypeError:
+                raise PerfRepoException("Attachment must be a path, a file "\
+                                        "object or a buffer.")
+
+        if filename is None:
+            raise PerfRepoException("Attachment filename must be specified.")
+        if mimetype is None:
+            mimetype = mimetypes.guess_type(filename)[0] or DEFAULT_MIMETYPE
+
+        self._filename = filename
+        self._mimetype = mimetype
+
+    def get_filename(self):
+        return self._filename
+
+    def get_mimetype(self):
+        return self._mimetype
+
+    def get_size(self):
+        if self._buffer is not None:
+            return self._buffer.nbytes
+        try:
+            info = os.fstat(self._file.fileno())
+            if not stat.S_ISREG(info.st_mode):
+                #pipes and sockets have no meaningful size, sent chunked
+                return None
+            return info.st_size - self._file.tell()
+        except Exception:
+            return None
+
+    def content_digest(self, algorithm="sha256"):
+        h = hashlib.new(algorithm)
+        if self._buffer is not None:
+            h.update(self._buffer)
+            return h.hexdigest()
+
+        try:
+            start = self._file.tell()
+            seekable = True
+        except Exception:
+            seekable = False
+
+        if not seekable:
+            #hash while copying into a spool so that the data can still be
+            #uploaded afterwards
+            spool = tempfile.SpooledTemporaryFile(self._chunk_size)
+            for chunk in iter(lambda: self._file.read(self._chunk_size), b""):
+                h.update(chunk)
+                spool.write(chunk)
+            spool.seek(0)
+            self.close()
+            self._file = spool
+            self._close = True
+        else:
+            for chunk in iter(lambda: self._file.read(self._chunk_size), b""):
+                h.update(chunk)
+            self._file.seek(start)
+        return h.hexdigest()
+
+    def close(self):
+        if self._close and self._file is not None:
+            self._file.close()
+
+    def iter_chunks(self, progress=None):
+        total = self.get_size()
+        sent = 0
+        try:
+            if self._buffer is not None:
+                buf = self._buffer.cast("B") if hasattr(self._buffer, "cast")\
+                                              else self._buffer
+                while sent < len(buf):
+                    chunk = buf[sent:sent + self._chunk_size].tobytes()
+                    sent += len(chunk)
+                    if progress is not None:
+                        progress(sent, total)
+                    yield chunk
+            else:
+                while True:
+                    chunk = self._file.read(self._chunk_size)
+                    if not chunk:
+                        break
+                    sent += len(chunk)
+                    if progress is not None:
+                        progress(sent, total)
+                    yield chunk
+        finally:
+            self.close()
+
+    def __iter__(self):
+        return self.iter_chunks()
+
+def iter_response_chunks(response, chunk_size=ATTACHMENT_CHUNK_SIZE,
+                         progress=None):
+    total = response.headers.get("Content-Length")
+    if total is not None:
+        total = int(total)
+    received = 0
+    try:
+        for chunk in response.iter_content(chunk_size):
+            if not chunk:
+                continue
+            received += len(chunk)
+            if progress is not None:
+                progress(received, total)
+            yield chunk
+    finally:
+        response.close()
+
+def write_chunks(chunks, dest):
+    if isinstance(dest, str):
+        with open(dest, "wb") as f:
+            return write_chunks(chunks, f)
+
+    written = 0
+    for chunk in chunks:
+        dest.write(chunk)
+        written += len(chunk)
+    return written
+
+class AttachmentIndex(object):
+    '''Local index of the attachments uploaded to test executions
+
+    Entries map a (test execution id, filename, content digest) key to
+    the PerfRepo attachment id, so that the same content isn't uploaded
+    to the same execution twice. Content added to other executions is
+    still uploaded, PerfRepo can't share attachments. When a path is given the index is loaded
+    from it and every new entry is appended to it, so the index survives
+    between runs.'''
+    def __init__(self, path=None, algorithm="sha256"):
+        self._path = path
+        self._algorithm = algorithm
+        self._index = {}
+        self._lock = threading.Lock()
+
+        if path is not None and os.path.isfile(path):
+            with open(path, "r") as f:
+                for line in f:
+                    #filenames may contain spaces, they're the last field
+                    entry = line.rstrip("\n").split(" ", 3)
+                    if len(entry) != 4:
+                        continue
+                    digest, testExec_id, attachment_id, filename = entry
+                    key = self._key(testExec_id, filename, digest)
+                    self._index[key] = attachment_id
+
+    def _key(self, testExec_id, filename, digest):
+        return (str(testExec_id), filename, digest)
+
+    def _write_entry(self, f, key, attachment_id):
+        testExec_id, filename, digest = key
+        f.write("%s %s %s %s\n" % (digest, testExec_id, attachment_id,
+                                   filename))
+
+    def get_algorithm(self):
+        return self._algorithm
+
+    def get(self, testExec_id, filename, digest):
+        return self._index.get(self._key(testExec_id, filename, digest))
+
+    def add(self, testExec_id, filename, digest, attachment_id):
+        key = self._key(testExec_id, filename, digest)
+        with self._lock:
+            self._index[key] = str(attachment_id)
+            if self._path is not None:
+                with open(self._path, "a") as f:
+                    self._write_entry(f, key, attachment_id)
+
+    def remove(self, testExec_id, filename, digest):
+        with self._lock:
+            self._index.pop(self._key(testExec_id, filename, digest), None)
+            if self._path is not None:
+                with open(self._path, "w") as f:
+                    for key, value in self._index.items():
+                        self._write_entry(f, key, value)
+
+    def __contains__(self, key):
+        return self._key(*key) in self._index
+
+    def __len__(self):
+        return len(self._index)
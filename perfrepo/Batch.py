@@ -0,0 +1,157 @@
+"""
+This module contains the batch runner used by the perfrepo-cli --batch mode.
+
+Commands are read one per line, either as shell-like words or as JSON (a
+list of arguments or an object with "argv" and an optional "id"), executed
+in a thread pool and their results written as JSON lines as soon as each
+command finishes.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import io
+import sys
+import json
+import shlex
+import threading
+from multiprocessing.pool import ThreadPool
+from perfrepo.Common import PerfRepoException, timer
+
+class BatchException(PerfRepoException):
+    pass
+
+def parse_command(line):
+    '''Returns (argv, id) of a batch line or None for blank/comment lines'''
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+
+    cmd_id = None
+    if line[0] in "[{":
+        try:
+            cmd = json.loads(line)
+        except ValueError as e:
+            raise BatchException("Invalid JSON command: %s" % e)
+        if isinstance(cmd, dict):
+            cmd_id = cmd.get("id")
+            cmd = cmd.get("argv")
+        if isinstance(cmd, list):
+            argv = [str(arg) for arg in cmd]
+        elif isinstance(cmd, str):
+            argv = shlex.split(cmd)
+        else:
+            raise BatchException("JSON command requires an argv list")
+    else:
+        argv = shlex.split(line)
+    return argv, cmd_id
+
+def read_commands(f):
+    '''Yields (line number, argv, id, error) for every command in f'''
+    for num, line in enumerate(f, 1):
+        try:
+            cmd = parse_command(line)
+        except (BatchException, ValueError) as e:
+            yield num, None, None, str(e)
+            continue
+        if cmd is not None:
+            yield num, cmd[0], cmd[1], None
+
+class _OutputRouter(object):
+    '''File-like object sending writes to the current thread's buffer'''
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+
+    def capture(self):
+        self._local.buffer = io.StringIO()
+
+    def release(self):
+        buf = getattr(self._local, "buffer", None)
+        self._local.buffer = None
+        return buf.getvalue() if buf is not None else ""
+
+    def write(self, data):
+        buf = getattr(self._local, "buffer", None)
+        if buf is None:
+            return self._stream.write(data)
+        if isinstance(data, bytes):
+            data = data.decode("utf-8", "replace")
+        return buf.write(data)
+
+    def flush(self):
+        if getattr(self._local, "buffer", None) is None:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+class BatchRunner(object):
+    '''Runs batch commands through handler(argv) -> return value
+
+    Output the handler prints to sys.stdout and sys.stderr is captured per
+    command and reported in its result record together with the return
+    value and the elapsed time.'''
+    def __init__(self, handler, jobs=1):
+        if jobs < 1:
+            raise BatchException("Batch parallelism must be at least 1")
+        self._handler = handler
+        self._jobs = jobs
+        self._stdout = None
+        self._stderr = None
+
+    def _run_one(self, cmd):
+        num, argv, cmd_id, error = cmd
+        result = {"line": num, "argv": argv}
+        if cmd_id is not None:
+            result["id"] = cmd_id
+        if error is not None:
+            result["retval"] = None
+            result["error"] = error
+            return result
+
+        self._stdout.capture()
+        self._stderr.capture()
+        start = timer()
+        try:
+            result["retval"] = self._handler(argv)
+        except SystemExit as e:
+            result["retval"] = e.code
+        except Exception as e:
+            result["retval"] = None
+            result["error"] = "%s: %s" % (e.__class__.__name__, e)
+        result["elapsed"] = timer() - start
+        result["stdout"] = self._stdout.release()
+        result["stderr"] = self._stderr.release()
+        return result
+
+    def run(self, commands, out=None):
+        '''Runs all commands, returns the number of failed ones
+
+        Result records are written to out (default sys.stdout) in the order
+        the commands finish, which is the input order with jobs=1.'''
+        if out is None:
+            out = sys.stdout
+        self._stdout = _OutputRouter(sys.stdout)
+        self._stderr = _OutputRouter(sys.stderr)
+        orig_stdout, orig_stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = self._stdout, self._stderr
+
+        failed = 0
+        pool = ThreadPool(self._jobs)
+        try:
+            for result in pool.imap_unordered(self._run_one, commands):
+                if result["retval"] != 0:
+                    failed += 1
+                out.write(json.dumps(result, sort_keys=True) + "\n")
+                out.flush()
+        finally:
+            pool.close()
+            pool.join()
+            sys.stdout, sys.stderr = orig_stdout, orig_stderr
+        return failed
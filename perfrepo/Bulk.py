@@ -0,0 +1,87 @@
+"""
+This module contains bulk operations over TestExecution search results.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import threading
+from multiprocessing.pool import ThreadPool
+from perfrepo.Common import PerfRepoException
+from perfrepo.Concurrency import TokenBucket
+from perfrepo.Planner import SearchPlanner, PlannerException
+
+class BulkException(PerfRepoException):
+    pass
+
+def criteria_is_empty(criteria):
+    return not (criteria.get_ids() or criteria.get_testUid() or
+                criteria.get_testName() or criteria.get_tags() or
+                criteria.get_parameters() or criteria.get_after_date() or
+                criteria.get_before_date())
+
+class BulkDeleteResult(object):
+    def __init__(self, matched):
+        self.matched = matched
+        self.deleted = []
+        self.failed = []
+
+    def __str__(self):
+        return "matched %d, deleted %d, failed %d" % (len(self.matched),
+                                                      len(self.deleted),
+                                                      len(self.failed))
+
+def delete_executions(api, criteria, jobs=4, rate=None, dry_run=False,
+                      progress=None):
+    '''Deletes all TestExecutions matching the search criteria
+
+    Deletes are run by jobs parallel requests, limited to rate deletes per
+    second when rate is set. With dry_run nothing is deleted and the
+    result only lists the matching ids. progress(done, total, exec_id,
+    success) is called after each delete. Criteria matching everything
+    are refused. Returns a BulkDeleteResult.'''
+    if criteria_is_empty(criteria):
+        raise BulkException("Refusing to delete with empty search criteria")
+    if jobs < 1:
+        raise BulkException("Number of delete jobs must be at least 1")
+
+    texecs = SearchPlanner(api, jobs=jobs).search_iter(criteria)
+    try:
+        result = BulkDeleteResult([texec.get_id() for texec in texecs])
+    except PlannerException as e:
+        raise BulkException(str(e))
+    if dry_run or not result.matched:
+        return result
+
+    bucket = TokenBucket(rate) if rate else None
+    lock = threading.Lock()
+    total = len(result.matched)
+
+    def delete(exec_id):
+        if bucket is not None:
+            bucket.acquire()
+        try:
+            success = api.testExecution_delete(exec_id, log=False)
+        except Exception:
+            success = False
+        with lock:
+            if success:
+                result.deleted.append(exec_id)
+            else:
+                result.failed.append(exec_id)
+            if progress is not None:
+                progress(len(result.deleted) + len(result.failed), total,
+                         exec_id, success)
+
+    pool = ThreadPool(min(jobs, total))
+    try:
+        pool.map(delete, result.matched)
+    finally:
+        pool.close()
+        pool.join()
+    return result
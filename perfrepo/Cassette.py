@@ -0,0 +1,304 @@
+"""
+This module contains record/replay transports for PerfRepoRESTAPI.
+
+A CassetteRecorder captures the HTTP exchanges of a PerfRepoRESTAPI
+session, with credentials scrubbed, into a gzip compressed JSON lines
+archive. A CassettePlayer serves them back without any network access,
+either as fast as possible or at the recorded speed.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import io
+import gzip
+import json
+import time
+import base64
+import hashlib
+import tempfile
+import threading
+import collections
+from requests.adapters import HTTPAdapter, BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from perfrepo.Common import PerfRepoException, timer
+
+try:
+    from urlparse import urlparse
+except ImportError:
+    from urllib.parse import urlparse
+
+SCRUBBED_HEADERS = ["authorization", "cookie", "set-cookie",
+                    "proxy-authorization"]
+
+class CassetteException(PerfRepoException):
+    pass
+
+def _relative_path(url):
+    '''Path of the url relative to the PerfRepo base, without credentials'''
+    parsed = urlparse(url)
+    path = parsed.path
+    idx = path.find("rest/")
+    if idx >= 0:
+        path = path[idx:]
+    if parsed.query:
+        path += "?" + parsed.query
+    return path
+
+def _body_digest(body):
+    if body is None:
+        return None
+    if not isinstance(body, bytes):
+        if not isinstance(body, str):
+            return None
+        body = body.encode()
+    return hashlib.sha1(body).hexdigest()
+
+def _scrub(headers):
+    return dict((key, value) for key, value in headers.items()
+                if key.lower() not in SCRUBBED_HEADERS)
+
+#body bytes of an exchange kept in memory before spilling to a file
+_SPOOL_SIZE = 1024 * 1024
+
+#multiple of 3 so that the base64 of the chunks can be concatenated
+_BASE64_CHUNK = 3 * 256 * 1024
+
+class _RecordedBody(object):
+    '''Response body copied into a spool as the client reads it'''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spool = tempfile.SpooledTemporaryFile(_SPOOL_SIZE)
+        self.read_time = 0.0
+        self.complete = False
+
+    def tee(self, response):
+        iter_content = response.iter_content
+
+        def recorded_iter_content(*args, **kwargs):
+            chunks = iter_content(*args, **kwargs)
+            while True:
+                start = timer()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    self.read_time += timer() - start
+                    self.complete = True
+                    return
+                self.read_time += timer() - start
+                with self._lock:
+                    self._spool.write(chunk)
+                yield chunk
+
+        #Response.content and iteration go through the instance attribute
+        response.iter_content = recorded_iter_content
+
+    def write_base64(self, f):
+        with self._lock:
+            self._spool.seek(0)
+            for chunk in iter(lambda: self._spool.read(_BASE64_CHUNK), b""):
+                f.write(base64.b64encode(chunk))
+            self._spool.seek(0, 2)
+
+    def read(self):
+        with self._lock:
+            self._spool.seek(0)
+            data = self._spool.read()
+            self._spool.seek(0, 2)
+        return data
+
+    def close(self):
+        self._spool.close()
+
+class CassetteRecorder(HTTPAdapter):
+    '''HTTP adapter recording every exchange it performs
+
+    Request bodies are stored only as a digest and size, response bodies
+    are stored in full. A response body is recorded as the client reads
+    it, through a spool kept in memory up to 1MiB and in a temporary file
+    above that, so streamed responses stay streamed. Only the part read by
+    the client is recorded. Call save() (or use as a context manager) to
+    write the archive.'''
+    def __init__(self, path, **kwargs):
+        super(CassetteRecorder, self).__init__(**kwargs)
+        self._path = path
+        self._lock = threading.Lock()
+        self._start = timer()
+        self._interactions = []
+
+    def send(self, request, stream=False, **kwargs):
+        start = timer()
+        body = request.body
+        size = len(body) if isinstance(body, (bytes, str)) else None
+        response = super(CassetteRecorder, self).send(request, stream=stream,
+                                                      **kwargs)
+        elapsed = timer() - start
+
+        recorded = _RecordedBody()
+        recorded.tee(response)
+        interaction = {"offset": start - self._start,
+                       "elapsed": elapsed,
+                       "method": request.method,
+                       "path": _relative_path(request.url),
+                       "request_headers": _scrub(request.headers),
+                       "request_digest": _body_digest(body),
+                       "request_size": size,
+                       "status": response.status_code,
+                       "reason": response.reason,
+                       "headers": _scrub(response.headers)}
+        with self._lock:
+            self._interactions.append((interaction, recorded))
+        return response
+
+    def _complete(self, interaction, recorded):
+        interaction = dict(interaction)
+        interaction["body_elapsed"] = recorded.read_time
+        interaction["complete"] = recorded.complete
+        return interaction
+
+    def get_interactions(self):
+        with self._lock:
+            interactions = list(self._interactions)
+        ret = []
+        for interaction, recorded in interactions:
+            interaction = self._complete(interaction, recorded)
+            interaction["body"] = base64.b64encode(recorded.read())\
+                                        .decode("ascii")
+            ret.append(interaction)
+        return ret
+
+    def save(self):
+        with self._lock:
+            interactions = list(self._interactions)
+        with gzip.open(self._path, "wb") as f:
+            for interaction, recorded in interactions:
+                #the body is written last, streamed from its spool
+                line = json.dumps(self._complete(interaction, recorded),
+                                  sort_keys=True)
+                f.write(line[:-1].encode("utf-8"))
+                f.write(b', "body": "')
+                recorded.write_base64(f)
+                f.write(b'"}\n')
+
+    def close(self):
+        self.save()
+        with self._lock:
+            for interaction, recorded in self._interactions:
+                recorded.close()
+            self._interactions = []
+        super(CassetteRecorder, self).close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.save()
+        return False
+
+def load_cassette(path):
+    interactions = []
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                interactions.append(json.loads(line.decode("utf-8")))
+    return interactions
+
+class _PacedBody(io.BytesIO):
+    '''Body whose reads together take about duration seconds'''
+    def __init__(self, body, duration):
+        super(_PacedBody, self).__init__(body)
+        self._rate = len(body) / duration if duration > 0 else None
+
+    def read(self, size=-1):
+        data = super(_PacedBody, self).read(size)
+        if data and self._rate:
+            time.sleep(len(data) / self._rate)
+        return data
+
+class CassettePlayer(BaseAdapter):
+    '''HTTP adapter serving recorded exchanges instead of the network
+
+    Requests are matched by method, path and request body digest, falling
+    back to method and path only. Matching interactions are served in the
+    recorded order. With speed set, each response is delayed by its
+    recorded latency and reading its body takes the recorded time of
+    reading it, both divided by speed. Otherwise responses are served
+    immediately.'''
+    def __init__(self, path, speed=None):
+        super(CassettePlayer, self).__init__()
+        self._speed = speed
+        self._lock = threading.Lock()
+        self._exact = collections.defaultdict(collections.deque)
+        self._loose = collections.defaultdict(collections.deque)
+        self._served = set()
+        interactions = load_cassette(path)
+        for num, interaction in enumerate(interactions):
+            interaction["num"] = num
+            key = (interaction["method"], interaction["path"])
+            digest_key = key + (interaction["request_digest"],)
+            self._exact[digest_key].append(interaction)
+            self._loose[key].append(interaction)
+        self._total = len(interactions)
+
+    def _pop(self, queue):
+        while queue:
+            interaction = queue.popleft()
+            if interaction["num"] not in self._served:
+                self._served.add(interaction["num"])
+                return interaction
+        return None
+
+    def _find(self, request):
+        key = (request.method, _relative_path(request.url))
+        with self._lock:
+            interaction = self._pop(self._exact[key +
+                                                (_body_digest(request.body),)])
+            if interaction is None:
+                interaction = self._pop(self._loose[key])
+        return interaction
+
+    def get_remaining(self):
+        return self._total - len(self._served)
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        if request.body is not None and \
+           not isinstance(request.body, (bytes, str)):
+            #drain streamed bodies like the network would
+            for chunk in request.body:
+                pass
+
+        interaction = self._find(request)
+        if interaction is None:
+            raise CassetteException("No recorded response for %s %s" %\
+                                    (request.method, request.url))
+
+        body = base64.b64decode(interaction["body"])
+        if self._speed:
+            time.sleep(interaction["elapsed"] / self._speed)
+            raw = _PacedBody(body, interaction.get("body_elapsed", 0.0) /
+                                   self._speed)
+        else:
+            raw = io.BytesIO(body)
+
+        response = Response()
+        response.status_code = interaction["status"]
+        response.reason = interaction["reason"]
+        response.headers = CaseInsensitiveDict(interaction["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = raw
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
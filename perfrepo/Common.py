@@ -11,11 +11,42 @@ olichtne@redhat.com (Ondrej Lichtner)
 """
 
 import re
-import collections
+import datetime
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+try:
+    from time import perf_counter as timer
+except ImportError:
+    from time import time as timer
 
 class PerfRepoException(Exception):
     pass
 
+ISO_DATE_FORMATS = ["%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S",
+                    "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S",
+                    "%Y-%m-%dT%H:%M", "%Y-%m-%d"]
+
+_TIMEZONE_RE = re.compile(r"(?<=T\d\d:\d\d)(:\d\d(\.\d+)?)?"
+                          r"(Z|[+-]\d\d:?\d\d)$")
+
+def parse_iso_date(date):
+    '''Parses the ISO 8601 dates used by PerfRepo, without timezone'''
+    if isinstance(date, datetime.datetime):
+        return date
+    if isinstance(date, str):
+        #timezone designators are ignored
+        date = _TIMEZONE_RE.sub(r"\1", date)
+    for date_format in ISO_DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(date, date_format)
+        except (ValueError, TypeError):
+            continue
+    raise PerfRepoException("Invalid date '%s'" % date)
+
 def bool_it(val):
     if isinstance(val, str):
         if re.match("^\s*(?i)(true)", val) or re.match("^\s*(?i)(yes)", val):
@@ -26,7 +57,7 @@ def bool_it(val):
 
 def recursive_dict_update(original, update):
     for key, value in update.items():
-        if isinstance(value, collections.Mapping):
+        if isinstance(value, Mapping):
             r = recursive_dict_update(original.get(key, {}), value)
             original[key] = r
         else:
@@ -53,7 +84,7 @@ def list_to_dot(original_list, prefix="", key=""):
     for value in original_list:
         iter_key = prefix + key + str(index)
         index += 1
-        if isinstance(value, collections.Mapping):
+        if isinstance(value, Mapping):
             sub_list = dict_to_dot(value, iter_key + '.')
             return_list.extend(sub_list)
         elif isinstance(value, list):
@@ -69,7 +100,7 @@ def list_to_dot(original_list, prefix="", key=""):
 def dict_to_dot(original_dict, prefix=""):
     return_list = []
     for key, value in original_dict.items():
-        if isinstance(value, collections.Mapping):
+        if isinstance(value, Mapping):
             sub_list = dict_to_dot(value, prefix + key + '.')
             return_list.extend(sub_list)
         elif isinstance(value, list):
@@ -0,0 +1,190 @@
+"""
+This module contains helpers for limiting concurrent use of PerfRepo.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import time
+import threading
+from perfrepo.Common import PerfRepoException, timer
+
+class TokenBucket(object):
+    '''Thread safe token bucket allowing rate operations per second
+
+    Up to burst tokens can be accumulated while idle. acquire() blocks
+    until a token is available.'''
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise PerfRepoException("Rate must be a positive number")
+        self._rate = float(rate)
+        self._burst = max(float(burst), 1.0)
+        self._tokens = self._burst
+        self._last = timer()
+        self._lock = threading.Lock()
+
+    def get_rate(self):
+        return self._rate
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self._rate = float(rate)
+
+    def _refill(self):
+        now = timer()
+        self._tokens = min(self._burst,
+                           self._tokens + (now - self._last) * self._rate)
+        self._last = now
+
+    def try_acquire(self):
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self._rate
+            time.sleep(wait)
+
+def _size_class(size):
+    #requests transferring within a factor of 4 in bytes share a latency
+    #baseline
+    if size is None:
+        return None
+    return int(size).bit_length() // 2
+
+class ConcurrencyController(object):
+    '''Thread safe AIMD limit of the number of in-flight requests
+
+    The limit grows by one per round of successful requests (limit
+    requests) while at least half of it is in use. It is multiplied by
+    backoff, at most once per round, when a request fails with 429 or
+    5xx, raises, or the smoothed latency of its endpoint exceeds
+    latency_tolerance times the lowest one observed for requests of a
+    similar size, counting both the request and the response body. The
+    limit stays between minimum and maximum. Without adaptive the number
+    of in-flight requests isn't limited.
+
+    Requests to an endpoint with a rate set are additionally limited by
+    a TokenBucket of that rate.
+
+    The controller is opt-in, it only governs the requests of the
+    PerfRepoRESTAPI objects it is set on with set_concurrency_controller,
+    including those of the bulk operations using them. A controller can
+    be shared by several PerfRepoRESTAPI objects using the same server so
+    that they don't compete with each other.'''
+    def __init__(self, initial=4, minimum=1, maximum=64, backoff=0.5,
+                 latency_tolerance=2.0, rates=None, adaptive=True):
+        if minimum < 1 or maximum < minimum:
+            raise PerfRepoException("Invalid concurrency limits")
+        if not 0.0 < backoff < 1.0:
+            raise PerfRepoException("Backoff must be between 0 and 1")
+        self._minimum = minimum
+        self._maximum = maximum
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._backoff = backoff
+        self._tolerance = latency_tolerance
+        self._adaptive = adaptive
+        self._inflight = 0
+        self._latencies = {}
+        self._last_decrease = 0.0
+        self._buckets = {}
+        self._cond = threading.Condition()
+
+        for endpoint, rate in (rates or {}).items():
+            self.set_rate(endpoint, rate)
+
+    def get_limit(self):
+        return int(self._limit)
+
+    def get_minimum(self):
+        return self._minimum
+
+    def get_maximum(self):
+        return self._maximum
+
+    def is_adaptive(self):
+        return self._adaptive
+
+    def get_inflight(self):
+        return self._inflight
+
+    def set_rate(self, endpoint, rate):
+        '''Allow at most rate requests per second to endpoint, None
+        removes the cap'''
+        with self._cond:
+            if rate is None:
+                self._buckets.pop(endpoint, None)
+            elif endpoint in self._buckets:
+                self._buckets[endpoint].set_rate(rate)
+            else:
+                self._buckets[endpoint] = TokenBucket(rate)
+
+    def get_rate(self, endpoint):
+        bucket = self._buckets.get(endpoint)
+        return bucket.get_rate() if bucket is not None else None
+
+    def acquire(self, endpoint):
+        '''Blocks until a request to endpoint may be sent
+
+        Returns the start time to be passed to release().'''
+        bucket = self._buckets.get(endpoint)
+        if bucket is not None:
+            bucket.acquire()
+        with self._cond:
+            while self._adaptive and self._inflight >= int(self._limit):
+                self._cond.wait()
+            self._inflight += 1
+        return timer()
+
+    def release(self, endpoint, start, status=None, size=None, sent=0):
+        '''Ends a request started by acquire()
+
+        status is the HTTP status code, None if the request failed, size
+        the length of the response body if known and sent the length of
+        the request body.'''
+        now = timer()
+        latency = now - start
+        with self._cond:
+            self._inflight -= 1
+            if not self._adaptive:
+                self._cond.notify_all()
+                return
+
+            #smoothed and lowest latency of the endpoint, large requests
+            #and responses naturally take longer than small ones
+            if size is not None:
+                size += sent
+            key = (endpoint, _size_class(size))
+            smooth, lowest = self._latencies.get(key, (latency, latency))
+            smooth = 0.8 * smooth + 0.2 * latency
+            lowest = min(lowest, latency)
+            self._latencies[key] = (smooth, lowest)
+
+            congested = status is None or status == 429 or status >= 500 or \
+                        smooth > self._tolerance * max(lowest, 0.001)
+            if congested:
+                #requests sent before the last decrease report the old load
+                if now - self._last_decrease > smooth:
+                    self._limit = max(self._minimum,
+                                      self._limit * self._backoff)
+                    self._last_decrease = now
+            elif 2 * (self._inflight + 1) >= self._limit:
+                #only grow a limit that is actually used
+                self._limit = min(self._maximum,
+                                  self._limit + 1.0 / self._limit)
+            self._cond.notify_all()
@@ -0,0 +1,131 @@
+"""
+This module contains a time ordered index of TestExecutions.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import bisect
+import datetime
+from perfrepo.Common import PerfRepoException, parse_iso_date
+
+_DAY = datetime.timedelta(days=1)
+_WEEK = datetime.timedelta(weeks=1)
+
+class ExecutionIndex(object):
+    '''TestExecutions sorted by their started date
+
+    The started date of every execution is parsed once when it's added.
+    Executions started at the same time keep the order they were added
+    in. Any iterable of executions can be indexed, e.g. the result of
+    testExecution_search or an ExecutionStore.'''
+    def __init__(self, texecs=()):
+        entries = [(parse_iso_date(texec.get_started()), num, texec)
+                   for num, texec in enumerate(texecs)]
+        entries.sort(key=lambda entry: entry[:2])
+        self._dates = [entry[0] for entry in entries]
+        self._texecs = [entry[2] for entry in entries]
+
+    def add(self, texec):
+        date = parse_iso_date(texec.get_started())
+        pos = bisect.bisect_right(self._dates, date)
+        self._dates.insert(pos, date)
+        self._texecs.insert(pos, texec)
+
+    def __len__(self):
+        return len(self._texecs)
+
+    def __iter__(self):
+        return iter(self._texecs)
+
+    def __getitem__(self, index):
+        return self._texecs[index]
+
+    def get_started(self, index):
+        '''Returns the parsed started date of the execution at index'''
+        return self._dates[index]
+
+    def _bounds(self, after, before):
+        start = 0
+        end = len(self._dates)
+        if after is not None:
+            start = bisect.bisect_left(self._dates, parse_iso_date(after))
+        if before is not None:
+            end = bisect.bisect_left(self._dates, parse_iso_date(before))
+        return start, max(start, end)
+
+    def range(self, after=None, before=None):
+        '''Returns the executions started at or after after and before
+        before, both datetimes or ISO date strings, None for no bound'''
+        start, end = self._bounds(after, before)
+        return self._texecs[start:end]
+
+    def count(self, after=None, before=None):
+        start, end = self._bounds(after, before)
+        return end - start
+
+    def windows(self, size="day", after=None, before=None):
+        '''Yields (window start, executions) of every non-empty window
+
+        size is "day", "week" (starting on Monday) or a timedelta, windows
+        of a timedelta are aligned to the midnight of the first
+        execution.'''
+        start, end = self._bounds(after, before)
+        if start == end:
+            return
+        first = self._dates[start]
+        midnight = datetime.datetime(first.year, first.month, first.day)
+        if size == "day":
+            step = _DAY
+            window_start = midnight
+        elif size == "week":
+            step = _WEEK
+            window_start = midnight - datetime.timedelta(days=first.weekday())
+        elif isinstance(size, datetime.timedelta) and size > \
+             datetime.timedelta(0):
+            step = size
+            window_start = midnight
+        else:
+            raise PerfRepoException("Invalid window size '%s'" % size)
+
+        pos = start
+        while pos < end:
+            date = self._dates[pos]
+            #skip empty windows at once
+            skip = (date - window_start).total_seconds() // \
+                   step.total_seconds()
+            window_start += step * int(skip)
+            window_end = window_start + step
+            stop = bisect.bisect_left(self._dates, window_end, pos, end)
+            yield window_start, self._texecs[pos:stop]
+            pos = stop
+            window_start = window_end
+
+    def latest(self, before=None):
+        '''Returns the last execution started before before, or None'''
+        start, end = self._bounds(None, before)
+        if end == 0:
+            return None
+        return self._texecs[end - 1]
+
+    def latest_per_tags(self, tags=None, before=None):
+        '''Returns a dict of the latest execution of every tag combination
+
+        Keys are frozensets of the execution tags, limited to tags when
+        given. Only executions started before before are considered.'''
+        if tags is not None:
+            tags = set(tags)
+        start, end = self._bounds(None, before)
+        latest = {}
+        for texec in reversed(self._texecs[start:end]):
+            key = frozenset(texec.get_tags())
+            if tags is not None:
+                key &= tags
+            if key not in latest:
+                latest[key] = texec
+        return latest
@@ -0,0 +1,626 @@
+"""
+This module contains an in-process stand-in for a PerfRepo server.
+
+It implements the REST endpoints used by PerfRepoRESTAPI, keeps all state
+in memory and can simulate server latency and errors. Intended for offline
+testing and repeatable client benchmarks.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+from __future__ import print_function
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import re
+import sys
+import copy
+import time
+import base64
+import random
+import datetime
+import threading
+from xml.etree import ElementTree
+from xml.etree.ElementTree import Element
+
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+
+VERSION = "1.4-fake"
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def _parse_date(date):
+    if date is None:
+        return None
+    date = date.strip()
+    for fmt in ["%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"]:
+        try:
+            return datetime.datetime.strptime(date[:26], fmt)
+        except ValueError:
+            continue
+    return None
+
+class PerfRepoFakeServer(object):
+    '''In-memory PerfRepo server running in a background thread
+
+    latency is a constant delay in seconds added to every request, jitter
+    adds a uniformly distributed random delay on top of it and with
+    probability tail_rate another tail_latency seconds are added. With
+    probability error_rate a request fails with error_status. Both models
+    can be replaced with callables taking (method, path) and returning
+    seconds of delay or an error status (None for success).'''
+    def __init__(self, host="127.0.0.1", port=0, user=None, password=None,
+                 latency=0.0, jitter=0.0, tail_latency=0.0, tail_rate=0.0,
+                 error_rate=0.0, error_status=503, seed=None):
+        self._host = host
+        self._port = port
+        self._auth = None
+        if user is not None:
+            creds = "%s:%s" % (user, password)
+            self._auth = "Basic " + \
+                    base64.b64encode(creds.encode()).decode()
+
+        self.latency = latency
+        self.jitter = jitter
+        self.tail_latency = tail_latency
+        self.tail_rate = tail_rate
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._next_id = 1
+            self._tests = {}
+            self._metrics = {}
+            self._executions = {}
+            self._attachments = {}
+            self._reports = {}
+            self._request_count = 0
+
+    def _new_id(self):
+        new_id = self._next_id
+        self._next_id += 1
+        return str(new_id)
+
+    def start(self):
+        handler = type("_Handler", (_FakeRequestHandler,), {"fake": self})
+        self._server = _ThreadingHTTPServer((self._host, self._port), handler)
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self.get_url()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.stop()
+        return False
+
+    def get_url(self):
+        host, port = self._server.server_address[:2]
+        return "http://%s:%d/" % (host, port)
+
+    def get_request_count(self):
+        return self._request_count
+
+    def get_executions(self):
+        with self._lock:
+            return list(self._executions.values())
+
+    def _delay(self, method, path):
+        if callable(self.latency):
+            return self.latency(method, path)
+
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.uniform(0, self.jitter)
+        if self.tail_rate and self._random.random() < self.tail_rate:
+            delay += self.tail_latency
+        return delay
+
+    def _error(self, method, path):
+        if callable(self.error_rate):
+            return self.error_rate(method, path)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return self.error_status
+        return None
+
+    def check_auth(self, header):
+        return self._auth is None or header == self._auth
+
+    def handle(self, method, path, headers, body):
+        '''Returns (status, headers, body) for a single request
+
+        Only the handler runs under the lock of the state, the simulated
+        latency and the parsing and serialization of XML don't, so
+        concurrent requests are served in parallel.'''
+        with self._lock:
+            self._request_count += 1
+            delay = self._delay(method, path)
+            error = self._error(method, path)
+        if delay:
+            time.sleep(delay)
+        if error is not None:
+            return (error, {}, b"Simulated error")
+
+        for route_method, route_re, handler, xml_body in self._routes:
+            if route_method != method:
+                continue
+            match = re.match(route_re, path)
+            if not match:
+                continue
+            if xml_body:
+                try:
+                    body = ElementTree.fromstring(body)
+                except ElementTree.ParseError as e:
+                    return (400, {}, str(e).encode())
+            with self._lock:
+                status, headers, data = handler(self, headers, body,
+                                                *match.groups())
+            #stored elements are never changed once stored (see
+            #_copy_child), so they can be serialized without the lock
+            if isinstance(data, Element):
+                data = ElementTree.tostring(data)
+            return (status, headers, data)
+        return (404, {}, b"Not found")
+
+    def _created(self, path):
+        return (201, {"Location": self.get_url() + path}, b"")
+
+    def _xml(self, elem):
+        return (200, {"Content-Type": "text/xml"}, elem)
+
+    def _copy_child(self, elem, tag):
+        '''Returns shallow copies of elem and of its child tag, to be changed
+        and stored instead of elem while responses may still serialize it'''
+        elem = copy.copy(elem)
+        child = elem.find(tag)
+        index = list(elem).index(child)
+        child = copy.copy(child)
+        elem[index] = child
+        return elem, child
+
+    def _version(self, headers, body):
+        return (200, {"Content-Type": "text/plain"}, VERSION.encode())
+
+    def _test_get(self, headers, body, test_id):
+        if test_id not in self._tests:
+            return (404, {}, b"Test not found")
+        return self._xml(self._tests[test_id])
+
+    def _test_get_uid(self, headers, body, test_uid):
+        for test in self._tests.values():
+            if test.get("uid") == test_uid:
+                return self._xml(test)
+        return (404, {}, b"Test not found")
+
+    def _store_metric(self, metric):
+        if metric.get("id") is None or metric.get("id") not in self._metrics:
+            metric.set("id", self._new_id())
+        self._metrics[metric.get("id")] = metric
+
+    def _test_create(self, headers, body):
+        test = body
+        if test.tag != "test":
+            return (400, {}, b"Invalid xml")
+        for other in self._tests.values():
+            if other.get("uid") == test.get("uid"):
+                return (400, {}, b"Test with this uid already exists")
+        test_id = self._new_id()
+        test.set("id", test_id)
+        metrics = test.find("metrics")
+        if metrics is None:
+            metrics = ElementTree.SubElement(test, "metrics")
+        for metric in metrics.findall("metric"):
+            if metric.get("id") in self._metrics and \
+               metric.get("name") is None:
+                metrics.remove(metric)
+                metrics.append(self._metrics[metric.get("id")])
+            else:
+                self._store_metric(metric)
+        self._tests[test_id] = test
+        return self._created("rest/test/id/%s" % test_id)
+
+    def _test_add_metric(self, headers, body, test_id):
+        if test_id not in self._tests:
+            return (404, {}, b"Test not found")
+        metric = body
+        self._store_metric(metric)
+        test, metrics = self._copy_child(self._tests[test_id], "metrics")
+        metrics.append(metric)
+        self._tests[test_id] = test
+        return self._created("rest/metric/%s" % metric.get("id"))
+
+    def _test_delete(self, headers, body, test_id):
+        if self._tests.pop(test_id, None) is None:
+            return (404, {}, b"Test not found")
+        for exec_id, texec in list(self._executions.items()):
+            if texec.get("testId") == test_id:
+                del self._executions[exec_id]
+        return (204, {}, b"")
+
+    def _metric_get(self, headers, body, metric_id):
+        if metric_id not in self._metrics:
+            return (404, {}, b"Metric not found")
+        return self._xml(self._metrics[metric_id])
+
+    def _find_test(self, texec):
+        test_id = texec.get("testId")
+        if test_id in self._tests:
+            return self._tests[test_id]
+        for test in self._tests.values():
+            if test.get("uid") == texec.get("testUid"):
+                return test
+        return None
+
+    def _store_execution(self, texec, exec_id):
+        if texec.tag != "testExecution":
+            return (400, {}, b"Invalid xml")
+        test = self._find_test(texec)
+        if test is None:
+            return (400, {}, b"Test not found")
+        texec.set("id", exec_id)
+        texec.set("testId", test.get("id"))
+        texec.set("testUid", test.get("uid"))
+        for name in ["comment", "parameters", "tags", "values"]:
+            if texec.find(name) is None:
+                ElementTree.SubElement(texec, name)
+        old = self._executions.get(exec_id)
+        for attachments in texec.findall("attachments"):
+            texec.remove(attachments)
+        if old is not None and old.find("attachments") is not None:
+            texec.append(old.find("attachments"))
+        else:
+            ElementTree.SubElement(texec, "attachments")
+        self._executions[exec_id] = texec
+        return None
+
+    def _texec_get(self, headers, body, exec_id):
+        if exec_id not in self._executions:
+            return (404, {}, b"Test execution not found")
+        return self._xml(self._executions[exec_id])
+
+    def _texec_create(self, headers, body):
+        exec_id = self._new_id()
+        error = self._store_execution(body, exec_id)
+        if error is not None:
+            return error
+        return self._created("rest/testExecution/%s" % exec_id)
+
+    def _texec_update(self, headers, body, exec_id):
+        if exec_id not in self._executions:
+            return (404, {}, b"Test execution not found")
+        error = self._store_execution(body, exec_id)
+        if error is not None:
+            return error
+        return self._created("rest/testExecution/%s" % exec_id)
+
+    def _texec_delete(self, headers, body, exec_id):
+        if self._executions.pop(exec_id, None) is None:
+            return (404, {}, b"Test execution not found")
+        return (204, {}, b"")
+
+    def _texec_add_value(self, headers, body):
+        value = body
+        exec_id = value.attrib.pop("testExecutionId", None)
+        if exec_id not in self._executions:
+            return (404, {}, b"Test execution not found")
+        texec, values = self._copy_child(self._executions[exec_id], "values")
+        values.append(value)
+        self._executions[exec_id] = texec
+        return self._created("rest/testExecution/%s" % exec_id)
+
+    def _search_match(self, texec, criteria):
+        ids = criteria["ids"]
+        if ids is not None and texec.get("id") not in ids:
+            return False
+        if criteria["test-uid"] is not None and \
+           texec.get("testUid") != criteria["test-uid"]:
+            return False
+        if criteria["test-name"] is not None:
+            test = self._tests.get(texec.get("testId"))
+            if test is None or test.get("name") != criteria["test-name"]:
+                return False
+        if criteria["tags"]:
+            tags = set(tag.get("name")
+                       for tag in texec.find("tags").findall("tag"))
+            for tag in criteria["tags"]:
+                if tag.startswith("-"):
+                    if tag[1:] in tags:
+                        return False
+                elif tag not in tags:
+                    return False
+        if criteria["parameters"]:
+            params = dict((p.get("name"), p.get("value")) for p in
+                          texec.find("parameters").findall("parameter"))
+            for name, value in criteria["parameters"]:
+                if params.get(name) != value:
+                    return False
+        started = None
+        if criteria["after"] is not None or criteria["before"] is not None:
+            started = _parse_date(texec.get("started"))
+            if started is None:
+                return False
+        if criteria["after"] is not None and started < criteria["after"]:
+            return False
+        if criteria["before"] is not None and started > criteria["before"]:
+            return False
+        return True
+
+    def _parse_search(self, root):
+        criteria = {}
+        elem_ids = root.find("ids")
+        if elem_ids is not None:
+            criteria["ids"] = set(elem.text for elem in elem_ids)
+        else:
+            criteria["ids"] = None
+        criteria["test-uid"] = root.findtext("test-uid")
+        criteria["test-name"] = root.findtext("test-name")
+        criteria["tags"] = (root.findtext("tags") or "").split()
+        criteria["parameters"] = []
+        params = root.find("parameters")
+        if params is not None:
+            for param in params.findall("parameter"):
+                criteria["parameters"].append((param.findtext("name"),
+                                               param.findtext("value")))
+        criteria["after"] = _parse_date(root.findtext("executed-after"))
+        criteria["before"] = _parse_date(root.findtext("executed-before"))
+        howmany = root.findtext("how-many")
+        criteria["how-many"] = int(howmany) if howmany else None
+        limit_from = root.findtext("limit-from")
+        criteria["limit-from"] = int(limit_from) if limit_from else 0
+        criteria["order-by"] = root.findtext("order-by")
+        criteria["order-by-parameter"] = root.findtext("order-by-parameter")
+        return criteria
+
+    def _order_key(self, criteria):
+        order_by = criteria["order-by"]
+        if order_by is None:
+            return lambda texec: int(texec.get("id"))
+
+        def param_value(texec):
+            for param in texec.findall("parameters/parameter"):
+                if param.get("name") == criteria["order-by-parameter"]:
+                    return param.get("value") or ""
+            return ""
+
+        if order_by.startswith("DATE"):
+            key = lambda texec: _parse_date(texec.get("started")) or \
+                                datetime.datetime.min
+        elif order_by.startswith("NAME"):
+            key = lambda texec: texec.get("name") or ""
+        elif order_by.startswith("VERSION"):
+            key = lambda texec: [int(part) if part.isdigit() else 0
+                                 for part in re.split(r"[.-]",
+                                                      param_value(texec))]
+        else:
+            key = param_value
+        return lambda texec: (key(texec), int(texec.get("id")))
+
+    def _texec_search(self, headers, body):
+        criteria = self._parse_search(body)
+        result = Element("testExecutions")
+        matches = [texec for texec in self._executions.values()
+                   if self._search_match(texec, criteria)]
+        matches.sort(key=self._order_key(criteria),
+                     reverse=(criteria["order-by"] or "").endswith("_DESC"))
+        matches = matches[criteria["limit-from"]:]
+        if criteria["how-many"] is not None:
+            matches = matches[:criteria["how-many"]]
+        for texec in matches:
+            result.append(texec)
+        return self._xml(result)
+
+    def _attachment_get(self, headers, body, attachment_id):
+        if attachment_id not in self._attachments:
+            return (404, {}, b"Attachment not found")
+        filename, mimetype, data = self._attachments[attachment_id]
+        return (200, {"Content-Type": mimetype,
+                      "Content-Disposition": "attachment; filename=%s" %\
+                                             filename},
+                data)
+
+    def _attachment_add(self, headers, body, exec_id):
+        if exec_id not in self._executions:
+            return (404, {}, b"Test execution not found")
+        attachment_id = self._new_id()
+        self._attachments[attachment_id] = (headers.get("filename"),
+                                            headers.get("Content-Type"),
+                                            body)
+        texec, attachments = self._copy_child(self._executions[exec_id],
+                                              "attachments")
+        self._executions[exec_id] = texec
+        ElementTree.SubElement(attachments, "attachment",
+                               {"id": attachment_id,
+                                "filename": headers.get("filename", ""),
+                                "mimetype": headers.get("Content-Type",
+                                                        "")})
+        return self._created("rest/testExecution/attachment/%s" %\
+                             attachment_id)
+
+    def _report_get(self, headers, body, report_id):
+        if report_id not in self._reports:
+            return (404, {}, b"Report not found")
+        return self._xml(self._reports[report_id])
+
+    def _store_report(self, report, report_id):
+        if report.tag != "report":
+            return (400, {}, b"Invalid xml")
+        report.set("id", report_id)
+        old = self._reports.get(report_id)
+        if old is not None and report.find("permissions") is None:
+            report.append(old.find("permissions"))
+        elif report.find("permissions") is None:
+            ElementTree.SubElement(report, "permissions")
+        self._reports[report_id] = report
+        return None
+
+    def _report_create(self, headers, body):
+        report_id = self._new_id()
+        error = self._store_report(body, report_id)
+        if error is not None:
+            return error
+        return self._created("rest/report/id/%s" % report_id)
+
+    def _report_update(self, headers, body, report_id):
+        if report_id not in self._reports:
+            return (404, {}, b"Report not found")
+        error = self._store_report(body, report_id)
+        if error is not None:
+            return error
+        return self._created("rest/report/id/%s" % report_id)
+
+    def _report_delete(self, headers, body, report_id):
+        if self._reports.pop(report_id, None) is None:
+            return (404, {}, b"Report not found")
+        return (204, {}, b"")
+
+    def _report_add_permission(self, headers, body, report_id):
+        if report_id not in self._reports:
+            return (404, {}, b"Report not found")
+        perm = body
+        perm.tag = "permission"
+        id_elem = ElementTree.SubElement(perm, "id")
+        id_elem.text = self._new_id()
+        report, permissions = self._copy_child(self._reports[report_id],
+                                               "permissions")
+        permissions.append(perm)
+        self._reports[report_id] = report
+        return self._created("rest/report/id/%s" % report_id)
+
+    _routes = [
+        ("GET", r"^rest/info/version$", _version, False),
+        ("GET", r"^rest/test/id/(\d+)$", _test_get, False),
+        ("GET", r"^rest/test/uid/([^/]+)$", _test_get_uid, False),
+        ("POST", r"^rest/test/create$", _test_create, True),
+        ("POST", r"^rest/test/id/(\d+)/addMetric$", _test_add_metric, True),
+        ("DELETE", r"^rest/test/id/(\d+)$", _test_delete, False),
+        ("GET", r"^rest/metric/(\d+)$", _metric_get, False),
+        ("GET", r"^rest/testExecution/(\d+)$", _texec_get, False),
+        ("POST", r"^rest/testExecution/create$", _texec_create, True),
+        ("POST", r"^rest/testExecution/update/(\d+)$", _texec_update, True),
+        ("DELETE", r"^rest/testExecution/(\d+)$", _texec_delete, False),
+        ("POST", r"^rest/testExecution/search$", _texec_search, True),
+        ("POST", r"^rest/testExecution/addValue$", _texec_add_value, True),
+        ("GET", r"^rest/testExecution/attachment/(\d+)$", _attachment_get,
+                False),
+        ("POST", r"^rest/testExecution/(\d+)/addAttachment$",
+                 _attachment_add, False),
+        ("GET", r"^rest/report/id/(\d+)$", _report_get, False),
+        ("POST", r"^rest/report/create$", _report_create, True),
+        ("POST", r"^rest/report/update/(\d+)$", _report_update, True),
+        ("DELETE", r"^rest/report/id/(\d+)$", _report_delete, False),
+        ("POST", r"^rest/report/id/(\d+)/addPermission$",
+                 _report_add_permission, True),
+    ]
+
+class _FakeRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    #headers and body are written separately, avoid delayed ACK stalls
+    disable_nagle_algorithm = True
+    fake = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    #skip trailers
+                    while self.rfile.readline().strip():
+                        pass
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b"".join(chunks)
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length)
+
+    def _handle(self, method):
+        body = self._read_body()
+        if not self.fake.check_auth(self.headers.get("Authorization")):
+            status, headers, data = (401, {}, b"Unauthorized")
+        else:
+            path = self.path.split("?")[0]
+            idx = path.find("rest/")
+            path = path[idx:] if idx >= 0 else path.lstrip("/")
+            status, headers, data = self.fake.handle(method, path,
+                                                     self.headers, body)
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Fake PerfRepo server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--tail-latency", type=float, default=0.0)
+    parser.add_argument("--tail-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = PerfRepoFakeServer(args.host, args.port,
+                                latency=args.latency,
+                                jitter=args.jitter,
+                                tail_latency=args.tail_latency,
+                                tail_rate=args.tail_rate,
+                                error_rate=args.error_rate,
+                                error_status=args.error_status,
+                                seed=args.seed)
+    print("Fake PerfRepo listening on %s" % server.start(), file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
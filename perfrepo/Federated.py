@@ -0,0 +1,250 @@
+"""
+This module contains a client federating several PerfRepo instances.
+
+Reads are sent to all instances in parallel and every returned object is
+tagged with the name of the instance it came from (see
+PerfRepoObject.get_instance). Search results of the instances are merged
+into a single stream ordered by the started date, or by the order-by of
+the search criteria when set.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import copy
+import logging
+from multiprocessing.pool import ThreadPool
+from perfrepo.Common import PerfRepoException
+from perfrepo.Planner import order_key
+
+class FederatedException(PerfRepoException):
+    pass
+
+def _merge(streams, key, reverse=False):
+    '''Merges iterators each ordered by key into a single ordered one
+
+    Equal items are yielded in the order of the streams.'''
+    heads = []
+    for num, stream in enumerate(streams):
+        for item in stream:
+            heads.append([key(item), num, item, stream])
+            break
+
+    while heads:
+        best = heads[0]
+        for head in heads[1:]:
+            if (head[0] > best[0]) if reverse else (head[0] < best[0]):
+                best = head
+        yield best[2]
+        for item in best[3]:
+            best[0] = key(item)
+            best[2] = item
+            break
+        else:
+            heads.remove(best)
+
+def _close(obj):
+    close = getattr(obj, "close", None)
+    if close is not None:
+        close()
+
+class PerfRepoFederatedAPI(object):
+    '''Client for several PerfRepo instances
+
+    instances is a list of (name, PerfRepoRESTAPI) pairs. Requests to the
+    instances are run by jobs threads, one per instance by default. An
+    instance fails when its request raises an exception, e.g. when it
+    can't be reached, or when it returns None from a request that always
+    has a result, i.e. get_version and searches. With partial set,
+    instances that fail are logged and left out of the results, otherwise
+    the methods return None as soon as one instance fails. Lookups of
+    single objects (test_get_by_uid, testExecution_get_many) can't tell a
+    failed request from an object the instance doesn't have, their None
+    results are taken for the latter and are simply missing from the
+    results.'''
+    def __init__(self, instances, jobs=None, partial=False):
+        names = [name for name, api in instances]
+        if not names:
+            raise FederatedException("At least one instance is required")
+        if len(set(names)) != len(names):
+            raise FederatedException("Instance names must be unique")
+        self._instances = list(instances)
+        self._apis = dict(self._instances)
+        self._jobs = jobs if jobs is not None else len(self._instances)
+        self._partial = partial
+        if self._jobs < 1:
+            raise FederatedException("Number of jobs must be at least 1")
+
+    def get_instances(self):
+        return [name for name, api in self._instances]
+
+    def get_api(self, instance):
+        try:
+            return self._apis[instance]
+        except KeyError:
+            raise FederatedException("Unknown instance '%s'" % instance)
+
+    def _fan_out(self, calls, none_fails=False):
+        '''Runs (instance, function, args) calls in parallel
+
+        Returns the list of (instance, result) pairs of the calls that
+        didn't fail, in the order of calls, or None if a call failed and
+        partial results aren't allowed. A call fails when it raises an
+        exception or, with none_fails, returns None. Otherwise a None
+        result, e.g. of an object the instance doesn't have, isn't a
+        failure.'''
+        def call(item):
+            instance, func, args = item
+            try:
+                result = func(*args)
+            except Exception as e:
+                return False, e
+            if result is None and none_fails:
+                return False, "no result"
+            return True, result
+
+        if not calls:
+            return []
+        pool = ThreadPool(min(self._jobs, len(calls)))
+        try:
+            results = pool.map(call, calls)
+        finally:
+            pool.close()
+            pool.join()
+
+        ret = []
+        failed = False
+        for (instance, func, args), (success, result) in zip(calls, results):
+            if success:
+                ret.append((instance, result))
+                continue
+            if not self._partial:
+                logging.debug("Request to instance '%s' failed: %s" %\
+                              (instance, result))
+                failed = True
+            else:
+                logging.warning("Request to instance '%s' failed: %s" %\
+                                (instance, result))
+        if failed:
+            #e.g. streamed search responses of the other instances
+            for instance, result in ret:
+                _close(result)
+            return None
+        return ret
+
+    def _tag(self, instance, obj):
+        obj.set_instance(instance)
+        return obj
+
+    def get_version(self, log=True):
+        '''Returns a dict of the versions of the instances'''
+        results = self._fan_out([(name, api.get_version, (log,))
+                                 for name, api in self._instances],
+                                none_fails=True)
+        if results is None:
+            return None
+        return dict(results)
+
+    def test_get_by_uid(self, test_uid, log=True):
+        '''Returns the tests with test_uid of all the instances having it'''
+        results = self._fan_out([(name, api.test_get_by_uid, (test_uid, log))
+                                 for name, api in self._instances])
+        if results is None:
+            return None
+        return [self._tag(name, test) for name, test in results
+                if test is not None]
+
+    def testExecution_get_many(self, refs, log=True):
+        '''Returns the TestExecutions of (instance, id) refs, e.g. the ones
+        compared by a report, in the order of refs, those not found are
+        left out'''
+        calls = [(name, self.get_api(name).testExecution_get, (exec_id, log))
+                 for name, exec_id in refs]
+        results = self._fan_out(calls)
+        if results is None:
+            return None
+        return [self._tag(name, texec) for name, texec in results
+                if texec is not None]
+
+    def testExecution_get(self, instance, testExec_id, log=True):
+        texec = self.get_api(instance).testExecution_get(testExec_id, log)
+        if texec is None:
+            return None
+        return self._tag(instance, texec)
+
+    def report_get_by_id(self, instance, report_id, log=True):
+        report = self.get_api(instance).report_get_by_id(report_id, log)
+        if report is None:
+            return None
+        return self._tag(instance, report)
+
+    def _instance_criteria(self, criteria):
+        criteria = copy.copy(criteria)
+        if criteria.get_order_by() is None:
+            #merging needs every stream ordered the same way
+            criteria.set_order_by("DATE_ASC")
+        #every instance may hold the whole requested page
+        limit_from = criteria.get_limit_from() or 0
+        howmany = criteria.get_howmany()
+        criteria.set_limit_from(None)
+        if howmany:
+            criteria.set_howmany(limit_from + int(howmany))
+        return criteria
+
+    def _tag_stream(self, instance, texecs):
+        for texec in texecs:
+            yield self._tag(instance, texec)
+
+    def testExecution_search_iter(self, criteria, chunk_size=64*1024,
+                                  log=True):
+        '''Searches all instances and merges the found TestExecutions
+
+        Results are ordered by the order-by of criteria, by ascending
+        started date when not set. limit-from and how-many apply to the
+        merged results. A search that doesn't succeed is a failure of its
+        instance. Returns an iterator or None on failure.'''
+        instance_criteria = self._instance_criteria(criteria)
+        results = self._fan_out([(name, api.testExecution_search_iter,
+                                  (instance_criteria, chunk_size, log))
+                                 for name, api in self._instances],
+                                none_fails=True)
+        if results is None:
+            return None
+        return self._merged_search(criteria, instance_criteria, results)
+
+    def _merged_search(self, criteria, instance_criteria, results):
+        order_by = instance_criteria.get_order_by()
+        key = order_key(order_by, instance_criteria.get_order_by_parameter())
+        streams = [self._tag_stream(name, texecs) for name, texecs in results]
+        merged = _merge(streams, key, order_by.endswith("_DESC"))
+        try:
+            for texec in self._page(merged, criteria.get_limit_from(),
+                                    criteria.get_howmany()):
+                yield texec
+        finally:
+            #the page may end before the streams do
+            for name, texecs in results:
+                _close(texecs)
+
+    def _page(self, texecs, limit_from, howmany):
+        skip = limit_from or 0
+        count = 0
+        for texec in texecs:
+            if skip > 0:
+                skip -= 1
+                continue
+            if howmany and count >= int(howmany):
+                return
+            yield texec
+            count += 1
+
+    def testExecution_search(self, criteria, log=True):
+        texecs = self.testExecution_search_iter(criteria, log=log)
+        if texecs is None:
+            return None
+        return list(texecs)
@@ -0,0 +1,234 @@
+"""
+This module contains the bulk import of result files into TestExecutions.
+
+Every file of a results tree describes one TestExecution, either as the
+PerfRepo testExecution XML or as JSON:
+
+    {"name": "...", "testUid": "...", "comment": "...", "started": "...",
+     "tags": ["tag", ...], "parameters": {"name": "value", ...},
+     "values": [{"metricName": "...", "result": 1.0,
+                 "parameters": {...}}, ...]}
+
+where "testId" can be used instead of "testUid" and "values" can also be a
+simple {"metricName": result, ...} mapping. Files are parsed in a process
+pool and uploaded by a bounded pool of threads sharing one
+PerfRepoRESTAPI. An optional checkpoint file records the files already
+imported so an interrupted import can be resumed.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import os
+import json
+import threading
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+from perfrepo.Common import PerfRepoException
+from perfrepo.PerfRepoTestExecution import PerfRepoTestExecution
+from perfrepo.PerfRepoValue import PerfRepoValue
+
+IMPORT_EXTENSIONS = [".json", ".xml"]
+
+class ImportException(PerfRepoException):
+    pass
+
+def _string(value):
+    #the XML layer only serializes strings, JSON also has numbers
+    if value is None:
+        return None
+    return str(value)
+
+def execution_from_dict(data):
+    '''Creates a PerfRepoTestExecution from its JSON description'''
+    if not isinstance(data, dict):
+        raise ImportException("Execution description must be an object")
+
+    texec = PerfRepoTestExecution()
+    texec.set_name(_string(data.get("name")))
+    texec.set_testUid(_string(data.get("testUid")))
+    texec.set_testId(_string(data.get("testId")))
+    if "comment" in data:
+        texec.set_comment(_string(data["comment"]))
+    if "started" in data:
+        texec.set_started(data["started"])
+    for tag in data.get("tags", []):
+        texec.add_tag(_string(tag))
+    for name, value in sorted(data.get("parameters", {}).items()):
+        texec.add_parameter(name, _string(value))
+
+    values = data.get("values", [])
+    if isinstance(values, dict):
+        values = [{"metricName": name, "result": result}
+                  for name, result in sorted(values.items())]
+    for val in values:
+        value = PerfRepoValue()
+        value.set_metricName(_string(val.get("metricName")))
+        try:
+            value.set_result(float(val.get("result")))
+        except (TypeError, ValueError):
+            raise ImportException("Invalid result of metric '%s'" %\
+                                  val.get("metricName"))
+        if val.get("comparator") is not None:
+            value.set_comparator(val["comparator"])
+        for name, param_val in sorted(val.get("parameters", {}).items()):
+            value.add_parameter(name, _string(param_val))
+        texec.add_value(value)
+
+    if texec.get_name() is None:
+        raise ImportException("Execution name not specified")
+    if texec.get_testUid() is None and texec.get_testId() is None:
+        raise ImportException("Test ID/UID not specified")
+    return texec
+
+def load_execution(path):
+    '''Loads a PerfRepoTestExecution from an XML or JSON result file'''
+    with open(path, "rb") as f:
+        content = f.read()
+
+    if path.endswith(".xml"):
+        texec = PerfRepoTestExecution(content)
+        texec.set_id(None)
+        return texec
+    return execution_from_dict(json.loads(content.decode("utf-8")))
+
+def find_result_files(path, extensions=IMPORT_EXTENSIONS):
+    '''Returns sorted paths of result files relative to path'''
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        for name in sorted(names):
+            if os.path.splitext(name)[1] in extensions:
+                full = os.path.join(root, name)
+                files.append(os.path.relpath(full, path))
+    return files
+
+def _parse_file(job):
+    relpath, path = job
+    try:
+        return relpath, load_execution(path), None
+    except Exception as e:
+        return relpath, None, "%s: %s" % (e.__class__.__name__, e)
+
+class ImportCheckpoint(object):
+    '''Record of the result files already imported and their execution ids
+
+    Entries are appended to the file at path as they are added, so the
+    checkpoint stays valid even when the import is interrupted.'''
+    def __init__(self, path):
+        self._path = path
+        self._done = {}
+        self._lock = threading.Lock()
+
+        if os.path.isfile(path):
+            with open(path, "r") as f:
+                for line in f:
+                    entry = line.rstrip("\n").split("\t")
+                    if len(entry) != 2:
+                        continue
+                    self._done[entry[0]] = entry[1]
+
+    def get(self, relpath):
+        return self._done.get(relpath)
+
+    def add(self, relpath, exec_id):
+        with self._lock:
+            self._done[relpath] = str(exec_id)
+            with open(self._path, "a") as f:
+                f.write("%s\t%s\n" % (relpath, exec_id))
+
+    def __contains__(self, relpath):
+        return relpath in self._done
+
+    def __len__(self):
+        return len(self._done)
+
+class ImportResult(object):
+    def __init__(self):
+        self.imported = {}
+        self.skipped = []
+        self.failed = {}
+
+    def __str__(self):
+        return "imported %d, skipped %d, failed %d" % (len(self.imported),
+                                                       len(self.skipped),
+                                                       len(self.failed))
+
+def import_directory(api, path, checkpoint=None, processes=None, jobs=4,
+                     progress=None):
+    '''Imports all result files under path as new TestExecutions
+
+    checkpoint is an ImportCheckpoint (or a path to one), files recorded
+    in it are skipped. processes is the size of the parsing process pool,
+    None meaning the number of CPUs and 1 parsing in this process. jobs is
+    the number of concurrent uploads. progress(relpath, exec_id, error) is
+    called after each file. Returns an ImportResult.'''
+    if jobs < 1:
+        raise ImportException("Number of upload jobs must be at least 1")
+    if checkpoint is not None and not isinstance(checkpoint, ImportCheckpoint):
+        checkpoint = ImportCheckpoint(checkpoint)
+
+    result = ImportResult()
+    lock = threading.Lock()
+    todo = []
+    for relpath in find_result_files(path):
+        if checkpoint is not None and relpath in checkpoint:
+            result.skipped.append(relpath)
+        else:
+            todo.append((relpath, os.path.join(path, relpath)))
+
+    def finish(relpath, exec_id, error):
+        with lock:
+            if error is None:
+                result.imported[relpath] = exec_id
+                if checkpoint is not None:
+                    checkpoint.add(relpath, exec_id)
+            else:
+                result.failed[relpath] = error
+            if progress is not None:
+                progress(relpath, exec_id, error)
+
+    #at most 2 parsed executions wait for every upload thread
+    slots = threading.BoundedSemaphore(jobs * 2)
+
+    def upload(relpath, texec):
+        try:
+            created = api.testExecution_create(texec, log=False)
+            if created is None:
+                finish(relpath, None, "TestExecution create failed")
+            else:
+                finish(relpath, created.get_id(), None)
+        except Exception as e:
+            finish(relpath, None, "%s: %s" % (e.__class__.__name__, e))
+        finally:
+            slots.release()
+
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    parse_pool = None
+    if processes > 1 and len(todo) > 1:
+        parse_pool = multiprocessing.Pool(min(processes, len(todo)))
+        parsed = parse_pool.imap_unordered(_parse_file, todo, chunksize=16)
+    else:
+        parsed = (_parse_file(job) for job in todo)
+
+    upload_pool = ThreadPool(jobs)
+    try:
+        for relpath, texec, error in parsed:
+            if error is not None:
+                finish(relpath, None, error)
+                continue
+            slots.acquire()
+            upload_pool.apply_async(upload, (relpath, texec))
+    finally:
+        if parse_pool is not None:
+            parse_pool.terminate()
+            parse_pool.join()
+        upload_pool.close()
+        upload_pool.join()
+    return result
@@ -0,0 +1,232 @@
+"""
+This module contains client-side instrumentation of the PerfRepo REST API.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import bisect
+import threading
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float("inf"))
+
+def endpoint_label(endpoint):
+    return endpoint.replace("%s", "{id}")
+
+class Histogram(object):
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._buckets = tuple(buckets)
+        if self._buckets[-1] != float("inf"):
+            self._buckets += (float("inf"),)
+        self._counts = [0] * len(self._buckets)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+        self._counts[bisect.bisect_left(self._buckets, value)] += 1
+        self._sum += value
+        self._count += 1
+
+    def get_count(self):
+        return self._count
+
+    def get_sum(self):
+        return self._sum
+
+    def get_buckets(self):
+        '''Returns cumulative (upper bound, count) pairs'''
+        cumulative = []
+        total = 0
+        for bound, count in zip(self._buckets, self._counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+    def quantile(self, q):
+        '''Upper bucket bound of the q-quantile, None if nothing observed'''
+        if self._count == 0:
+            return None
+        rank = q * self._count
+        for bound, total in self.get_buckets():
+            if total >= rank:
+                return bound
+        return self._buckets[-1]
+
+    def to_dict(self):
+        return {"count": self._count,
+                "sum": self._sum,
+                "buckets": self.get_buckets()}
+
+class PerfRepoInstrumentation(object):
+    '''Collects per endpoint metrics of PerfRepoRESTAPI calls
+
+    Requests are keyed by (endpoint, method), where endpoint is the REST
+    path template, e.g. 'rest/testExecution/{id}'. XML parse and
+    serialization times are keyed by endpoint. Registered callbacks are
+    called with a dict describing every recorded event.'''
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._requests = {}
+            self._parse = {}
+            self._serialize = {}
+
+    def add_callback(self, callback):
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        if callback in self._callbacks:
+            self._callbacks.remove(callback)
+
+    def _notify(self, event):
+        for callback in self._callbacks:
+            callback(event)
+
+    def record_request(self, endpoint, method, status, seconds,
+                       bytes_sent=0, bytes_received=0):
+        endpoint = endpoint_label(endpoint)
+        with self._lock:
+            key = (endpoint, method)
+            if key not in self._requests:
+                self._requests[key] = {"count": 0,
+                                       "status": {},
+                                       "latency": Histogram(self._buckets),
+                                       "bytes_sent": 0,
+                                       "bytes_received": 0}
+            stats = self._requests[key]
+            stats["count"] += 1
+            stats["status"][status] = stats["status"].get(status, 0) + 1
+            stats["latency"].observe(seconds)
+            stats["bytes_sent"] += bytes_sent
+            stats["bytes_received"] += bytes_received
+
+        if self._callbacks:
+            self._notify({"type": "request",
+                          "endpoint": endpoint,
+                          "method": method,
+                          "status": status,
+                          "seconds": seconds,
+                          "bytes_sent": bytes_sent,
+                          "bytes_received": bytes_received})
+
+    def _record_xml(self, kind, store, endpoint, seconds):
+        endpoint = endpoint_label(endpoint)
+        with self._lock:
+            if endpoint not in store:
+                store[endpoint] = Histogram(self._buckets)
+            store[endpoint].observe(seconds)
+
+        if self._callbacks:
+            self._notify({"type": kind,
+                          "endpoint": endpoint,
+                          "seconds": seconds})
+
+    def record_parse(self, endpoint, seconds):
+        self._record_xml("parse", self._parse, endpoint, seconds)
+
+    def record_serialize(self, endpoint, seconds):
+        self._record_xml("serialize", self._serialize, endpoint, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            requests = []
+            for (endpoint, method), stats in sorted(self._requests.items()):
+                requests.append({"endpoint": endpoint,
+                                 "method": method,
+                                 "count": stats["count"],
+                                 "status": dict(stats["status"]),
+                                 "latency": stats["latency"].to_dict(),
+                                 "bytes_sent": stats["bytes_sent"],
+                                 "bytes_received": stats["bytes_received"]})
+            parse = dict((k, v.to_dict()) for k, v in self._parse.items())
+            serialize = dict((k, v.to_dict())
+                             for k, v in self._serialize.items())
+        return {"requests": requests,
+                "parse": parse,
+                "serialize": serialize}
+
+    def totals(self):
+        '''Overall seconds spent in network, parsing and serialization'''
+        with self._lock:
+            network = sum(s["latency"].get_sum()
+                          for s in self._requests.values())
+            parse = sum(h.get_sum() for h in self._parse.values())
+            serialize = sum(h.get_sum() for h in self._serialize.values())
+            requests = sum(s["count"] for s in self._requests.values())
+        return {"requests": requests,
+                "network": network,
+                "parse": parse,
+                "serialize": serialize}
+
+    def to_prometheus(self, prefix="perfrepo_client"):
+        lines = []
+        snap = self.snapshot()
+
+        def labels(**kwargs):
+            items = ['%s="%s"' % (k, _escape(v))
+                     for k, v in sorted(kwargs.items())]
+            return "{%s}" % ",".join(items)
+
+        def histogram(name, hist, **kwargs):
+            for bound, count in hist["buckets"]:
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append("%s_bucket%s %d" % (name,
+                                                 labels(le=le, **kwargs),
+                                                 count))
+            lines.append("%s_sum%s %r" % (name, labels(**kwargs),
+                                          hist["sum"]))
+            lines.append("%s_count%s %d" % (name, labels(**kwargs),
+                                            hist["count"]))
+
+        name = prefix + "_requests_total"
+        lines.append("# HELP %s Number of REST requests." % name)
+        lines.append("# TYPE %s counter" % name)
+        for req in snap["requests"]:
+            for status, count in sorted(req["status"].items()):
+                lines.append("%s%s %d" % (name,
+                                          labels(endpoint=req["endpoint"],
+                                                 method=req["method"],
+                                                 status=status),
+                                          count))
+
+        name = prefix + "_request_duration_seconds"
+        lines.append("# HELP %s REST request latency." % name)
+        lines.append("# TYPE %s histogram" % name)
+        for req in snap["requests"]:
+            histogram(name, req["latency"], endpoint=req["endpoint"],
+                      method=req["method"])
+
+        for direction in ["sent", "received"]:
+            name = "%s_bytes_%s_total" % (prefix, direction)
+            lines.append("# HELP %s Bytes %s in REST requests." % (name,
+                                                                   direction))
+            lines.append("# TYPE %s counter" % name)
+            for req in snap["requests"]:
+                lines.append("%s%s %d" % (name,
+                                          labels(endpoint=req["endpoint"],
+                                                 method=req["method"]),
+                                          req["bytes_" + direction]))
+
+        for kind in ["parse", "serialize"]:
+            name = "%s_xml_%s_duration_seconds" % (prefix, kind)
+            lines.append("# HELP %s Time spent in XML %s." % (name, kind))
+            lines.append("# TYPE %s histogram" % name)
+            for endpoint, hist in sorted(snap[kind].items()):
+                histogram(name, hist, endpoint=endpoint)
+
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    value = str(value)
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
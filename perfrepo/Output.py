@@ -0,0 +1,109 @@
+"""
+This module contains structured (JSON Lines, CSV) output of TestExecutions.
+
+Fields are selected by name: id, name, started, testId, testUid, comment,
+tags, parameters, values, instance (set by the federated client),
+param:NAME for a single parameter and value:METRIC for the result of a
+single metric.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import csv
+import json
+from perfrepo.Common import PerfRepoException
+
+OUTPUT_FORMATS = ["text", "jsonl", "csv"]
+
+EXECUTION_FIELDS = ["id", "name", "started", "testId", "testUid", "comment",
+                    "tags", "parameters", "values", "instance"]
+
+DEFAULT_CSV_FIELDS = ["id", "name", "started", "testUid", "tags"]
+
+def parse_fields(fields_str):
+    '''Parses and validates a comma separated field list'''
+    fields = [field.strip() for field in fields_str.split(",")
+              if field.strip()]
+    for field in fields:
+        if field in EXECUTION_FIELDS:
+            continue
+        if field.startswith("param:") or field.startswith("value:"):
+            if len(field.split(":", 1)[1]) > 0:
+                continue
+        raise PerfRepoException("Unknown field '%s'" % field)
+    return fields
+
+def execution_field(texec, field):
+    '''Returns the value of a field of a TestExecution'''
+    if field.startswith("param:"):
+        name = field[len("param:"):]
+        for param in texec.get_parameters():
+            if param[0] == name:
+                return param[1]
+        return None
+    elif field.startswith("value:"):
+        value = texec.get_value(field[len("value:"):])
+        return value.get_result() if value is not None else None
+    elif field == "tags":
+        return list(texec.get_tags())
+    elif field == "parameters":
+        return dict(texec.get_parameters())
+    elif field == "values":
+        return [value.to_dict() for value in texec.get_values()]
+    return getattr(texec, "get_%s" % field)()
+
+class ExecutionWriter(object):
+    '''Writes TestExecutions to f one at a time
+
+    jsonl writes a JSON object per line, all fields by default. csv writes
+    a header row on creation, lists are joined by ',' and mappings written
+    as name=value pairs. text writes the str() of every execution, or the
+    fields separated by spaces when selected. Every write is flushed so
+    the output can be consumed while a search is still running.'''
+    def __init__(self, f, fmt="jsonl", fields=None):
+        if fmt not in OUTPUT_FORMATS:
+            raise PerfRepoException("Unknown output format '%s'" % fmt)
+        self._f = f
+        self._fmt = fmt
+        self._fields = fields
+        self._csv = None
+
+        if fmt == "csv":
+            if self._fields is None:
+                self._fields = DEFAULT_CSV_FIELDS
+            self._csv = csv.writer(f)
+            self._csv.writerow(self._fields)
+            f.flush()
+
+    def _flat(self, value):
+        if value is None:
+            return ""
+        elif isinstance(value, list):
+            return ",".join(str(item) for item in value)
+        elif isinstance(value, dict):
+            return ",".join("%s=%s" % item for item in sorted(value.items()))
+        return value
+
+    def write(self, texec):
+        if self._fmt == "jsonl":
+            if self._fields is None:
+                obj = texec.to_dict()
+            else:
+                obj = dict((field, execution_field(texec, field))
+                           for field in self._fields)
+            self._f.write(json.dumps(obj, sort_keys=True) + "\n")
+        elif self._fmt == "csv":
+            self._csv.writerow([self._flat(execution_field(texec, field))
+                                for field in self._fields])
+        elif self._fields is None:
+            self._f.write("%s\n" % texec)
+        else:
+            self._f.write(" ".join(str(self._flat(execution_field(texec, f)))
+                                   for f in self._fields) + "\n")
+        self._f.flush()
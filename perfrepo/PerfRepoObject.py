@@ -10,16 +10,47 @@ __author__ = """
 olichtne@redhat.com (Ondrej Lichtner)
 """
 
-import xml.dom.minidom
+import functools
 from xml.etree import ElementTree
+from perfrepo import Tracing
+
+def traced_from_xml(init):
+    '''Run a model constructor parsing xml inside a perfrepo.from_xml span
+
+    Objects parsed while constructing another one, e.g. the metrics of a
+    test, don't get spans of their own.'''
+    @functools.wraps(init)
+    def wrapper(self, xml=None, *args, **kwargs):
+        if xml is None:
+            return init(self, xml, *args, **kwargs)
+        tracer = Tracing.active_tracer()
+        parent = Tracing.current_span()
+        if tracer is None or \
+           getattr(parent, "name", None) == "perfrepo.from_xml":
+            return init(self, xml, *args, **kwargs)
+
+        with Tracing.start_span("perfrepo.from_xml", tracer,
+                                {"class": type(self).__name__}):
+            return init(self, xml, *args, **kwargs)
+    return wrapper
 
 class PerfRepoObject(object):
+    #name of the PerfRepo instance the object was read from, only set by
+    #the federated client and never serialized
+    _instance = None
+
     def __init__(self):
         pass
 
     def get_obj_url(self):
         return ""
 
+    def set_instance(self, instance):
+        self._instance = instance
+
+    def get_instance(self):
+        return self._instance
+
     def _set_element_atrib(self, element, name, value):
         if value != None:
             element.set(name, value)
@@ -27,11 +58,20 @@ class PerfRepoObject(object):
     def to_xml(self):
         pass
 
+    def _xml_string(self):
+        return ElementTree.tostring(self.to_xml())
+
     def to_xml_string(self):
-        root = self.to_xml()
-        return ElementTree.tostring(root)
+        tracer = Tracing.active_tracer()
+        if tracer is None:
+            return self._xml_string()
+
+        with Tracing.start_span("perfrepo.to_xml", tracer,
+                                {"class": type(self).__name__}):
+            return self._xml_string()
 
     def to_pretty_xml_string(self):
+        import xml.dom.minidom
         tmp_xml = xml.dom.minidom.parseString(self.to_xml_string())
         return tmp_xml.toprettyxml()
 
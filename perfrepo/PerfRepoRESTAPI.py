@@ -12,12 +12,21 @@ olichtne@redhat.com (Ondrej Lichtner)
 
 import requests
 import logging
+import functools
 from perfrepo.PerfRepoObject import PerfRepoObject
 from perfrepo.PerfRepoMetric import PerfRepoMetric
 from perfrepo.PerfRepoReport import PerfRepoReport
 from perfrepo.PerfRepoTest import PerfRepoTest
 from perfrepo.PerfRepoTestExecution import PerfRepoTestExecution
-from perfrepo.Common import PerfRepoException
+from perfrepo.PerfRepoValue import PerfRepoValue
+from perfrepo.Common import PerfRepoException, timer
+from perfrepo.Attachment import AttachmentSource, ATTACHMENT_CHUNK_SIZE
+from perfrepo.Attachment import iter_response_chunks, write_chunks
+from perfrepo.Instrumentation import endpoint_label
+from perfrepo import Tracing
+from perfrepo.Cassette import CassetteRecorder, CassettePlayer
+from perfrepo.SearchParser import parse_search_response
+from perfrepo.ResultStore import ExecutionStore
 from xml.etree import ElementTree
 
 try:
@@ -28,6 +37,121 @@ except:
 class PerfRepoRESTAPIException(PerfRepoException):
     pass
 
+class PartialAddException(PerfRepoRESTAPIException):
+    '''Raised when not all values could be added
+
+    added is the list of values that were added, empty when the first
+    one failed, failed the value whose request failed with status_code.
+    The values following it weren't sent.'''
+    def __init__(self, msg, added, failed, status_code):
+        super(PartialAddException, self).__init__(msg)
+        self.added = added
+        self.failed = failed
+        self.status_code = status_code
+
+def _object_id(obj):
+    if hasattr(obj, "get_id"):
+        return obj.get_id()
+    elif isinstance(obj, (str, int)):
+        return obj
+    return None
+
+def _traced(func):
+    '''Run the REST method inside a span named after it'''
+    name = "perfrepo.%s" % func.__name__
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        tracer = self._get_tracer()
+        if tracer is None:
+            return func(self, *args, **kwargs)
+
+        with Tracing.start_span(name, tracer) as span:
+            if args:
+                span.set_attribute("object_id", _object_id(args[0]))
+            ret = func(self, *args, **kwargs)
+            if hasattr(ret, "get_id"):
+                span.set_attribute("object_id", ret.get_id())
+            return ret
+    return wrapper
+
+def _count_chunks(chunks, counter):
+    for chunk in chunks:
+        counter[0] += len(chunk)
+        yield chunk
+
+def _measure_stream(response, finish):
+    '''Calls finish(bytes received, seconds spent reading) once the body of
+    a streamed response is read or the response is closed'''
+    iter_content = response.iter_content
+    close = response.close
+    stats = [0, 0.0, False]
+
+    def done():
+        if not stats[2]:
+            stats[2] = True
+            finish(stats[0], stats[1])
+
+    def measured_iter_content(*args, **kwargs):
+        chunks = iter_content(*args, **kwargs)
+        while True:
+            start = timer()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                stats[1] += timer() - start
+                done()
+                return
+            stats[1] += timer() - start
+            stats[0] += len(chunk)
+            yield chunk
+
+    def measured_close():
+        close()
+        done()
+
+    #Response.content and iteration go through the instance attributes
+    response.iter_content = measured_iter_content
+    response.close = measured_close
+
+class _ChunkReader(object):
+    '''Minimal file-like object reading from an iterator of byte chunks
+
+    read_time is the total of seconds spent waiting for the chunks.'''
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.read_time = 0.0
+
+    def read(self, size=-1):
+        start = timer()
+        try:
+            for chunk in self._chunks:
+                if chunk:
+                    return chunk
+            return b""
+        finally:
+            self.read_time += timer() - start
+
+class _ResponseIterator(object):
+    '''Iterator over the items parsed from a streamed response
+
+    close() closes the response even when the iteration hasn't started.'''
+    def __init__(self, response, items):
+        self._response = response
+        self._items = items
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._items)
+
+    next = __next__
+
+    def close(self):
+        self._items.close()
+        self._response.close()
+
 class PerfRepoRESTAPI(object):
     '''Wrapper class for the REST API provided by PerfRepo'''
     def __init__(self, url, user, password):
@@ -46,6 +170,11 @@ class PerfRepoRESTAPI(object):
         self._password = password
 
         self._version = None
+        self._attachment_index = None
+        self._attachment_verify = False
+        self._instrumentation = None
+        self._tracer = None
+        self._controller = None
 
         self._session = requests.Session()
         self._session.auth = (self._user, self._password)
@@ -55,9 +184,228 @@ class PerfRepoRESTAPI(object):
 
     def set_retries(self, max_retries = 0):
         adapter = requests.adapters.HTTPAdapter(max_retries=max_retries)
+        self.set_adapter(adapter)
+
+    def set_pool_size(self, size, max_retries = None):
+        '''Keep up to size connections open for concurrent use of the API
+
+        The mounted adapter is resized in place, so a custom adapter like
+        a CassetteRecorder stays in use. Adapters without a connection
+        pool, like a CassettePlayer, are left alone. max_retries None keeps
+        the retries of the adapter.'''
+        adapter = self._session.get_adapter(self._url)
+        if not isinstance(adapter, requests.adapters.HTTPAdapter):
+            return
+        if max_retries is not None:
+            adapter.max_retries = \
+                    requests.adapters.Retry.from_int(max_retries)
+        if adapter._pool_maxsize != size:
+            adapter.poolmanager.clear()
+            adapter.init_poolmanager(1, size, block=adapter._pool_block)
+
+    def get_pool_size(self):
+        '''Returns the connection pool size of the mounted adapter, None if
+        it doesn't use a connection pool'''
+        adapter = self._session.get_adapter(self._url)
+        if not isinstance(adapter, requests.adapters.HTTPAdapter):
+            return None
+        return adapter._pool_maxsize
+
+    def set_adapter(self, adapter):
+        '''Use a custom requests transport adapter for all requests'''
         scheme = urlparse(self._url).scheme
         self._session.mount(scheme+'://', adapter)
 
+    def record(self, path, max_retries=0, pool_size=10):
+        '''Record all following exchanges into a cassette archive at path
+
+        Returns the CassetteRecorder, call its save() method to write the
+        archive.'''
+        recorder = CassetteRecorder(path, max_retries=max_retries,
+                                    pool_maxsize=pool_size)
+        self.set_adapter(recorder)
+        return recorder
+
+    def replay(self, path, speed=None):
+        '''Serve all following requests from the cassette archive at path
+
+        speed None replays as fast as possible, otherwise the recorded
+        latencies are divided by speed (1.0 being the recorded speed).'''
+        player = CassettePlayer(path, speed)
+        self.set_adapter(player)
+        return player
+
+    def set_attachment_index(self, index=None, verify=False):
+        '''Enable content-addressed deduplication of attachment uploads
+
+        With an AttachmentIndex set, testExecution_add_attachment hashes the
+        content first, which reads it one more time. If the same execution
+        already has an attachment of the same filename and content, its id
+        is returned instead of sending the content again. Only re-uploads
+        to the same execution are deduplicated: PerfRepo has no way to
+        share an attachment between executions, so the same content added
+        to another execution is always uploaded.
+
+        With verify set, a GET request checks that an indexed attachment
+        still exists on the server before its id is returned, otherwise
+        the ids of attachments removed since they were indexed are
+        returned.'''
+        self._attachment_index = index
+        self._attachment_verify = verify
+
+    def get_attachment_index(self):
+        return self._attachment_index
+
+    def set_instrumentation(self, instrumentation=None):
+        '''Record per endpoint metrics into a PerfRepoInstrumentation object
+
+        Passing None disables instrumentation.'''
+        self._instrumentation = instrumentation
+
+    def get_instrumentation(self):
+        return self._instrumentation
+
+    def set_concurrency_controller(self, controller=None):
+        '''Send all requests through a ConcurrencyController
+
+        The controller limits the number of concurrent requests made by
+        all threads using this object, passing None disables it. There's
+        no controller by default, the bulk operations (search planner,
+        import, archive, bulk delete) are then only bounded by their
+        jobs.'''
+        self._controller = controller
+
+    def get_concurrency_controller(self):
+        return self._controller
+
+    def set_tracer(self, tracer=None):
+        '''Use tracer for this object instead of the process wide one'''
+        self._tracer = tracer
+
+    def _get_tracer(self):
+        if self._tracer is not None:
+            return self._tracer
+        return Tracing.get_tracer()
+
+    def _request(self, method, endpoint, url, data=None, stream=False,
+                 **kwargs):
+        controller = self._controller
+        if controller is None:
+            return self._send(method, endpoint, url, data, stream, **kwargs)
+
+        sent = [0]
+        if isinstance(data, (str, bytes)):
+            sent[0] = len(data)
+        elif data is not None:
+            data = _count_chunks(data, sent)
+
+        #streamed responses give their slot back once the headers arrive
+        label = endpoint_label(endpoint)
+        start = controller.acquire(label)
+        status = None
+        size = None
+        try:
+            response = self._send(method, endpoint, url, data, stream,
+                                  **kwargs)
+            status = response.status_code
+            if not stream:
+                size = len(response.content)
+            elif "Content-Length" in response.headers:
+                size = int(response.headers["Content-Length"])
+            return response
+        finally:
+            controller.release(label, start, status, size, sent[0])
+
+    def _send(self, method, endpoint, url, data=None, stream=False,
+              **kwargs):
+        instr = self._instrumentation
+        tracer = self._get_tracer()
+        if instr is None and tracer is None:
+            response = self._session.request(method, url, data=data,
+                                             **kwargs)
+            if not stream:
+                #consume the body so that the connection goes back to the pool
+                response.content
+            return response
+
+        sent = [0]
+        if isinstance(data, (str, bytes)):
+            sent[0] = len(data)
+        elif data is not None:
+            data = _count_chunks(data, sent)
+
+        parent = Tracing.current_span()
+        label = endpoint_label(endpoint)
+        #not made current, a streamed body is read after this returns
+        span = Tracing.start_span("perfrepo.network", tracer,
+                                  {"endpoint": label,
+                                   "http.method": method,
+                                   "http.url": url})
+        start = timer()
+        try:
+            response = self._session.request(method, url, data=data,
+                                             **kwargs)
+        except Exception as e:
+            span.set_error(e)
+            span.finish()
+            raise
+        elapsed = timer() - start
+
+        def finish(received, read_time):
+            span.set_attribute("http.status_code", response.status_code)
+            span.set_attribute("bytes_sent", sent[0])
+            span.set_attribute("bytes_received", received)
+            span.finish()
+
+            if isinstance(parent, Tracing.Span):
+                parent.set_attribute("endpoint", label)
+                parent.set_attribute("payload_size", sent[0])
+                parent.set_attribute("response_size", received)
+
+            if instr is not None:
+                instr.record_request(endpoint, method, response.status_code,
+                                     elapsed + read_time, sent[0], received)
+
+        if stream:
+            #the time the caller spends between reads isn't network time
+            _measure_stream(response, finish)
+        else:
+            read_start = timer()
+            received = len(response.content)
+            finish(received, timer() - read_start)
+        return response
+
+    def _serialize(self, endpoint, func, *args):
+        instr = self._instrumentation
+        tracer = self._get_tracer()
+        if instr is None and tracer is None:
+            return func(*args)
+
+        with Tracing.start_span("perfrepo.serialize", tracer,
+                                {"endpoint": endpoint_label(endpoint)}):
+            start = timer()
+            data = func(*args)
+            elapsed = timer() - start
+        if instr is not None:
+            instr.record_serialize(endpoint, elapsed)
+        return data
+
+    def _parse(self, endpoint, func, content):
+        instr = self._instrumentation
+        tracer = self._get_tracer()
+        if instr is None and tracer is None:
+            return func(content)
+
+        with Tracing.start_span("perfrepo.parse", tracer,
+                                {"endpoint": endpoint_label(endpoint),
+                                 "bytes": len(content)}):
+            start = timer()
+            obj = func(content)
+            elapsed = timer() - start
+        if instr is not None:
+            instr.record_parse(endpoint, elapsed)
+        return obj
+
     def connected(self):
         try:
             if self.get_version():
@@ -71,10 +419,11 @@ class PerfRepoRESTAPI(object):
             return ""
         return urljoin(self._url, obj.get_obj_url())
 
+    @_traced
     def get_version(self, log=True):
         rest_method_path = 'rest/info/version'
         get_url = urljoin(self._url, rest_method_path)
-        response = self._session.get(get_url)
+        response = self._request('GET', rest_method_path, get_url)
         if response.status_code != 200:
             if log:
                 logging.debug(response.text)
@@ -85,15 +434,16 @@ class PerfRepoRESTAPI(object):
                 logging.debug("GET %s success" % get_url)
             return self._version
 
+    @_traced
     def test_get_by_id(self, test_id, log=True):
         try:
             int(test_id)
         except:
             raise PerfRepoRESTAPIException("ID must be an integer.")
 
-        rest_method_path = 'rest/test/id/%s' % test_id
-        get_url = urljoin(self._url, rest_method_path)
-        response = self._session.get(get_url)
+        rest_method_path = 'rest/test/id/%s'
+        get_url = urljoin(self._url, rest_method_path % test_id)
+        response = self._request('GET', rest_method_path, get_url)
         if response.status_code != 200:
             if log:
                 logging.debug(response.text)
@@ -101,12 +451,14 @@ class PerfRepoRESTAPI(object):
         else:
             if log:
                 logging.debug("GET %s success" % get_url)
-            return PerfRepoTest(response.content)
+            return self._parse(rest_method_path, PerfRepoTest,
+                               response.content)
 
+    @_traced
     def test_get_by_uid(self, test_uid, log=True):
-        rest_method_path = 'rest/test/uid/%s' % test_uid
-        get_url = urljoin(self._url, rest_method_path)
-        response = self._session.get(get_url)
+        rest_method_path = 'rest/test/uid/%s'
+        get_url = urljoin(self._url, rest_method_path % test_uid)
+        response = self._request('GET', rest_method_path, get_url)
         if response.status_code != 200:
             if log:
                 logging.debug(response.text)
@@ -114,12 +466,15 @@ class PerfRepoRESTAPI(object):
         else:
             if log:
                 logging.debug("GET %s success" % get_url)
-            return PerfRepoTest(response.content)
+            return self._parse(rest_method_path, PerfRepoTest,
+                               response.content)
 
+    @_traced
     def test_create(self, test, log=True):
         rest_method_path = 'rest/test/create'
         post_url = urljoin(self._url, rest_method_path)
-        response = self._session.post(post_url, data=test.to_xml_string())
+        data = self._serialize(rest_method_path, test.to_xml_string)
+        response = self._request('POST', rest_method_path, post_url, data)
         if response.status_code != 201:
             if log:
                 logging.debug(response.text)
@@ -132,10 +487,12 @@ class PerfRepoRESTAPI(object):
                 logging.info("Obj url: %s" % self.get_obj_url(test))
             return test
 
+    @_traced
     def test_add_metric(self, test_id, metric, log=True):
-        rest_method_path = 'rest/test/id/%s/addMetric' % test_id
-        post_url = urljoin(self._url, rest_method_path)
-        response = self._session.post(post_url, data=metric.to_xml_string)
+        rest_method_path = 'rest/test/id/%s/addMetric'
+        post_url = urljoin(self._url, rest_method_path % test_id)
+        data = self._serialize(rest_method_path, metric.to_xml_string)
+        response = self._request('POST', rest_method_path, post_url, data)
         if response.status_code != 201:
             if log:
                 logging.debug(response.text)
@@ -148,10 +505,11 @@ class PerfRepoRESTAPI(object):
                 logging.info("Obj url: %s" % self.get_obj_url(metric))
             return metric
 
+    @_traced
     def test_delete(self, test_id, log=True):
-        rest_method_path = 'rest/test/id/%s' % test_id
-        delete_url = urljoin(self._url, rest_method_path)
-        response = self._session.delete(delete_url)
+        rest_method_path = 'rest/test/id/%s'
+        delete_url = urljoin(self._url, rest_method_path % test_id)
+        response = self._request('DELETE', rest_method_path, delete_url)
         if response.status_code != 204:
             return False
         else:
@@ -159,15 +517,16 @@ class PerfRepoRESTAPI(object):
                 logging.debug("DELETE %s success" % delete_url)
             return True
 
+    @_traced
     def metric_get(self, metric_id, log=True):
         try:
             int(metric_id)
         except:
             raise PerfRepoRESTAPIException("ID must be an integer.")
 
-        rest_method_path = 'rest/metric/%s' % metric_id
-        get_url = urljoin(self._url, rest_method_path)
-        response = self._session.get(get_url)
+        rest_method_path = 'rest/metric/%s'
+        get_url = urljoin(self._url, rest_method_path % metric_id)
+        response = self._request('GET', rest_method_path, get_url)
         if response.status_code != 200:
             if log:
                 logging.debug(response.text)
@@ -175,17 +534,19 @@ class PerfRepoRESTAPI(object):
         else:
             if log:
                 logging.debug("GET %s success" % get_url)
-            return PerfRepoMetric(response.content)
+            return self._parse(rest_method_path, PerfRepoMetric,
+                               response.content)
 
+    @_traced
     def testExecution_get(self, testExec_id, log=True):
         try:
             int(testExec_id)
         except:
             raise PerfRepoRESTAPIException("ID must be an integer.")
 
-        rest_method_path = 'rest/testExecution/%s' % testExec_id
-        get_url = urljoin(self._url, rest_method_path)
-        response = self._session.get(get_url)
+        rest_method_path = 'rest/testExecution/%s'
+        get_url = urljoin(self._url, rest_method_path % testExec_id)
+        response = self._request('GET', rest_method_path, get_url)
         if response.status_code != 200:
             if log:
                 logging.debug(response.text)
@@ -193,12 +554,15 @@ class PerfRepoRESTAPI(object):
         else:
             if log:
                 logging.debug("GET %s success" % get_url)
-            return PerfRepoTestExecution(response.content)
+            return self._parse(rest_method_path, PerfRepoTestExecution,
+                               response.content)
 
+    @_traced
     def testExecution_create(self, testExec, log=True):
         rest_method_path = 'rest/testExecution/create'
         post_url = urljoin(self._url, rest_method_path)
-        response = self._session.post(post_url, data=testExec.to_xml_string())
+        data = self._serialize(rest_method_path, testExec.to_xml_string)
+        response = self._request('POST', rest_method_path, post_url, data)
         if response.status_code != 201:
             if log:
                 logging.debug(response.text)
@@ -211,11 +575,13 @@ class PerfRepoRESTAPI(object):
                 logging.info("Obj url: %s" % self.get_obj_url(testExec))
             return testExec
 
+    @_traced
     def testExecution_update(self, testExec, log=True):
-        rest_method_path = 'rest/testExecution/update/%s' % testExec.get_id()
-        post_url = urljoin(self._url, rest_method_path)
+        rest_method_path = 'rest/testExecution/update/%s'
+        post_url = urljoin(self._url, rest_method_path % testExec.get_id())
 
-        response = self._session.post(post_url, data=testExec.to_xml_string())
+        data = self._serialize(rest_method_path, testExec.to_xml_string)
+        response = self._request('POST', rest_method_path, post_url, data)
         if response.status_code != 201:
             if log:
                 logging.debug(response.text)
@@ -226,19 +592,43 @@ class PerfRepoRESTAPI(object):
                 logging.info("Obj url: %s" % self.get_obj_url(testExec))
             return testExec
 
-    def _parse_texec_search(self, content):
+    def _parse_texec_search(self, content, value_arrays=False):
         tree = ElementTree.fromstring(content)
         texecs = []
         for elem in tree.findall('testExecution'):
-            texecs.append(PerfRepoTestExecution(elem))
+            texecs.append(PerfRepoTestExecution(elem, value_arrays))
 
         return texecs
 
-    def testExecution_search(self, criteria, log=True):
+    @_traced
+    def testExecution_search(self, criteria, log=True, processes=1,
+                             columnar=False, max_memory=None,
+                             value_arrays=False):
+        '''Returns the list of TestExecutions matching criteria
+
+        With processes other than 1 the response is parsed in chunks by a
+        pool of that many processes, None meaning one per CPU. With
+        columnar a dict of columns is returned instead, see
+        SearchParser.execution_columns. With max_memory set the response
+        is parsed incrementally into an ExecutionStore spilling to disk
+        above max_memory bytes, close() it when done. With value_arrays
+        metrics with many values are parsed into PerfRepoValueArrays, see
+        PerfRepoTestExecution.'''
+        if max_memory is not None:
+            if processes != 1 or columnar:
+                msg = "max_memory can't be combined with processes/columnar"
+                raise PerfRepoRESTAPIException(msg)
+            texecs = self.testExecution_search_iter(criteria, log=log,
+                                                    value_arrays=value_arrays)
+            if texecs is None:
+                return None
+            return ExecutionStore.collect(texecs, max_memory)
+
         rest_method_path = 'rest/testExecution/search'
         post_url = urljoin(self._url, rest_method_path)
 
-        response = self._session.post(post_url, data=criteria.to_xml())
+        data = self._serialize(rest_method_path, criteria.to_xml)
+        response = self._request('POST', rest_method_path, post_url, data)
         if response.status_code != 200:
             if log:
                 logging.debug(response.text)
@@ -246,13 +636,77 @@ class PerfRepoRESTAPI(object):
         else:
             if log:
                 logging.debug("SEARCH %s success" % post_url)
-            texecs = self._parse_texec_search(response.content)
+            if processes == 1 and not columnar:
+                parse = functools.partial(self._parse_texec_search,
+                                          value_arrays=value_arrays)
+            else:
+                parse = functools.partial(parse_search_response,
+                                          processes=processes,
+                                          columnar=columnar,
+                                          value_arrays=value_arrays)
+            texecs = self._parse(rest_method_path, parse, response.content)
             return texecs
 
+    def _iter_texec_search(self, endpoint, response, chunk_size,
+                           value_arrays):
+        instr = self._instrumentation
+        source = _ChunkReader(response.iter_content(chunk_size))
+        depth = 0
+        root = None
+        start = timer()
+        read_time = 0.0
+        try:
+            for event, elem in ElementTree.iterparse(source,
+                                                     ("start", "end")):
+                if event == "start":
+                    if root is None:
+                        root = elem
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 1 and elem.tag == "testExecution":
+                    texec = PerfRepoTestExecution(elem, value_arrays)
+                    root.remove(elem)
+                    if instr is not None:
+                        #parse time of this execution without the time
+                        #spent waiting for the network
+                        instr.record_parse(endpoint, timer() - start -
+                                           (source.read_time - read_time))
+                    yield texec
+                    start = timer()
+                    read_time = source.read_time
+        finally:
+            response.close()
+
+    @_traced
+    def testExecution_search_iter(self, criteria, chunk_size=64*1024,
+                                  log=True, value_arrays=False):
+        '''Like testExecution_search but parses the response incrementally
+
+        Returns an iterator yielding the found TestExecutions as soon as
+        they're received, or None if the search failed.'''
+        rest_method_path = 'rest/testExecution/search'
+        post_url = urljoin(self._url, rest_method_path)
+
+        data = self._serialize(rest_method_path, criteria.to_xml)
+        response = self._request('POST', rest_method_path, post_url, data,
+                                 stream=True)
+        if response.status_code != 200:
+            if log:
+                logging.debug(response.text)
+            return None
+        else:
+            if log:
+                logging.debug("SEARCH %s success" % post_url)
+            texecs = self._iter_texec_search(rest_method_path, response,
+                                             chunk_size, value_arrays)
+            return _ResponseIterator(response, texecs)
+
+    @_traced
     def testExecution_delete(self, testExec_id, log=True):
-        rest_method_path = 'rest/testExecution/%s' % testExec_id
-        delete_url = urljoin(self._url, rest_method_path)
-        response = self._session.delete(delete_url)
+        rest_method_path = 'rest/testExecution/%s'
+        delete_url = urljoin(self._url, rest_method_path % testExec_id)
+        response = self._request('DELETE', rest_method_path, delete_url)
         if response.status_code != 204:
             if log:
                 logging.debug(response.text)
@@ -262,43 +716,156 @@ class PerfRepoRESTAPI(object):
                 logging.debug("DELETE %s success" % delete_url)
             return True
 
-    def testExecution_add_value(self, value, log=True):
+    @_traced
+    def testExecution_add_value(self, testExec, values, log=True):
+        '''Append values to an existing test execution
+
+        The rest of the execution doesn't have to be sent again, but as
+        PerfRepo has no endpoint adding several values at once, each value
+        takes its own POST request to the addValue endpoint. testExec can
+        be an id or a PerfRepoTestExecution, which is then updated locally
+        as well. Returns the list of added values.
+
+        When a request fails, PartialAddException is raised. Its added
+        attribute holds the values sent before (already on the server and
+        in testExec), failed the value that failed and status_code the
+        status of its response, so a retry can continue with the rest
+        without duplicating values.'''
+        if isinstance(testExec, PerfRepoTestExecution):
+            testExec_id = testExec.get_id()
+        else:
+            testExec_id = testExec
+        try:
+            int(testExec_id)
+        except:
+            raise PerfRepoRESTAPIException("ID must be an integer.")
+
+        if isinstance(values, PerfRepoValue):
+            values = [values]
+
         rest_method_path = 'rest/testExecution/addValue'
         post_url = urljoin(self._url, rest_method_path)
-        #TODO
-        return self._session.post(post_url, data=value)
-
-    def testExecution_get_attachment(self, attachment_id, log=True):
+        added = []
+        for value in values:
+            root = value.to_xml()
+            root.set('testExecutionId', str(testExec_id))
+            data = self._serialize(rest_method_path, ElementTree.tostring,
+                                   root)
+            response = self._request('POST', rest_method_path, post_url, data)
+            if response.status_code != 201:
+                if log:
+                    logging.debug(response.text)
+                msg = "Adding value %d of execution %s failed" %\
+                      (len(added) + 1, testExec_id)
+                raise PartialAddException(msg, added, value,
+                                          response.status_code)
+            added.append(value)
+            if isinstance(testExec, PerfRepoTestExecution):
+                testExec.add_value(value)
+
+        if log:
+            logging.debug("POST %s success (%d values)" % (post_url,
+                                                           len(added)))
+        return added
+
+    @_traced
+    def testExecution_get_attachment(self, attachment_id, dest=None,
+                                     chunk_size=ATTACHMENT_CHUNK_SIZE,
+                                     progress=None, log=True):
         try:
             int(attachment_id)
         except:
             raise PerfRepoRESTAPIException("ID must be an integer.")
 
-        rest_method_path = 'rest/testExecution/attachment/%s' % attachment_id
-        get_url = urljoin(self._url, rest_method_path)
-        #TODO
-        return self._session.get(get_url)
-
-    def testExecution_add_attachment(self, testExec_id, attachment, log=True):
+        rest_method_path = 'rest/testExecution/attachment/%s'
+        get_url = urljoin(self._url, rest_method_path % attachment_id)
+        response = self._request('GET', rest_method_path, get_url,
+                                 stream=True)
+        if response.status_code != 200:
+            if log:
+                logging.debug(response.text)
+            response.close()
+            return None
+        else:
+            if log:
+                logging.debug("GET %s success" % get_url)
+            chunks = iter_response_chunks(response, chunk_size, progress)
+            if dest is None:
+                return chunks
+            write_chunks(chunks, dest)
+            return dest
+
+    def _attachment_exists(self, attachment_id):
+        rest_method_path = 'rest/testExecution/attachment/%s'
+        get_url = urljoin(self._url, rest_method_path % attachment_id)
+        #only the headers are read
+        response = self._request('GET', rest_method_path, get_url,
+                                 stream=True)
+        response.close()
+        return response.status_code == 200
+
+    @_traced
+    def testExecution_add_attachment(self, testExec_id, attachment,
+                                     filename=None, mimetype=None,
+                                     chunk_size=ATTACHMENT_CHUNK_SIZE,
+                                     progress=None, log=True):
         try:
             int(testExec_id)
         except:
             raise PerfRepoRESTAPIException("ID must be an integer.")
 
-        rest_method_path = 'rest/testExecution/%s/addAttachment' % testExec_id
-        post_url = urljoin(self._url, rest_method_path)
-        #TODO
-        return self._session.post(post_url, data=attachment)
+        rest_method_path = 'rest/testExecution/%s/addAttachment'
+        post_url = urljoin(self._url, rest_method_path % testExec_id)
+
+        source = AttachmentSource(attachment, filename, mimetype, chunk_size)
+        index = self._attachment_index
+        digest = None
+        if index is not None:
+            digest = source.content_digest(index.get_algorithm())
+            attachment_id = index.get(testExec_id, source.get_filename(),
+                                      digest)
+            if attachment_id is not None:
+                if not self._attachment_verify or \
+                   self._attachment_exists(attachment_id):
+                    source.close()
+                    if log:
+                        logging.debug("Attachment %s already uploaded to "\
+                                      "execution %s as %s" %\
+                                      (digest, testExec_id, attachment_id))
+                    return attachment_id
+                #removed on the server since it was indexed
+                index.remove(testExec_id, source.get_filename(), digest)
+
+        headers = {'Content-Type': source.get_mimetype(),
+                   'filename': source.get_filename()}
+        try:
+            response = self._request('POST', rest_method_path, post_url,
+                                     source.iter_chunks(progress),
+                                     headers=headers)
+        finally:
+            source.close()
+        if response.status_code != 201:
+            if log:
+                logging.debug(response.text)
+            return None
+        else:
+            new_id = response.headers["Location"].split('/')[-1]
+            if digest is not None:
+                index.add(testExec_id, source.get_filename(), digest, new_id)
+            if log:
+                logging.debug("POST %s success" % post_url)
+            return new_id
 
+    @_traced
     def report_get_by_id(self, report_id, log=True):
         try:
             int(report_id)
         except:
             raise PerfRepoRESTAPIException("ID must be an integer.")
 
-        rest_method_path = 'rest/report/id/%s' % report_id
-        get_url = urljoin(self._url, rest_method_path)
-        response = self._session.get(get_url)
+        rest_method_path = 'rest/report/id/%s'
+        get_url = urljoin(self._url, rest_method_path % report_id)
+        response = self._request('GET', rest_method_path, get_url)
         if response.status_code != 200:
             if log:
                 logging.debug(response.text)
@@ -306,15 +873,18 @@ class PerfRepoRESTAPI(object):
         else:
             if log:
                 logging.debug("GET %s success" % get_url)
-            return PerfRepoReport(response.content)
+            return self._parse(rest_method_path, PerfRepoReport,
+                               response.content)
 
+    @_traced
     def report_create(self, report, log=True):
         rest_method_path = 'rest/report/create'
         post_url = urljoin(self._url, rest_method_path)
 
         report.set_user(self._user)
 
-        response = self._session.post(post_url, data=report.to_xml_string())
+        data = self._serialize(rest_method_path, report.to_xml_string)
+        response = self._request('POST', rest_method_path, post_url, data)
         if response.status_code != 201:
             if log:
                 logging.debug(response.text)
@@ -327,13 +897,15 @@ class PerfRepoRESTAPI(object):
                 logging.info("Obj url: %s" % self.get_obj_url(report))
             return report
 
+    @_traced
     def report_update(self, report, log=True):
-        rest_method_path = 'rest/report/update/%s' % report.get_id()
-        post_url = urljoin(self._url, rest_method_path)
+        rest_method_path = 'rest/report/update/%s'
+        post_url = urljoin(self._url, rest_method_path % report.get_id())
 
         report.set_user(self._user)
 
-        response = self._session.post(post_url, data=report.to_xml_string())
+        data = self._serialize(rest_method_path, report.to_xml_string)
+        response = self._request('POST', rest_method_path, post_url, data)
         if response.status_code != 201:
             if log:
                 logging.debug(response.text)
@@ -344,15 +916,16 @@ class PerfRepoRESTAPI(object):
                 logging.info("Obj url: %s" % self.get_obj_url(report))
             return report
 
+    @_traced
     def report_delete_by_id(self, report_id, log=True):
         try:
             int(report_id)
         except:
             raise PerfRepoRESTAPIException("ID must be an integer.")
 
-        rest_method_path = 'rest/report/id/%s' % report_id
-        delete_url = urljoin(self._url, rest_method_path)
-        response = self._session.delete(delete_url)
+        rest_method_path = 'rest/report/id/%s'
+        delete_url = urljoin(self._url, rest_method_path % report_id)
+        response = self._request('DELETE', rest_method_path, delete_url)
         if response.status_code != 204:
             return False
         else:
@@ -360,11 +933,13 @@ class PerfRepoRESTAPI(object):
                 logging.debug("DELETE %s success" % delete_url)
             return True
 
+    @_traced
     def report_add_permission(self, permission, log=True):
         report_id = permission.get_report_id()
-        rest_method_path = 'rest/report/id/%s/addPermission' % report_id
-        post_url = urljoin(self._url, rest_method_path)
-        response = self._session.post(post_url, data=permission.to_xml_string())
+        rest_method_path = 'rest/report/id/%s/addPermission'
+        post_url = urljoin(self._url, rest_method_path % report_id)
+        data = self._serialize(rest_method_path, permission.to_xml_string)
+        response = self._request('POST', rest_method_path, post_url, data)
         if response.status_code != 201:
             if log:
                 logging.debug(response.text)
@@ -15,12 +15,13 @@ import re
 import pprint
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element, iselement
-from perfrepo.PerfRepoObject import PerfRepoObject
+from perfrepo.PerfRepoObject import PerfRepoObject, traced_from_xml
 from perfrepo.Common import PerfRepoException
 from perfrepo.Common import indent, dot_to_dict, recursive_dict_update
 from perfrepo.Common import dict_to_dot
 
 class PerfRepoReport(PerfRepoObject):
+    @traced_from_xml
     def __init__(self, xml=None):
         self._user = None
         if xml is None:
@@ -51,9 +52,8 @@ class PerfRepoReport(PerfRepoObject):
                 recursive_dict_update(self._properties, tmp_dict)
 
             self._permissions = []
-            for entry in root.find("permissions"):
-                if entry.tag != "permission":
-                    continue
+            #to_xml doesn't write permissions so they may be missing
+            for entry in root.findall("permissions/permission"):
                 self._permissions.append(PerfRepoReportPermission(entry))
                 self._permissions[-1].set_report_id(self._id)
                 self._permissions[-1].validate()
@@ -403,6 +403,7 @@ class PerfRepoReport(PerfRepoObject):
         return textwrap.dedent(ret_str)
 
 class PerfRepoReportPermission(PerfRepoObject):
+    @traced_from_xml
     def __init__(self, xml=None):
         self._report_id = None
         self._access_type = None
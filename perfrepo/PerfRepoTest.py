@@ -13,12 +13,13 @@ olichtne@redhat.com (Ondrej Lichtner)
 import textwrap
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element, iselement
-from perfrepo.PerfRepoObject import PerfRepoObject
+from perfrepo.PerfRepoObject import PerfRepoObject, traced_from_xml
 from perfrepo.PerfRepoMetric import PerfRepoMetric
 from perfrepo.Common import PerfRepoException
 from perfrepo.Common import indent
 
 class PerfRepoTest(PerfRepoObject):
+    @traced_from_xml
     def __init__(self, xml=None):
         if xml is None:
             self._id = None
@@ -14,14 +14,20 @@ import datetime
 import textwrap
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element, iselement
-from perfrepo.PerfRepoObject import PerfRepoObject
-from perfrepo.PerfRepoValue import PerfRepoValue
+from perfrepo.PerfRepoObject import PerfRepoObject, traced_from_xml
+from perfrepo.PerfRepoValue import PerfRepoValue, PerfRepoValueArray
 from perfrepo.PerfRepoTest import PerfRepoTest
 from perfrepo.Common import PerfRepoException
 from perfrepo.Common import indent
 
+#when parsing with value_arrays, metrics with at least this many values in
+#an execution are parsed into a PerfRepoValueArray instead of separate
+#PerfRepoValue objects
+VALUE_ARRAY_THRESHOLD = 16
+
 class PerfRepoTestExecution(PerfRepoObject):
-    def __init__(self, xml=None):
+    @traced_from_xml
+    def __init__(self, xml=None, value_arrays=False):
         if xml is None:
             self._id = None
             self._name = None
@@ -31,8 +37,10 @@ class PerfRepoTestExecution(PerfRepoObject):
             self._comment = ""
 
             self._values = []
+            self._value_arrays = []
             self._tags = []
             self._parameters = []
+            self._attachments = []
         elif isinstance(xml, str) or isinstance(xml, bytes) or iselement(xml):
             if isinstance(xml, str) or isinstance(xml, bytes):
                 root = ElementTree.fromstring(xml)
@@ -52,10 +60,22 @@ class PerfRepoTestExecution(PerfRepoObject):
                 self._comment = ""
 
             self._values = []
-            for value in root.find("values"):
-                if value.tag != "value":
+            self._value_arrays = []
+            values = [value for value in root.find("values")
+                      if value.tag == "value"]
+            array_metrics = set()
+            if value_arrays:
+                array_metrics = self._array_metrics(values)
+            arrays = {}
+            for value in values:
+                name = value.get("metricName")
+                if name not in array_metrics:
+                    self._values.append(PerfRepoValue(value))
                     continue
-                self._values.append(PerfRepoValue(value))
+                if name not in arrays:
+                    arrays[name] = PerfRepoValueArray(name)
+                    self._value_arrays.append(arrays[name])
+                arrays[name].append_xml(value)
 
             self._tags = []
             for tag in root.find("tags"):
@@ -68,10 +88,31 @@ class PerfRepoTestExecution(PerfRepoObject):
                 if param.tag != "parameter":
                     continue
                 self._parameters.append((param.get("name"), param.get("value")))
+
+            #attachments are added through a separate REST call, they're
+            #only read here and never serialized
+            self._attachments = []
+            for attachment in root.findall("attachments/attachment"):
+                self._attachments.append((attachment.get("id"),
+                                          attachment.get("filename"),
+                                          attachment.get("mimetype")))
         else:
             raise PerfRepoException("Parameter xml must be"\
                                     " a string, an Element or None")
 
+    def _array_metrics(self, values):
+        counts = {}
+        comparators = {}
+        for value in values:
+            name = value.get("metricName")
+            counts[name] = counts.get(name, 0) + 1
+            comparators.setdefault(name, set()).add(
+                                            value.get("metricComparator"))
+        #an array has a single comparator for all of its samples
+        return set(name for name, count in counts.items()
+                   if count >= VALUE_ARRAY_THRESHOLD and
+                      len(comparators[name]) == 1)
+
     def get_obj_url(self):
         return "exec/%s" % self._id
 
@@ -123,13 +164,33 @@ class PerfRepoTestExecution(PerfRepoObject):
     def add_value(self, value):
         self._values.append(value)
 
-    def get_values(self):
-        return self._values
+    def get_values(self, expand=True):
+        '''Returns the values
+
+        Values of value arrays follow the others as new PerfRepoValue
+        objects, so changing them doesn't change the execution. With
+        expand False only the other values are returned.'''
+        if not expand or not self._value_arrays:
+            return self._values
+        values = list(self._values)
+        for value_array in self._value_arrays:
+            values.extend(value_array)
+        return values
 
     def get_value(self, metric_name):
         for val in self._values:
             if val.get_metricName() == metric_name:
                 return val
+        for value_array in self._value_arrays:
+            if value_array.get_metricName() == metric_name and \
+               len(value_array) > 0:
+                return value_array.get_value(0)
+
+    def add_value_array(self, value_array):
+        self._value_arrays.append(value_array)
+
+    def get_value_arrays(self):
+        return self._value_arrays
 
     def add_tag(self, tag):
         if tag is None or tag in self._tags:
@@ -149,7 +210,41 @@ class PerfRepoTestExecution(PerfRepoObject):
     def get_parameters(self):
         return self._parameters
 
+    def get_attachments(self):
+        '''Returns (id, filename, mimetype) of the attachments'''
+        return self._attachments
+
+    def to_dict(self):
+        return {"id": self._id,
+                "name": self._name,
+                "started": self._started,
+                "testId": self._testId,
+                "testUid": self._testUid,
+                "comment": self._comment,
+                "tags": list(self._tags),
+                "parameters": dict(self._parameters),
+                "values": [value.to_dict() for value in self.get_values()]}
+
     def to_xml(self):
+        return self._to_xml(True)
+
+    def _xml_string(self):
+        if not self._value_arrays:
+            return ElementTree.tostring(self.to_xml())
+        #values are the last element, the samples of value arrays are
+        #serialized directly into it
+        xml = ElementTree.tostring(self._to_xml(False))
+        values_start = xml.rfind(b"<values")
+        values = xml[values_start:-len(b"</testExecution>")]
+        if values.endswith(b" />"):
+            values = values[:-len(b" />")] + b">" + b"</values>"
+        values = values[:-len(b"</values>")] + \
+                 b"".join(value_array.to_xml_bytes()
+                          for value_array in self._value_arrays) + \
+                 b"</values>"
+        return xml[:values_start] + values + b"</testExecution>"
+
+    def _to_xml(self, value_arrays):
         root = Element('testExecution')
         self._set_element_atrib(root, 'id', self._id)
         self._set_element_atrib(root, 'name', self._name)
@@ -173,6 +268,9 @@ class PerfRepoTestExecution(PerfRepoObject):
         values = ElementTree.SubElement(root, 'values')
         for value in self._values:
             values.append(value.to_xml())
+        if value_arrays:
+            for value_array in self._value_arrays:
+                value_array.to_xml_elements(values)
 
         return root
 
@@ -197,11 +295,17 @@ class PerfRepoTestExecution(PerfRepoObject):
         for param in self._parameters:
             ret_str +=  indent("%s = %s\n" % (param[0], param[1]), 4)
         ret_str += "values:\n"
-        for val in self._values:
+        for val in self.get_values():
             ret_str +=  indent(str(val) + "\n", 4)
             ret_str +=  indent("------------------------\n", 4)
         return textwrap.dedent(ret_str)
 
+SEARCH_ORDER_BY = ["DATE_ASC", "DATE_DESC", "NAME_ASC", "NAME_DESC",
+                   "PARAMETER_ASC", "PARAMETER_DESC", "VERSION_ASC",
+                   "VERSION_DESC"]
+
+SEARCH_GROUP_FILTERS = ["ALL_GROUPS", "MY_GROUPS"]
+
 class PerfRepoTestExecutionSearch():
     def __init__(self, xml=None):
         self._ids = None
@@ -212,6 +316,10 @@ class PerfRepoTestExecutionSearch():
         self._after = None
         self._before = None
         self._howmany = None
+        self._limit_from = None
+        self._order_by = None
+        self._order_by_parameter = None
+        self._group_filter = None
 
         if isinstance(xml, str) or isinstance(xml, bytes) or iselement(xml):
             if isinstance(xml, str) or isinstance(xml, bytes):
@@ -228,18 +336,35 @@ class PerfRepoTestExecutionSearch():
                     ids.append(id.text)
                 self.set_ids(ids)
 
-            self._testname = root.get("test-name")
-            self._testUid = root.get("test-uid")
+            self._testname = root.findtext("test-name")
+            self._testUid = root.findtext("test-uid")
             elem_tags = root.find("tags")
             if elem_tags is not None and elem_tags.text is not None:
                 tags = root.find("tags").text
                 self._tags = tags.split()
 
-            params = root.find("parameters")
-            for param in params.findall("parameter"):
-                pname = param.find("name")
-                pvalue = param.find("value")
-                self.add_parameter(pname.text, pvalue.text)
+            for param in root.findall("parameters/parameter"):
+                self.add_parameter(param.findtext("name"),
+                                   param.findtext("value"))
+
+            self._after = root.findtext("executed-after")
+            self._before = root.findtext("executed-before")
+            howmany = root.findtext("how-many")
+            if howmany:
+                self.set_howmany(int(howmany))
+            limit_from = root.findtext("limit-from")
+            if limit_from:
+                self.set_limit_from(int(limit_from))
+            order_by = root.findtext("order-by")
+            if order_by:
+                self.set_order_by(order_by,
+                                  root.findtext("order-by-parameter"))
+            group_filter = root.findtext("group-filter")
+            if group_filter:
+                self.set_group_filter(group_filter)
+        elif xml is not None:
+            raise PerfRepoException("Parameter xml must be"\
+                                    " a string, an Element or None")
 
     def set_ids(self, ids):
         self._ids = ids
@@ -297,9 +422,57 @@ class PerfRepoTestExecutionSearch():
 
         self._before = before.isoformat()
 
+    def get_after_date(self):
+        return self._after
+
+    def get_before_date(self):
+        return self._before
+
     def set_howmany(self, howmany):
         self._howmany = howmany
 
+    def get_howmany(self):
+        return self._howmany
+
+    def set_limit_from(self, limit_from):
+        '''Skip the first limit_from results'''
+        self._limit_from = limit_from
+
+    def get_limit_from(self):
+        return self._limit_from
+
+    def set_order_by(self, order_by, parameter=None):
+        '''order_by is one of SEARCH_ORDER_BY, PARAMETER_* and VERSION_*
+        orderings need the name of the parameter to order by'''
+        if order_by is None:
+            self._order_by = None
+            self._order_by_parameter = None
+            return
+        if order_by not in SEARCH_ORDER_BY:
+            raise PerfRepoException("Invalid order-by '%s'" % order_by)
+        if order_by.startswith(("PARAMETER_", "VERSION_")) and \
+           parameter is None:
+            raise PerfRepoException("Ordering by parameter requires "\
+                                    "a parameter name")
+        self._order_by = order_by
+        self._order_by_parameter = parameter
+
+    def get_order_by(self):
+        return self._order_by
+
+    def get_order_by_parameter(self):
+        return self._order_by_parameter
+
+    def set_group_filter(self, group_filter):
+        if group_filter is not None and \
+           group_filter not in SEARCH_GROUP_FILTERS:
+            raise PerfRepoException("Invalid group filter '%s'" %\
+                                    group_filter)
+        self._group_filter = group_filter
+
+    def get_group_filter(self):
+        return self._group_filter
+
     def to_xml(self):
         root = Element('test-execution-search')
 
@@ -326,12 +499,8 @@ class PerfRepoTestExecutionSearch():
             sub.text = str(param[1])
 
         if len(self._tags):
-            tags_str = ""
-            for tag in self._tags:
-                tags_str += " %s" % str(tag)
-
             tags = ElementTree.SubElement(root, 'tags')
-            tags.text = tags_str
+            tags.text = " ".join(str(tag) for tag in self._tags)
 
         if self._after:
             after = ElementTree.SubElement(root, 'executed-after')
@@ -345,4 +514,20 @@ class PerfRepoTestExecutionSearch():
             howmany = ElementTree.SubElement(root, 'how-many')
             howmany.text = str(self._howmany)
 
+        if self._limit_from:
+            limit_from = ElementTree.SubElement(root, 'limit-from')
+            limit_from.text = str(self._limit_from)
+
+        if self._order_by:
+            order_by = ElementTree.SubElement(root, 'order-by')
+            order_by.text = self._order_by
+            if self._order_by_parameter is not None:
+                order_param = ElementTree.SubElement(root,
+                                                     'order-by-parameter')
+                order_param.text = self._order_by_parameter
+
+        if self._group_filter:
+            group_filter = ElementTree.SubElement(root, 'group-filter')
+            group_filter.text = self._group_filter
+
         return ElementTree.tostring(root)
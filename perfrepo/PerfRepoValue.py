@@ -11,6 +11,7 @@ olichtne@redhat.com (Ondrej Lichtner)
 """
 
 import textwrap
+from array import array
 from xml.etree import ElementTree
 from xml.etree.ElementTree import Element, iselement
 from perfrepo.PerfRepoObject import PerfRepoObject
@@ -71,6 +72,12 @@ class PerfRepoValue(PerfRepoObject):
     def get_result(self):
         return self._result
 
+    def to_dict(self):
+        return {"metricName": self._metricName,
+                "metricComparator": self._metricComparator,
+                "result": self._result,
+                "parameters": dict(self._parameters)}
+
     def to_xml(self):
         root = Element('value')
         self._set_element_atrib(root, 'metricComparator',
@@ -96,3 +103,174 @@ class PerfRepoValue(PerfRepoObject):
         for param in self._parameters:
             ret_str +=  indent("%s = %s\n" % (param[0], param[1]), 4)
         return textwrap.dedent(ret_str)
+
+class PerfRepoValueArray(object):
+    '''Samples of one metric stored as columns
+
+    Results are kept in an array of doubles and every parameter in a
+    column (None where a sample doesn't have it) of interned strings. The
+    samples are expanded to PerfRepoValue objects or value elements only
+    on access or serialization.'''
+    def __init__(self, metric_name=None, comparator=None):
+        self._metricName = metric_name
+        self._metricComparator = comparator
+        self._results = array("d")
+        self._param_names = []
+        self._columns = {}
+        self._strings = {}
+
+    def _intern(self, string):
+        if string is None:
+            return None
+        return self._strings.setdefault(string, string)
+
+    def set_metricName(self, name):
+        self._metricName = name
+
+    def get_metricName(self):
+        return self._metricName
+
+    def set_comparator(self, comparator):
+        if comparator not in ["HB", "LB"]:
+            raise PerfRepoException("Comparator must be HB/LB.")
+        self._metricComparator = comparator
+
+    def get_comparator(self):
+        return self._metricComparator
+
+    def append(self, result, parameters=()):
+        '''Adds a sample, parameters is a list of (name, value) pairs'''
+        result = float(result)
+        names = set()
+        for name, value in parameters:
+            if name in names:
+                raise PerfRepoException("Duplicate parameter '%s'" % name)
+            names.add(name)
+
+        num = len(self._results)
+        self._results.append(result)
+        for name, value in parameters:
+            column = self._columns.get(name)
+            if column is None:
+                self._param_names.append(name)
+                column = self._columns[name] = [None] * num
+            column.append(self._intern(value))
+        for column in self._columns.values():
+            if len(column) == num:
+                column.append(None)
+
+    def append_xml(self, root):
+        '''Adds a sample parsed from a value element, its comparator must
+        be the same as that of the previous samples'''
+        comparator = root.get("metricComparator")
+        if len(self._results) > 0 and comparator != self._metricComparator:
+            raise PerfRepoException("Comparator '%s' differs from the "\
+                                    "comparator '%s' of the array" %\
+                                    (comparator, self._metricComparator))
+        params = root.find("parameters")
+        if params is None:
+            params = []
+        self.append(root.get("result"),
+                    [(param.get("name"), param.get("value"))
+                     for param in params if param.tag == "parameter"])
+        self._metricComparator = comparator
+
+    def __len__(self):
+        return len(self._results)
+
+    def get_results(self):
+        '''Returns the array of results, to be used e.g. as a numpy
+        buffer'''
+        return self._results
+
+    def get_parameter_names(self):
+        return list(self._param_names)
+
+    def get_parameter_column(self, name):
+        '''Returns the values of parameter name of all samples'''
+        return self._columns.get(name, [None] * len(self._results))
+
+    def get_parameters(self, index):
+        return [(name, self._columns[name][index])
+                for name in self._param_names
+                if self._columns[name][index] is not None]
+
+    def get_value(self, index):
+        '''Returns the sample at index as a new PerfRepoValue'''
+        value = PerfRepoValue()
+        value._metricName = self._metricName
+        value._metricComparator = self._metricComparator
+        value._result = self._results[index]
+        value._parameters = self.get_parameters(index)
+        return value
+
+    def __iter__(self):
+        for index in range(len(self._results)):
+            yield self.get_value(index)
+
+    def to_dict(self):
+        return {"metricName": self._metricName,
+                "metricComparator": self._metricComparator,
+                "results": list(self._results),
+                "parameters": dict((name, list(self._columns[name]))
+                                   for name in self._param_names)}
+
+    def to_xml_bytes(self):
+        '''Returns the value elements of all samples serialized, much
+        faster than building them
+
+        Like PerfRepoValue.to_xml, attributes that are None are left
+        out.'''
+        escaped = {}
+
+        def escape(string):
+            if string not in escaped:
+                escaped[string] = string.replace("&", "&amp;")\
+                                        .replace("<", "&lt;")\
+                                        .replace(">", "&gt;")\
+                                        .replace('"', "&quot;")\
+                                        .replace("\n", "&#10;")\
+                                        .replace("\r", "&#13;")\
+                                        .replace("\t", "&#09;")
+            return escaped[string]
+
+        head = '<value '
+        if self._metricComparator is not None:
+            head += 'metricComparator="%s" ' % escape(self._metricComparator)
+        if self._metricName is not None:
+            head += 'metricName="%s" ' % escape(self._metricName)
+        head += 'result="'
+        columns = [('name="%s" ' % escape(name) if name is not None else "",
+                    self._columns[name])
+                   for name in self._param_names]
+        parts = []
+        for index, result in enumerate(self._results):
+            parts.append(head)
+            parts.append(repr(result))
+            parts.append('"><parameters>')
+            for name, column in columns:
+                if column[index] is not None:
+                    parts.append('<parameter %svalue="%s" />' %\
+                                 (name, escape(column[index])))
+            parts.append('</parameters></value>')
+        return "".join(parts).encode("ascii", "xmlcharrefreplace")
+
+    def to_xml_elements(self, parent):
+        '''Appends a value element per sample to parent'''
+        SubElement = ElementTree.SubElement
+        attrs = {}
+        if self._metricName is not None:
+            attrs["metricName"] = self._metricName
+        if self._metricComparator is not None:
+            attrs["metricComparator"] = self._metricComparator
+        columns = [(name, self._columns[name]) for name in self._param_names]
+        for index, result in enumerate(self._results):
+            attrs["result"] = repr(result)
+            root = SubElement(parent, "value", attrs)
+            parameters = SubElement(root, "parameters")
+            for name, column in columns:
+                if column[index] is not None:
+                    param_attrs = {"value": column[index]}
+                    if name is not None:
+                        param_attrs["name"] = name
+                    SubElement(parameters, "parameter", param_attrs)
@@ -0,0 +1,211 @@
+"""
+This module contains a client side planner for large TestExecution searches.
+
+A search with many ids or a wide date range is split into smaller searches
+(batches of ids, windows of the date range) that run concurrently. Their
+results are merged in plan order with duplicates removed.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import re
+import copy
+import datetime
+from multiprocessing.pool import ThreadPool
+from perfrepo.Common import PerfRepoException, parse_iso_date
+
+DEFAULT_MAX_IDS = 500
+
+_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+#windows overlap so that executions started exactly on a boundary aren't
+#lost whether the server compares inclusively or not
+_WINDOW_OVERLAP = datetime.timedelta(seconds=1)
+
+class PlannerException(PerfRepoException):
+    pass
+
+def _version_key(version):
+    return [int(part) if part.isdigit() else 0
+            for part in re.split(r"[.-]", version or "")]
+
+def _id_key(exec_id):
+    try:
+        return (0, int(exec_id), "")
+    except (TypeError, ValueError):
+        return (1, 0, str(exec_id))
+
+def _date_key(texec):
+    #executions without a valid date come first, like on the server
+    try:
+        return parse_iso_date(texec.get_started())
+    except PerfRepoException:
+        return datetime.datetime.min
+
+def order_key(order_by, parameter=None):
+    '''Returns a sort key function matching a search order-by value'''
+    def param_value(texec):
+        for name, value in texec.get_parameters():
+            if name == parameter:
+                return value or ""
+        return ""
+
+    if order_by.startswith("DATE"):
+        key = _date_key
+    elif order_by.startswith("NAME"):
+        key = lambda texec: texec.get_name() or ""
+    elif order_by.startswith("VERSION"):
+        key = lambda texec: _version_key(param_value(texec))
+    else:
+        key = param_value
+    #ties are ordered by id
+    return lambda texec: (key(texec), _id_key(texec.get_id()))
+
+class SearchPlanner(object):
+    '''Splits TestExecution searches into concurrently run chunks
+
+    Searches with more than max_ids ids are split into batches of max_ids.
+    When window (a datetime.timedelta) is set, searches with both
+    executed-after and executed-before dates spanning more than window are
+    split into consecutive windows. jobs chunks are searched concurrently.
+
+    limit-from and how-many of split searches are applied to the merged
+    results, which requires an order-by, as without it the order of the
+    merged results differs from that of a single search. Ordered searches
+    split only by date are merged by ordering the windows, other ordered
+    split searches are sorted on the client once all chunks are done.'''
+    def __init__(self, api, max_ids=DEFAULT_MAX_IDS, window=None, jobs=4):
+        if max_ids < 1 or jobs < 1:
+            raise PlannerException("max_ids and jobs must be at least 1")
+        self._api = api
+        self._max_ids = max_ids
+        self._window = window
+        self._jobs = jobs
+
+    def _split_ids(self, criteria):
+        ids = criteria.get_ids()
+        if not ids or len(ids) <= self._max_ids:
+            return [criteria]
+
+        chunks = []
+        for i in range(0, len(ids), self._max_ids):
+            chunk = copy.deepcopy(criteria)
+            chunk.set_ids(ids[i:i+self._max_ids])
+            chunks.append(chunk)
+        return chunks
+
+    def _split_dates(self, criteria):
+        after = criteria.get_after_date()
+        before = criteria.get_before_date()
+        if self._window is None or after is None or before is None:
+            return [criteria]
+
+        start = parse_iso_date(after)
+        end = parse_iso_date(before)
+        if end - start <= self._window:
+            return [criteria]
+
+        chunks = []
+        while start < end:
+            stop = min(start + self._window, end)
+            chunk = copy.deepcopy(criteria)
+            chunk.set_after_date(start.strftime(_DATE_FORMAT), _DATE_FORMAT)
+            if stop < end:
+                chunk_end = stop + _WINDOW_OVERLAP
+            else:
+                chunk_end = end
+            chunk.set_before_date(chunk_end.strftime(_DATE_FORMAT),
+                                  _DATE_FORMAT)
+            chunks.append(chunk)
+            start = stop
+        return chunks
+
+    def plan(self, criteria):
+        '''Returns the list of search criteria the search is split into'''
+        chunks = []
+        for id_chunk in self._split_ids(criteria):
+            chunks.extend(self._split_dates(id_chunk))
+        if len(chunks) == 1:
+            return chunks
+
+        if criteria.get_order_by() is None and \
+           (criteria.get_limit_from() or criteria.get_howmany()):
+            raise PlannerException("Paging a split search requires an "\
+                                   "order-by")
+
+        #every chunk may hold the whole requested page
+        limit_from = criteria.get_limit_from() or 0
+        howmany = criteria.get_howmany()
+        for chunk in chunks:
+            chunk.set_limit_from(None)
+            if howmany:
+                chunk.set_howmany(limit_from + int(howmany))
+        if criteria.get_order_by() == "DATE_DESC":
+            chunks.reverse()
+        return chunks
+
+    def _search(self, criteria):
+        texecs = self._api.testExecution_search_iter(criteria, log=False)
+        if texecs is None:
+            raise PlannerException("Search of a planned chunk failed")
+        return list(texecs)
+
+    def search_iter(self, criteria):
+        '''Yields the TestExecutions found by the planned search
+
+        Results are yielded in plan order as soon as all preceding chunks
+        are done, executions found by multiple chunks only once.'''
+        chunks = self.plan(criteria)
+
+        if len(chunks) == 1:
+            texecs = self._api.testExecution_search_iter(chunks[0],
+                                                         log=False)
+            if texecs is None:
+                raise PlannerException("Search failed")
+            for texec in texecs:
+                yield texec
+            return
+
+        order_by = criteria.get_order_by()
+        sort = order_by is not None and \
+               (len(self._split_ids(criteria)) > 1 or
+                not order_by.startswith("DATE"))
+        skip = criteria.get_limit_from() or 0
+        limit = criteria.get_howmany()
+        seen = set()
+        count = 0
+
+        pool = ThreadPool(min(self._jobs, len(chunks)))
+        try:
+            results = pool.imap(self._search, chunks)
+            if sort:
+                merged = [texec for texecs in results for texec in texecs]
+                merged.sort(key=order_key(order_by,
+                                          criteria.get_order_by_parameter()),
+                            reverse=order_by.endswith("_DESC"))
+                results = [merged]
+
+            for texecs in results:
+                for texec in texecs:
+                    if texec.get_id() in seen:
+                        continue
+                    seen.add(texec.get_id())
+                    if skip > 0:
+                        skip -= 1
+                        continue
+                    yield texec
+                    count += 1
+                    if limit and count >= int(limit):
+                        return
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def search(self, criteria):
+        return list(self.search_iter(criteria))
@@ -0,0 +1,255 @@
+"""
+This module contains the profiler used by the perfrepo-cli --profile mode.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+from __future__ import print_function
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import sys
+import threading
+import cProfile
+from perfrepo.Common import timer
+from perfrepo.Instrumentation import PerfRepoInstrumentation
+
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    from importlib.machinery import ModuleSpec
+except ImportError:
+    ModuleSpec = None
+
+class _Phase(object):
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._start = timer()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._profiler.add_time(self._name, timer() - self._start)
+        return False
+
+class _TimedLoader(object):
+    '''Wraps the loader of a module spec and times the module execution'''
+    def __init__(self, finder, loader):
+        self._finder = finder
+        self._loader = loader
+
+    def create_module(self, spec):
+        create_module = getattr(self._loader, "create_module", None)
+        if create_module is None:
+            return None
+        return create_module(spec)
+
+    def exec_module(self, module):
+        #the module only ever sees its real loader
+        module.__loader__ = self._loader
+        if getattr(module, "__spec__", None) is not None:
+            module.__spec__.loader = self._loader
+        with self._finder.timed():
+            self._loader.exec_module(module)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+class _ImportTimer(object):
+    '''sys.meta_path finder that times the imports done by any means, the
+    import statement, __import__ or importlib.import_module
+
+    Finding is delegated to the finders behind it, the loaders of the found
+    specs are wrapped. Only the outermost import of a thread is timed, the
+    nested ones are part of its time.'''
+    def __init__(self, profiler):
+        self._profiler = profiler
+        self._local = threading.local()
+
+    def timed(self):
+        return _Nested(self)
+
+    def find_spec(self, fullname, path=None, target=None):
+        if getattr(self._local, "finding", False):
+            return None
+
+        self._local.finding = True
+        try:
+            with self.timed():
+                for finder in sys.meta_path:
+                    find_spec = getattr(finder, "find_spec", None)
+                    if finder is self or find_spec is None:
+                        continue
+                    spec = find_spec(fullname, path, target)
+                    if spec is not None:
+                        break
+                else:
+                    return None
+        finally:
+            self._local.finding = False
+
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(self, spec.loader)
+        return spec
+
+class _Nested(object):
+    def __init__(self, timer_finder):
+        self._finder = timer_finder
+
+    def __enter__(self):
+        local = self._finder._local
+        local.depth = getattr(local, "depth", 0) + 1
+        if local.depth == 1:
+            self._start = timer()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        local = self._finder._local
+        local.depth -= 1
+        if local.depth == 0:
+            self._finder._profiler.add_time("imports", timer() - self._start)
+        return False
+
+class CLIProfiler(object):
+    '''Breaks down the time of a CLI invocation into phases
+
+    Network, XML parsing and serialization times come from a
+    PerfRepoInstrumentation attached to the REST API object, import time
+    from a sys.meta_path finder (a wrapper of __import__ where import specs
+    aren't available) and output formatting time from the wrappers of print
+    and ExecutionWriter the CLI commands are given. Optionally runs cProfile and tracemalloc
+    over the command.'''
+    def __init__(self, stats_file=None, memory=False):
+        self._times = {}
+        self._stats_file = stats_file
+        self._memory = memory
+        self._instrumentation = PerfRepoInstrumentation()
+        self._cprofile = None
+        self._peak_memory = None
+        self._orig_import = None
+        self._import_depth = 0
+        self._import_timer = None
+        self._start = None
+        self._total = None
+
+    def add_time(self, name, seconds):
+        self._times[name] = self._times.get(name, 0.0) + seconds
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def attach(self, api):
+        api.set_instrumentation(self._instrumentation)
+
+    def wrap_print(self, print_func):
+        def timed_print(*args, **kwargs):
+            start = timer()
+            try:
+                return print_func(*args, **kwargs)
+            finally:
+                self.add_time("output formatting", timer() - start)
+        return timed_print
+
+    def wrap_writer(self, writer_class):
+        '''Returns a subclass of writer_class, e.g. ExecutionWriter, whose
+        writes count as output formatting'''
+        profiler = self
+
+        class TimedWriter(writer_class):
+            def write(self, *args, **kwargs):
+                start = timer()
+                try:
+                    return super(TimedWriter, self).write(*args, **kwargs)
+                finally:
+                    profiler.add_time("output formatting", timer() - start)
+        return TimedWriter
+
+    def _timed_import(self, *args, **kwargs):
+        if self._import_depth > 0:
+            return self._orig_import(*args, **kwargs)
+
+        self._import_depth += 1
+        start = timer()
+        try:
+            return self._orig_import(*args, **kwargs)
+        finally:
+            self._import_depth -= 1
+            self.add_time("imports", timer() - start)
+
+    def start(self):
+        if ModuleSpec is not None:
+            self._import_timer = _ImportTimer(self)
+            sys.meta_path.insert(0, self._import_timer)
+        else:
+            self._orig_import = builtins.__import__
+            builtins.__import__ = self._timed_import
+
+        if self._memory and tracemalloc is not None:
+            tracemalloc.start()
+        if self._stats_file is not None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._start = timer()
+
+    def stop(self):
+        self._total = timer() - self._start
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self._stats_file)
+        if self._memory and tracemalloc is not None:
+            self._peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        if self._import_timer is not None:
+            sys.meta_path.remove(self._import_timer)
+            self._import_timer = None
+        else:
+            builtins.__import__ = self._orig_import
+
+    def report(self, f=sys.stderr):
+        totals = self._instrumentation.totals()
+        times = dict(self._times)
+        times["network"] = totals["network"]
+        times["xml parsing"] = totals["parse"]
+        times["xml serialization"] = totals["serialize"]
+
+        measured = sum(times.get(name, 0.0) for name in
+                       ["imports", "network", "xml parsing",
+                        "xml serialization", "output formatting"])
+        startup = times.get("startup imports", 0.0) + \
+                  times.get("config loading", 0.0)
+        total = (self._total or 0.0) + startup
+        times["other"] = max((self._total or 0.0) - measured, 0.0)
+
+        print("Profile:", file=f)
+        for name in ["startup imports", "config loading", "imports",
+                     "network", "xml parsing", "xml serialization",
+                     "output formatting", "other"]:
+            seconds = times.get(name, 0.0)
+            share = 100.0 * seconds / total if total else 0.0
+            print("    %-20s %10.3f ms %6.1f%%" % (name, seconds * 1000,
+                                                    share), file=f)
+        print("    %-20s %10.3f ms" % ("total", total * 1000), file=f)
+        print("    %-20s %10d" % ("requests", totals["requests"]), file=f)
+        if self._memory:
+            if self._peak_memory is None:
+                print("    peak memory: tracemalloc not available", file=f)
+            else:
+                print("    %-20s %10.1f KiB" % ("peak memory",
+                                                self._peak_memory / 1024.0),
+                      file=f)
+        if self._stats_file is not None:
+            print("    cProfile stats written to %s" % self._stats_file,
+                  file=f)
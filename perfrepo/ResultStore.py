@@ -0,0 +1,198 @@
+"""
+This module contains a memory bounded store of TestExecution search
+results.
+
+Executions are kept in memory until their estimated size exceeds the
+memory budget, then all of them are moved to a temporary sqlite database
+and read back on access.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import os
+import sqlite3
+import tempfile
+from perfrepo.Common import PerfRepoException, parse_iso_date
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024
+
+#number of executions written to or read from the database at once
+_BATCH_SIZE = 256
+
+def estimate_size(texec):
+    '''Returns a rough estimate of the memory used by a TestExecution'''
+    size = 700 + 64 * len(texec.get_tags()) + \
+           180 * len(texec.get_parameters()) + len(texec.get_comment() or "")
+    for value in texec.get_values(expand=False):
+        size += 150 + 180 * len(value.get_parameters())
+    for value_array in texec.get_value_arrays():
+        size += 500 + len(value_array) * \
+                (8 + 8 * len(value_array.get_parameter_names()))
+    return size
+
+def _started_key(texec):
+    try:
+        return parse_iso_date(texec.get_started()).isoformat()
+    except PerfRepoException:
+        return ""
+
+class ExecutionStore(object):
+    '''Sequence of TestExecutions held within a memory budget
+
+    Supports len(), iteration, indexing (slices return lists) and sorting
+    by the started date. Once the estimated size of the executions
+    exceeds max_memory bytes they're spilled into a temporary database in
+    directory (the system default if None), which is removed by close().
+    Every access of a spilled execution returns a new object.'''
+    def __init__(self, max_memory=DEFAULT_MAX_MEMORY, directory=None):
+        self._max_memory = max_memory
+        self._directory = directory
+        self._memory = []
+        self._size = 0
+        self._db = None
+        self._path = None
+        self._pending = []
+        self._count = 0
+
+    @classmethod
+    def collect(cls, texecs, max_memory=DEFAULT_MAX_MEMORY, directory=None):
+        '''Returns a store holding all the TestExecutions of an iterable'''
+        store = cls(max_memory, directory)
+        try:
+            for texec in texecs:
+                store.append(texec)
+        except:
+            store.close()
+            raise
+        return store
+
+    def is_spilled(self):
+        return self._db is not None
+
+    def _spill(self):
+        fd, self._path = tempfile.mkstemp(prefix="perfrepo-", suffix=".db",
+                                          dir=self._directory)
+        os.close(fd)
+        #the store isn't tied to the thread that created it
+        self._db = sqlite3.connect(self._path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=OFF")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE executions (seq INTEGER PRIMARY KEY,"
+                         " started TEXT, data BLOB)")
+        #position of every execution, differs from seq once sorted
+        self._db.execute("CREATE TABLE positions (pos INTEGER PRIMARY KEY,"
+                         " seq INTEGER)")
+        self._insert(self._memory, 0)
+        self._memory = []
+        self._size = 0
+
+    def _insert(self, texecs, start):
+        rows = []
+        for num, texec in enumerate(texecs):
+            data = pickle.dumps(texec, pickle.HIGHEST_PROTOCOL)
+            rows.append((start + num, _started_key(texec),
+                         sqlite3.Binary(data)))
+        self._db.executemany("INSERT INTO executions VALUES (?, ?, ?)", rows)
+        self._db.executemany("INSERT INTO positions VALUES (?, ?)",
+                             [(seq, seq) for seq, started, data in rows])
+        self._db.commit()
+
+    def _flush(self):
+        if self._pending:
+            self._insert(self._pending, self._count - len(self._pending))
+            self._pending = []
+
+    def append(self, texec):
+        self._count += 1
+        if self._db is not None:
+            self._pending.append(texec)
+            if len(self._pending) >= _BATCH_SIZE:
+                self._flush()
+            return
+        self._memory.append(texec)
+        self._size += estimate_size(texec)
+        if self._size > self._max_memory:
+            self._spill()
+
+    def sort_by_started(self, reverse=False):
+        '''Sorts the executions by their started date, stable'''
+        if self._db is None:
+            self._memory.sort(key=_started_key, reverse=reverse)
+            return
+        self._flush()
+        order = "DESC" if reverse else "ASC"
+        self._db.execute("DELETE FROM positions")
+        #new rowids are one above the highest, start them from 0
+        self._db.execute("INSERT INTO positions VALUES (-1, -1)")
+        self._db.execute("INSERT INTO positions (seq) SELECT seq FROM"
+                         " executions ORDER BY started %s, seq" % order)
+        self._db.execute("DELETE FROM positions WHERE pos = -1")
+        self._db.commit()
+
+    def _load(self, data):
+        return pickle.loads(bytes(data))
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        if self._db is None:
+            return iter(self._memory)
+        return self._iter_spilled()
+
+    def _iter_spilled(self):
+        self._flush()
+        pos = 0
+        while pos < self._count:
+            rows = self._db.execute("SELECT e.data FROM positions p JOIN"
+                                    " executions e ON e.seq = p.seq"
+                                    " WHERE p.pos >= ? ORDER BY p.pos"
+                                    " LIMIT ?", (pos, _BATCH_SIZE)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._load(row[0])
+            pos += len(rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if index < 0 or index >= self._count:
+            raise IndexError("ExecutionStore index out of range")
+        if self._db is None:
+            return self._memory[index]
+        self._flush()
+        row = self._db.execute("SELECT e.data FROM positions p JOIN"
+                               " executions e ON e.seq = p.seq"
+                               " WHERE p.pos = ?", (index,)).fetchone()
+        return self._load(row[0])
+
+    def close(self):
+        '''Removes the temporary database'''
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+            os.remove(self._path)
+        self._memory = []
+        self._pending = []
+        self._count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+        return False
@@ -0,0 +1,138 @@
+"""
+This module contains parallel parsing of large TestExecution search
+responses.
+
+The response is split on the start tags of the top level testExecution
+elements into chunks of several executions, each wrapped into its own
+testExecutions document and parsed by a process pool. The chunks are
+returned in order so the results keep the order of the response.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import re
+import multiprocessing
+from xml.etree import ElementTree
+from perfrepo.Common import PerfRepoException
+from perfrepo.PerfRepoTestExecution import PerfRepoTestExecution
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+
+COLUMNS = ["id", "name", "started", "testId", "testUid", "comment", "tags",
+           "parameters"]
+
+_DECLARATION_RE = re.compile(br"^\s*<\?xml[^>]*\?>")
+_EXEC_START_RE = re.compile(br"<testExecution[\s>/]")
+_ROOT_END_RE = re.compile(br"</testExecutions\s*>\s*$")
+
+def split_search_response(content, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''Splits a search response into documents of about chunk_size bytes
+
+    Returns a list of testExecutions documents each holding whole
+    executions. Executions aren't nested and their text content is
+    escaped, so a start tag can't appear inside of one.'''
+    declaration = _DECLARATION_RE.match(content)
+    prefix = declaration.group(0) if declaration else b""
+    starts = [m.start() for m in _EXEC_START_RE.finditer(content)]
+    if not starts:
+        return []
+    root_end = _ROOT_END_RE.search(content, starts[-1])
+    if root_end is None:
+        raise PerfRepoException("Invalid search response")
+    starts.append(root_end.start())
+
+    chunks = []
+    first = 0
+    for i in range(1, len(starts)):
+        if starts[i] - starts[first] >= chunk_size or i == len(starts) - 1:
+            chunks.append(prefix + b"<testExecutions>" +
+                          content[starts[first]:starts[i]] +
+                          b"</testExecutions>")
+            first = i
+    return chunks
+
+def execution_columns(texecs):
+    '''Returns the TestExecutions as a dict of columns
+
+    COLUMNS hold the attributes, tags as lists and parameters as dicts.
+    Results of every metric are in a 'value:METRIC' column, None for
+    executions without the metric.'''
+    columns = dict((column, []) for column in COLUMNS)
+    for num, texec in enumerate(texecs):
+        columns["id"].append(texec.get_id())
+        columns["name"].append(texec.get_name())
+        columns["started"].append(texec.get_started())
+        columns["testId"].append(texec.get_testId())
+        columns["testUid"].append(texec.get_testUid())
+        columns["comment"].append(texec.get_comment())
+        columns["tags"].append(list(texec.get_tags()))
+        columns["parameters"].append(dict(texec.get_parameters()))
+        results = [(value.get_metricName(), value.get_result())
+                   for value in texec.get_values(expand=False)]
+        results.extend((value_array.get_metricName(),
+                        value_array.get_results()[0])
+                       for value_array in texec.get_value_arrays()
+                       if len(value_array) > 0)
+        for metric, result in results:
+            column = columns.setdefault("value:%s" % metric, [])
+            #the first value of a metric, like TestExecution.get_value()
+            if len(column) <= num:
+                column.extend([None] * (num - len(column)))
+                column.append(result)
+        for column in columns.values():
+            if len(column) <= num:
+                column.append(None)
+    return columns
+
+def _merge_columns(columns, chunk_columns):
+    size = len(columns.get("id", []))
+    chunk_size = len(chunk_columns["id"])
+    for name, column in chunk_columns.items():
+        if name not in columns:
+            columns[name] = [None] * size
+        columns[name].extend(column)
+    for name, column in columns.items():
+        if name not in chunk_columns:
+            column.extend([None] * chunk_size)
+    return columns
+
+def _parse_chunk(args):
+    chunk, columnar, value_arrays = args
+    root = ElementTree.fromstring(chunk)
+    texecs = [PerfRepoTestExecution(elem, value_arrays)
+              for elem in root.findall("testExecution")]
+    if columnar:
+        return execution_columns(texecs)
+    return texecs
+
+def parse_search_response(content, processes=None, columnar=False,
+                          chunk_size=DEFAULT_CHUNK_SIZE, value_arrays=False):
+    '''Parses a search response by a pool of processes
+
+    processes None uses one per CPU. Returns the list of TestExecutions
+    in response order, or their columns (see execution_columns) when
+    columnar is set. value_arrays is passed to PerfRepoTestExecution.'''
+    chunks = split_search_response(content, chunk_size)
+    args = [(chunk, columnar, value_arrays) for chunk in chunks]
+    if processes == 1 or len(chunks) <= 1:
+        results = [_parse_chunk(arg) for arg in args]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_parse_chunk, args)
+        finally:
+            pool.close()
+            pool.join()
+
+    if columnar:
+        columns = dict((column, []) for column in COLUMNS)
+        for chunk_columns in results:
+            _merge_columns(columns, chunk_columns)
+        return columns
+    return [texec for texecs in results for texec in texecs]
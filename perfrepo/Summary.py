@@ -0,0 +1,401 @@
+"""
+This module contains incremental summaries of metric histories.
+
+A summary is kept per (test uid, metric, tag set). It holds a mergeable
+quantile sketch with a bounded relative error, in the style of DDSketch,
+and running moments of the results and of their trend over time. A
+SummaryStore is saved as a JSON file and synchronized with PerfRepo by
+searching only for executions started after the last one folded in.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import os
+import copy
+import math
+import json
+import datetime
+from perfrepo.Common import PerfRepoException, parse_iso_date
+from perfrepo.PerfRepoTestExecution import PerfRepoTestExecutionSearch
+
+SUMMARY_VERSION = 1
+DEFAULT_ACCURACY = 0.01
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+class SummaryException(PerfRepoException):
+    pass
+
+class QuantileSketch(object):
+    '''Quantile sketch with relative accuracy
+
+    Results are counted in logarithmic buckets, every quantile is
+    returned within accuracy relative error of the exact one. Sketches
+    with the same accuracy can be merged.'''
+    def __init__(self, accuracy=DEFAULT_ACCURACY):
+        if not 0.0 < accuracy < 1.0:
+            raise SummaryException("Accuracy must be between 0 and 1")
+        self._accuracy = accuracy
+        self._gamma = (1.0 + accuracy) / (1.0 - accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._positive = {}
+        self._negative = {}
+        self._zero = 0
+        self._count = 0
+        self._min = None
+        self._max = None
+
+    def get_accuracy(self):
+        return self._accuracy
+
+    def get_count(self):
+        return self._count
+
+    def get_min(self):
+        return self._min
+
+    def get_max(self):
+        return self._max
+
+    def _index(self, value):
+        return int(math.ceil(math.log(value) / self._log_gamma))
+
+    def _value(self, index):
+        return 2.0 * self._gamma ** index / (self._gamma + 1.0)
+
+    def add(self, value, count=1):
+        value = float(value)
+        if value > 0.0:
+            index = self._index(value)
+            self._positive[index] = self._positive.get(index, 0) + count
+        elif value < 0.0:
+            index = self._index(-value)
+            self._negative[index] = self._negative.get(index, 0) + count
+        else:
+            self._zero += count
+        self._count += count
+        if self._min is None or value < self._min:
+            self._min = value
+        if self._max is None or value > self._max:
+            self._max = value
+
+    def merge(self, other):
+        if other._accuracy != self._accuracy:
+            raise SummaryException("Can't merge sketches of different"
+                                   " accuracy")
+        for index, count in other._positive.items():
+            self._positive[index] = self._positive.get(index, 0) + count
+        for index, count in other._negative.items():
+            self._negative[index] = self._negative.get(index, 0) + count
+        self._zero += other._zero
+        self._count += other._count
+        for value in (other._min, other._max):
+            if value is None:
+                continue
+            if self._min is None or value < self._min:
+                self._min = value
+            if self._max is None or value > self._max:
+                self._max = value
+
+    def quantile(self, q):
+        '''Returns the q-quantile (0 <= q <= 1), None when empty'''
+        if not 0.0 <= q <= 1.0:
+            raise SummaryException("Quantile must be between 0 and 1")
+        if self._count == 0:
+            return None
+        rank = q * (self._count - 1)
+        seen = 0
+        for index in sorted(self._negative, reverse=True):
+            seen += self._negative[index]
+            if seen > rank:
+                return max(-self._value(index), self._min)
+        seen += self._zero
+        if seen > rank:
+            return 0.0
+        for index in sorted(self._positive):
+            seen += self._positive[index]
+            if seen > rank:
+                return min(self._value(index), self._max)
+        return self._max
+
+    def to_dict(self):
+        return {"accuracy": self._accuracy,
+                "positive": dict((str(index), count) for index, count
+                                 in self._positive.items()),
+                "negative": dict((str(index), count) for index, count
+                                 in self._negative.items()),
+                "zero": self._zero,
+                "count": self._count,
+                "min": self._min,
+                "max": self._max}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["accuracy"])
+        sketch._positive = dict((int(index), count) for index, count
+                                in data["positive"].items())
+        sketch._negative = dict((int(index), count) for index, count
+                                in data["negative"].items())
+        sketch._zero = data["zero"]
+        sketch._count = data["count"]
+        sketch._min = data["min"]
+        sketch._max = data["max"]
+        return sketch
+
+class RunningMoments(object):
+    '''Mergeable count, mean and variance of results and the least
+    squares trend of the results over time'''
+    def __init__(self):
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        #time in days since the epoch and its co-moment with the results
+        self._mean_t = 0.0
+        self._m2_t = 0.0
+        self._c_ty = 0.0
+
+    def add(self, value, date):
+        value = float(value)
+        t = (date - _EPOCH).total_seconds() / 86400.0
+        self._count += 1
+        delta = value - self._mean
+        delta_t = t - self._mean_t
+        self._mean += delta / self._count
+        self._mean_t += delta_t / self._count
+        self._m2 += delta * (value - self._mean)
+        self._m2_t += delta_t * (t - self._mean_t)
+        self._c_ty += delta_t * (value - self._mean)
+
+    def merge(self, other):
+        if other._count == 0:
+            return
+        count = self._count + other._count
+        delta = other._mean - self._mean
+        delta_t = other._mean_t - self._mean_t
+        factor = float(self._count) * other._count / count
+        self._m2 += other._m2 + delta * delta * factor
+        self._m2_t += other._m2_t + delta_t * delta_t * factor
+        self._c_ty += other._c_ty + delta_t * delta * factor
+        self._mean += delta * other._count / count
+        self._mean_t += delta_t * other._count / count
+        self._count = count
+
+    def get_count(self):
+        return self._count
+
+    def get_mean(self):
+        return self._mean if self._count else None
+
+    def get_stddev(self):
+        '''Sample standard deviation, None for less than 2 results'''
+        if self._count < 2:
+            return None
+        return math.sqrt(self._m2 / (self._count - 1))
+
+    def get_trend(self):
+        '''Change of the results per day, None when undefined'''
+        if self._count < 2 or self._m2_t == 0.0:
+            return None
+        return self._c_ty / self._m2_t
+
+    def to_dict(self):
+        return {"count": self._count, "mean": self._mean, "m2": self._m2,
+                "mean_t": self._mean_t, "m2_t": self._m2_t,
+                "c_ty": self._c_ty}
+
+    @classmethod
+    def from_dict(cls, data):
+        moments = cls()
+        moments._count = data["count"]
+        moments._mean = data["mean"]
+        moments._m2 = data["m2"]
+        moments._mean_t = data["mean_t"]
+        moments._m2_t = data["m2_t"]
+        moments._c_ty = data["c_ty"]
+        return moments
+
+class MetricSummary(object):
+    def __init__(self, accuracy=DEFAULT_ACCURACY):
+        self.sketch = QuantileSketch(accuracy)
+        self.moments = RunningMoments()
+
+    def add(self, value, date):
+        self.sketch.add(value)
+        self.moments.add(value, date)
+
+    def merge(self, other):
+        self.sketch.merge(other.sketch)
+        self.moments.merge(other.moments)
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def to_dict(self):
+        return {"sketch": self.sketch.to_dict(),
+                "moments": self.moments.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        summary.sketch = QuantileSketch.from_dict(data["sketch"])
+        summary.moments = RunningMoments.from_dict(data["moments"])
+        return summary
+
+class SummaryStore(object):
+    '''MetricSummaries keyed by (test uid, metric, tag set)
+
+    Tag sets are the frozensets of execution tags, limited to tags when
+    given. The store remembers the started date of the newest execution
+    folded in per test uid (and the ids started at that moment), sync()
+    only fetches and folds in executions started later.'''
+    def __init__(self, path=None, accuracy=DEFAULT_ACCURACY, tags=None):
+        self._path = path
+        self._accuracy = accuracy
+        self._tags = frozenset(tags) if tags is not None else None
+        self._summaries = {}
+        self._watermarks = {}
+
+        if path is not None and os.path.exists(path):
+            self.load(path)
+
+    def _tag_set(self, texec):
+        tags = frozenset(texec.get_tags())
+        if self._tags is not None:
+            tags &= self._tags
+        return tags
+
+    def _summary(self, test_uid, metric, tags):
+        key = (test_uid, metric, tags)
+        if key not in self._summaries:
+            self._summaries[key] = MetricSummary(self._accuracy)
+        return self._summaries[key]
+
+    def add_execution(self, texec, test_uid=None):
+        '''Folds the results of a TestExecution into the summaries'''
+        test_uid = test_uid or texec.get_testUid()
+        if test_uid is None:
+            raise SummaryException("TestExecution without a test uid")
+        date = parse_iso_date(texec.get_started())
+        tags = self._tag_set(texec)
+        for value in texec.get_values(expand=False):
+            self._summary(test_uid, value.get_metricName(), tags).add(
+                                                    value.get_result(), date)
+        for value_array in texec.get_value_arrays():
+            summary = self._summary(test_uid, value_array.get_metricName(),
+                                    tags)
+            for result in value_array.get_results():
+                summary.add(result, date)
+
+        #executions without an id, e.g. not created on the server yet,
+        #can't be recognized by sync() anyway
+        ids = set([texec.get_id()]) - set([None])
+        watermark, boundary = self._watermarks.get(test_uid, (None, set()))
+        if watermark is None or date > watermark:
+            self._watermarks[test_uid] = (date, ids)
+        elif date == watermark:
+            boundary.update(ids)
+
+    def get_watermark(self, test_uid):
+        '''Returns the started date of the newest folded in execution'''
+        return self._watermarks.get(test_uid, (None, None))[0]
+
+    def get(self, test_uid, metric, tags=()):
+        return self._summaries.get((test_uid, metric, frozenset(tags)))
+
+    def keys(self):
+        return list(self._summaries.keys())
+
+    def merged(self, test_uid, metric, tags=None):
+        '''Returns a MetricSummary merging the summaries of all tag sets
+        of the metric that contain all of tags'''
+        ret = MetricSummary(self._accuracy)
+        tags = frozenset(tags or [])
+        for (uid, name, tag_set), summary in self._summaries.items():
+            if uid == test_uid and name == metric and tags <= tag_set:
+                ret.merge(summary)
+        return ret
+
+    def sync(self, api, test_uid, criteria=None):
+        '''Folds in the executions of test_uid started after the newest
+        one already in the store
+
+        criteria can narrow the search further (e.g. by tags). Returns the
+        number of folded in executions.'''
+        if criteria is None:
+            criteria = PerfRepoTestExecutionSearch()
+        else:
+            criteria = copy.copy(criteria)
+        criteria.set_testUid(test_uid)
+        watermark, boundary = self._watermarks.get(test_uid, (None, set()))
+        if watermark is not None:
+            #whether the server compares inclusively or not, executions
+            #started at the watermark are filtered out by id
+            criteria.set_after_date(watermark.strftime(_DATE_FORMAT),
+                                    _DATE_FORMAT)
+        texecs = api.testExecution_search_iter(criteria, log=False)
+        if texecs is None:
+            raise SummaryException("Search of test '%s' executions failed" %\
+                                   test_uid)
+        folded = 0
+        for texec in texecs:
+            if watermark is not None:
+                date = parse_iso_date(texec.get_started())
+                if date < watermark or texec.get_id() in boundary:
+                    continue
+            self.add_execution(texec, test_uid)
+            folded += 1
+        return folded
+
+    def to_dict(self):
+        summaries = []
+        for (test_uid, metric, tags), summary in self._summaries.items():
+            summaries.append({"testUid": test_uid,
+                              "metric": metric,
+                              "tags": sorted(tags),
+                              "summary": summary.to_dict()})
+        watermarks = {}
+        for test_uid, (date, boundary) in self._watermarks.items():
+            watermarks[test_uid] = {"started": date.strftime(_DATE_FORMAT),
+                                    "ids": sorted(boundary)}
+        return {"version": SUMMARY_VERSION,
+                "accuracy": self._accuracy,
+                "tags": sorted(self._tags) if self._tags is not None \
+                        else None,
+                "summaries": summaries,
+                "watermarks": watermarks}
+
+    def load(self, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != SUMMARY_VERSION:
+            raise SummaryException("Unsupported summary version %s" %\
+                                   data.get("version"))
+        self._accuracy = data["accuracy"]
+        tags = data["tags"]
+        self._tags = frozenset(tags) if tags is not None else None
+        self._summaries = {}
+        for item in data["summaries"]:
+            key = (item["testUid"], item["metric"], frozenset(item["tags"]))
+            self._summaries[key] = MetricSummary.from_dict(item["summary"])
+        self._watermarks = {}
+        for test_uid, item in data["watermarks"].items():
+            self._watermarks[test_uid] = (parse_iso_date(item["started"]),
+                                          set(item["ids"]))
+
+    def save(self, path=None):
+        '''Writes the store to path (the one it was loaded from if None)
+        atomically'''
+        path = path or self._path
+        if path is None:
+            raise SummaryException("No path to save the summaries to")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f, sort_keys=True)
+        os.rename(tmp_path, path)
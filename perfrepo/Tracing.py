@@ -0,0 +1,162 @@
+"""
+This module contains pluggable tracing hooks for Python PerfRepo.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import threading
+from perfrepo.Common import timer
+
+_tracer = None
+_local = threading.local()
+
+def set_tracer(tracer=None):
+    '''Set the process wide tracer, None disables tracing'''
+    global _tracer
+    _tracer = tracer
+
+def get_tracer():
+    return _tracer
+
+def _stack():
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+def current_span():
+    '''Returns the innermost active span or caller context of this thread'''
+    stack = _stack()
+    if stack:
+        return stack[-1]
+    return None
+
+class use_span(object):
+    '''Make a span, or any caller provided context object, the parent of
+    spans started in this thread inside the with block'''
+    def __init__(self, span):
+        self._span = span
+
+    def __enter__(self):
+        _stack().append(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc_value, tb):
+        _stack().pop()
+        return False
+
+class Span(object):
+    def __init__(self, name, parent=None, attributes=None, tracer=None):
+        self.name = name
+        self.parent = parent
+        self.attributes = dict(attributes) if attributes else {}
+        self.error = None
+        self.start = timer()
+        self.end = None
+        self._tracer = tracer
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, error):
+        self.error = error
+
+    def get_duration(self):
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def finish(self):
+        self.end = timer()
+        if self._tracer is not None:
+            self._tracer.span_finished(self)
+
+    def __enter__(self):
+        _stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_value is not None:
+            self.set_error(exc_value)
+        _stack().pop()
+        self.finish()
+        return False
+
+class _NoopSpan(Span):
+    def __init__(self):
+        self.name = None
+        self.parent = None
+        self.attributes = {}
+        self.error = None
+        self.start = None
+        self.end = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, error):
+        pass
+
+    def finish(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+class Tracer(object):
+    '''Base tracer, subclass it to forward spans to a tracing system
+
+    start_span receives the parent, which is either a Span started by this
+    library or whatever context object the caller activated by use_span.'''
+    def start_span(self, name, parent=None, attributes=None):
+        return Span(name, parent, attributes, self)
+
+    def span_finished(self, span):
+        pass
+
+class RecordingTracer(Tracer):
+    '''Tracer keeping all finished spans in memory'''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans = []
+
+    def span_finished(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    def get_spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans = []
+
+def active_tracer():
+    '''Returns the tracer of the innermost span of this thread started by
+    this library, e.g. by a PerfRepoRESTAPI with its own tracer, or the
+    process wide tracer'''
+    span = current_span()
+    if isinstance(span, Span) and span._tracer is not None:
+        return span._tracer
+    return _tracer
+
+def start_span(name, tracer=None, attributes=None):
+    '''Start a child of the current span, use as a context manager'''
+    if tracer is None:
+        tracer = _tracer
+        if tracer is None:
+            return NOOP_SPAN
+    return tracer.start_span(name, current_span(), attributes)
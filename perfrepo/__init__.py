@@ -1,10 +1,65 @@
-from perfrepo.Common import PerfRepoException
-from perfrepo.PerfRepoObject import PerfRepoObject
-from perfrepo.PerfRepoTest import PerfRepoTest
-from perfrepo.PerfRepoTestExecution import PerfRepoTestExecution
-from perfrepo.PerfRepoTestExecution import PerfRepoTestExecutionSearch
-from perfrepo.PerfRepoMetric import PerfRepoMetric
-from perfrepo.PerfRepoReport import PerfRepoReport
-from perfrepo.PerfRepoReport import PerfRepoReportPermission
-from perfrepo.PerfRepoValue import PerfRepoValue
-from perfrepo.PerfRepoRESTAPI import PerfRepoRESTAPI
+import sys
+
+#public names and the modules defining them, the modules are imported on
+#first access so that e.g. 'perfrepo-cli help' doesn't have to load
+#requests and all the models
+_lazy_attrs = {
+    "PerfRepoException": "perfrepo.Common",
+    "PerfRepoObject": "perfrepo.PerfRepoObject",
+    "PerfRepoTest": "perfrepo.PerfRepoTest",
+    "PerfRepoTestExecution": "perfrepo.PerfRepoTestExecution",
+    "PerfRepoTestExecutionSearch": "perfrepo.PerfRepoTestExecution",
+    "PerfRepoMetric": "perfrepo.PerfRepoMetric",
+    "PerfRepoReport": "perfrepo.PerfRepoReport",
+    "PerfRepoReportPermission": "perfrepo.PerfRepoReport",
+    "PerfRepoValue": "perfrepo.PerfRepoValue",
+    "PerfRepoValueArray": "perfrepo.PerfRepoValue",
+    "PerfRepoRESTAPI": "perfrepo.PerfRepoRESTAPI",
+    "PerfRepoInstrumentation": "perfrepo.Instrumentation",
+    "PerfRepoFederatedAPI": "perfrepo.Federated",
+}
+
+__all__ = sorted(_lazy_attrs)
+
+if sys.version_info >= (3, 5):
+    import types
+    import importlib
+
+    class _LazyModule(types.ModuleType):
+        def __getattr__(self, name):
+            try:
+                module_name = _lazy_attrs[name]
+            except KeyError:
+                raise AttributeError("module '%s' has no attribute '%s'" %\
+                                     (self.__name__, name))
+            value = getattr(importlib.import_module(module_name), name)
+            setattr(self, name, value)
+            return value
+
+        def __setattr__(self, name, value):
+            #importing a submodule binds it to the package under its own
+            #name, most of them share it with the class they define
+            if name in _lazy_attrs and isinstance(value, types.ModuleType) \
+               and value.__name__ == _lazy_attrs[name]:
+                value = getattr(value, name)
+            super(_LazyModule, self).__setattr__(name, value)
+
+        def __dir__(self):
+            return sorted(set(self.__dict__) | set(_lazy_attrs))
+
+    sys.modules[__name__].__class__ = _LazyModule
+else:
+    #module __class__ can't be replaced, import everything
+    from perfrepo.Common import PerfRepoException
+    from perfrepo.PerfRepoObject import PerfRepoObject
+    from perfrepo.PerfRepoTest import PerfRepoTest
+    from perfrepo.PerfRepoTestExecution import PerfRepoTestExecution
+    from perfrepo.PerfRepoTestExecution import PerfRepoTestExecutionSearch
+    from perfrepo.PerfRepoMetric import PerfRepoMetric
+    from perfrepo.PerfRepoReport import PerfRepoReport
+    from perfrepo.PerfRepoReport import PerfRepoReportPermission
+    from perfrepo.PerfRepoValue import PerfRepoValue
+    from perfrepo.PerfRepoValue import PerfRepoValueArray
+    from perfrepo.PerfRepoRESTAPI import PerfRepoRESTAPI
+    from perfrepo.Instrumentation import PerfRepoInstrumentation
+    from perfrepo.Federated import PerfRepoFederatedAPI
@@ -0,0 +1,55 @@
+"""
+Fixtures shared by the tests, all of them run against in-process
+PerfRepoFakeServer instances.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import pytest
+from perfrepo import PerfRepoRESTAPI, PerfRepoTest, PerfRepoTestExecution
+from perfrepo import PerfRepoMetric
+from perfrepo.FakeServer import PerfRepoFakeServer
+
+@pytest.fixture
+def server():
+    with PerfRepoFakeServer() as srv:
+        yield srv
+
+@pytest.fixture
+def api(server):
+    return PerfRepoRESTAPI(server.get_url(), "user", "password")
+
+def create_test(api, uid="test1", metrics=("m1", "m2")):
+    test = PerfRepoTest()
+    test.set_name(uid)
+    test.set_uid(uid)
+    test.set_groupid("group")
+    for name in metrics:
+        metric = PerfRepoMetric()
+        metric.set_name(name)
+        metric.set_comparator("HB")
+        metric.set_description(name)
+        test.add_metric(metric)
+    assert api.test_create(test, log=False) is not None
+    return api.test_get_by_id(test.get_id(), log=False)
+
+def create_execution(api, test, name, started="2015-01-01T00:00:00",
+                     values=()):
+    texec = PerfRepoTestExecution()
+    texec.set_name(name)
+    texec.set_testId(test.get_id())
+    texec.set_started(started)
+    for value in values:
+        texec.add_value(value)
+    assert api.testExecution_create(texec, log=False) is not None
+    return texec
+
+@pytest.fixture
+def test(api):
+    return create_test(api)
@@ -0,0 +1,90 @@
+"""
+Tests of the aggregation of metric results.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import math
+import pytest
+from perfrepo import PerfRepoException, PerfRepoValue, PerfRepoTestExecution
+from perfrepo import PerfRepoTestExecutionSearch
+from perfrepo.Aggregation import aggregate
+
+def make_value(metric, result, **params):
+    value = PerfRepoValue()
+    value.set_metricName(metric)
+    value.set_result(result)
+    for name, param in sorted(params.items()):
+        value.add_parameter(name, param)
+    return value
+
+@pytest.fixture
+def texecs(api, test):
+    for i in range(8):
+        texec = PerfRepoTestExecution()
+        texec.set_name("exec%d" % i)
+        texec.set_testId(test.get_id())
+        texec.add_parameter("kernel", "4.%d" % (i % 2))
+        if i % 4 == 0:
+            texec.add_tag("nightly")
+        texec.add_value(make_value("m1", i * 1.5, size="small"))
+        texec.add_value(make_value("m1", i * 10.0, size="large"))
+        texec.add_value(make_value("m2", 100 - i))
+        assert api.testExecution_create(texec, log=False) is not None
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    return api.testExecution_search(criteria)
+
+def by_key(result, *fields):
+    return dict((tuple(record[field] for field in ("metric",) + fields),
+                 record) for record in result)
+
+def test_pure_python(texecs):
+    result = aggregate(texecs, by=["param:kernel", "vparam:size"],
+                       metrics=["m1"], use_numpy=False)
+    assert result.get_fields() == ["metric", "param:kernel", "vparam:size",
+                                   "count", "mean", "stddev", "min", "max",
+                                   "p50", "p90", "p99"]
+    records = by_key(result, "param:kernel", "vparam:size")
+    assert len(records) == 4
+    small = records[("m1", "4.1", "small")]
+    #i = 1, 3, 5, 7
+    assert small["count"] == 4
+    assert small["mean"] == 6.0
+    assert small["min"] == 1.5 and small["max"] == 10.5
+    assert small["stddev"] == pytest.approx(math.sqrt(15.0))
+    #interpolated between 4.5 and 7.5
+    assert small["p50"] == 6.0
+    assert small["p90"] == pytest.approx(9.6)
+
+    tags = by_key(aggregate(texecs, by=["tag:nightly"], metrics=["m2"],
+                            use_numpy=False), "tag:nightly")
+    assert tags[("m2", True)]["count"] == 2
+    assert tags[("m2", False)]["mean"] == 96.0
+
+    single = aggregate(texecs[:1], metrics=["m2"], use_numpy=False)
+    assert list(single)[0]["stddev"] == 0.0
+    assert len(aggregate([], use_numpy=False)) == 0
+
+def test_invalid_arguments(texecs):
+    with pytest.raises(PerfRepoException):
+        aggregate(texecs, by=["size"])
+    with pytest.raises(PerfRepoException):
+        aggregate(texecs, percentiles=[101])
+
+def test_numpy_parity(texecs):
+    pytest.importorskip("numpy")
+    for by in [[], ["param:kernel"], ["tags", "vparam:size"]]:
+        expected = aggregate(texecs, by=by, percentiles=[0, 25, 50, 100],
+                             use_numpy=False).to_records()
+        records = aggregate(texecs, by=by, percentiles=[0, 25, 50, 100],
+                            use_numpy=True).to_records()
+        assert len(records) == len(expected)
+        for record, exp in zip(records, expected):
+            assert record == pytest.approx(exp)
@@ -0,0 +1,85 @@
+"""
+Tests of test export and import.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import os
+import pytest
+from perfrepo import PerfRepoRESTAPI, PerfRepoReport, PerfRepoValue
+from perfrepo import PerfRepoTestExecutionSearch
+from perfrepo.Archive import export_test, import_test
+from perfrepo.FakeServer import PerfRepoFakeServer
+from conftest import create_test, create_execution
+
+@pytest.fixture
+def target():
+    with PerfRepoFakeServer() as srv:
+        target = PerfRepoRESTAPI(srv.get_url(), "user", "password")
+        #make the ids of the target differ from those of the source
+        create_test(target, "other")
+        yield target
+
+def test_round_trip(api, test, target, tmp_path):
+    metrics = dict((m.get_name(), m.get_id()) for m in test.get_metrics())
+    texecs = []
+    for i in range(5):
+        value = PerfRepoValue()
+        value.set_metricName("m1")
+        value.set_result(i)
+        texecs.append(create_execution(api, test, "exec%d" % i,
+                                       values=[value]))
+    content = os.urandom(700000)
+    api.testExecution_add_attachment(texecs[3].get_id(), content, "big.bin")
+    api.testExecution_add_attachment(texecs[3].get_id(), b"hi", "small.txt",
+                                     "text/plain")
+    report = PerfRepoReport()
+    report.set_name("report")
+    report.set_type("Metric")
+    report.add_chart("chart", test.get_id())
+    report.add_series(0, "series", metrics["m1"], ["tag"])
+    report.add_baseline(0, "baseline", texecs[1].get_id(), metrics["m2"])
+    api.report_create(report)
+
+    path = str(tmp_path / "archive.gz")
+    stats = export_test(api, test.get_uid(), path, attachments=True,
+                        reports=[report.get_id()], jobs=2)
+    assert stats == {"test": 1, "executions": 5, "attachments": 2,
+                     "reports": 1}
+
+    result = import_test(target, path, jobs=2)
+    assert result.failed == []
+    assert len(result.executions) == 5
+    assert len(result.attachments) == 2
+    assert len(result.reports) == 1
+
+    new_test = target.test_get_by_uid(test.get_uid())
+    assert new_test.get_id() == result.test_id != test.get_id()
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    names = [t.get_name() for t in target.testExecution_search(criteria)]
+    assert sorted(names) == ["exec%d" % i for i in range(5)]
+
+    new_exec = target.testExecution_get(result.executions[texecs[3].get_id()])
+    attachments = dict((filename, att_id) for att_id, filename, mimetype
+                       in new_exec.get_attachments())
+    assert b"".join(target.testExecution_get_attachment(
+                                    attachments["big.bin"])) == content
+    assert b"".join(target.testExecution_get_attachment(
+                                    attachments["small.txt"])) == b"hi"
+
+    new_metrics = dict((m.get_name(), m.get_id())
+                       for m in new_test.get_metrics())
+    chart = target.report_get_by_id(result.reports[report.get_id()])\
+                  .get_chart(0)
+    assert chart["test"] == new_test.get_id()
+    assert chart["series0"]["metric"] == new_metrics["m1"]
+    assert chart["baseline0"]["metric"] == new_metrics["m2"]
+    assert chart["baseline0"]["execId"] == \
+           result.executions[texecs[1].get_id()]
@@ -0,0 +1,98 @@
+"""
+Tests of attachment uploads and downloads.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import io
+import os
+from perfrepo.Attachment import AttachmentSource, AttachmentIndex
+from conftest import create_execution
+
+def test_upload_and_download(api, test, tmp_path):
+    exec_id = create_execution(api, test, "exec").get_id()
+    content = os.urandom(300000)
+    path = tmp_path / "data.bin"
+    path.write_bytes(content)
+
+    progress = []
+    att_id = api.testExecution_add_attachment(
+                    exec_id, str(path), chunk_size=65536,
+                    progress=lambda sent, total: progress.append((sent, total)))
+    assert att_id is not None
+    assert progress[-1] == (len(content), len(content))
+    assert len(progress) == 5
+
+    attachments = api.testExecution_get(exec_id).get_attachments()
+    assert attachments == [(att_id, "data.bin", "application/octet-stream")]
+    assert b"".join(api.testExecution_get_attachment(att_id)) == content
+    dest = io.BytesIO()
+    assert api.testExecution_get_attachment(att_id, dest) is dest
+    assert dest.getvalue() == content
+
+def test_upload_sources(api, test):
+    exec_id = create_execution(api, test, "exec").get_id()
+    from_buffer = api.testExecution_add_attachment(exec_id, b"buffer",
+                                                   "b.txt")
+    from_file = api.testExecution_add_attachment(exec_id,
+                                                 io.BytesIO(b"file"),
+                                                 "f.txt", "text/plain")
+    assert b"".join(api.testExecution_get_attachment(from_buffer)) == \
+           b"buffer"
+    assert b"".join(api.testExecution_get_attachment(from_file)) == b"file"
+    assert api.testExecution_get_attachment("1234", log=False) is None
+
+def test_size_of_pipe_is_unknown(tmp_path):
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, b"data")
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as f:
+        assert AttachmentSource(f, "f.txt").get_size() is None
+
+    path = tmp_path / "f.txt"
+    path.write_bytes(b"data")
+    with open(str(path), "rb") as f:
+        assert AttachmentSource(f, "f.txt").get_size() == 4
+
+def test_dedup_per_execution_and_filename(api, server, test, tmp_path):
+    path = str(tmp_path / "index")
+    api.set_attachment_index(AttachmentIndex(path))
+    first = create_execution(api, test, "first").get_id()
+    second = create_execution(api, test, "second").get_id()
+
+    att_id = api.testExecution_add_attachment(first, b"data", "f.txt")
+    assert att_id is not None
+    requests = server.get_request_count()
+    assert api.testExecution_add_attachment(first, b"data", "f.txt") == att_id
+    #a hit doesn't send any request
+    assert server.get_request_count() == requests
+
+    #the same content of another execution or file is a new attachment
+    other_exec = api.testExecution_add_attachment(second, b"data", "f.txt")
+    other_file = api.testExecution_add_attachment(first, b"data", "g.txt")
+    assert other_exec not in (None, att_id)
+    assert other_file not in (None, att_id, other_exec)
+    assert len(AttachmentIndex(path)) == 3
+
+def test_dedup_stale_entry(api, server, test, tmp_path):
+    api.set_attachment_index(AttachmentIndex(str(tmp_path / "index")))
+    exec_id = create_execution(api, test, "exec").get_id()
+    att_id = api.testExecution_add_attachment(exec_id, b"data", "f.txt")
+    del server._attachments[att_id]
+
+    #without verify the index is trusted
+    assert api.testExecution_add_attachment(exec_id, b"data", "f.txt") == \
+           att_id
+
+    api.set_attachment_index(api.get_attachment_index(), verify=True)
+    new_id = api.testExecution_add_attachment(exec_id, b"data", "f.txt")
+    assert new_id not in (None, att_id)
+    assert b"".join(api.testExecution_get_attachment(new_id)) == b"data"
+    assert api.testExecution_add_attachment(exec_id, b"data", "f.txt") == \
+           new_id
@@ -0,0 +1,84 @@
+"""
+Tests of the perfrepo-cli batch mode.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import io
+import os
+import sys
+import json
+import subprocess
+import pytest
+from perfrepo.Batch import BatchRunner, BatchException, parse_command, \
+                           read_commands
+from conftest import create_execution
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   "perfrepo-cli")
+
+def test_parse_command():
+    assert parse_command("  # comment") is None
+    assert parse_command("") is None
+    assert parse_command("testexec get 'a b'") == \
+           (["testexec", "get", "a b"], None)
+    assert parse_command('["test", "get", 1]') == (["test", "get", "1"], None)
+    assert parse_command('{"argv": "test get 1", "id": "x"}') == \
+           (["test", "get", "1"], "x")
+    with pytest.raises(BatchException):
+        parse_command('{"argv": 1}')
+
+def test_runner_captures_output():
+    def handler(argv):
+        print("out %s" % argv[0])
+        print("err %s" % argv[0], file=sys.stderr)
+        if argv[0] == "raise":
+            raise ValueError("broken")
+        return int(argv[0]) if argv[0].isdigit() else 0
+
+    commands = read_commands(io.StringIO(u"0\n{\n1\nraise\n"))
+    out = io.StringIO()
+    assert BatchRunner(handler, jobs=2).run(commands, out) == 3
+
+    results = sorted((json.loads(line) for line in
+                      out.getvalue().splitlines()),
+                     key=lambda result: result["line"])
+    assert [result["retval"] for result in results] == [0, None, 1, None]
+    assert results[0]["stdout"] == "out 0\n"
+    assert results[0]["stderr"] == "err 0\n"
+    assert "error" in results[1]
+    assert results[3]["error"] == "ValueError: broken"
+
+def run_batch(server, commands):
+    result = subprocess.run([sys.executable, CLI, "-u", server.get_url(),
+                             "-n", "user", "-p", "password",
+                             "--batch", "-", "--jobs", "2"],
+                            input=commands, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, universal_newlines=True)
+    results = dict((json.loads(line)["line"], json.loads(line))
+                   for line in result.stdout.splitlines())
+    return result.returncode, results
+
+def test_cli_batch(server, api, test):
+    texec = create_execution(api, test, "exec")
+    retval, results = run_batch(server,
+                                "testexec get %s\n"
+                                "test get uid %s\n"
+                                "testexec frobnicate\n" %
+                                (texec.get_id(), test.get_uid()))
+    assert retval != 0
+    assert results[1]["retval"] == 0
+    assert "exec" in results[1]["stdout"]
+    assert results[2]["retval"] == 0
+    assert test.get_uid() in results[2]["stdout"]
+
+    #the usage of a failed command is part of its own result
+    assert results[3]["retval"] != 0
+    assert "Usage:" in results[3]["stderr"]
+    assert "Usage:" not in results[1]["stderr"]
@@ -0,0 +1,76 @@
+"""
+Tests of the bulk TestExecution delete.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import time
+import pytest
+from perfrepo import PerfRepoTestExecutionSearch
+from perfrepo.Bulk import BulkException, delete_executions
+from conftest import create_test, create_execution
+
+@pytest.fixture
+def executions(api, test):
+    other = create_test(api, "test2")
+    create_execution(api, other, "other")
+    return [create_execution(api, test, "exec%d" % i,
+                             "2015-01-%02dT00:00:00" % (i + 1)).get_id()
+            for i in range(6)]
+
+def criteria_of(test):
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    return criteria
+
+def stored_ids(server):
+    return sorted(texec.get("id") for texec in server.get_executions())
+
+def test_dry_run(api, server, test, executions):
+    before = stored_ids(server)
+    result = delete_executions(api, criteria_of(test), dry_run=True)
+    assert sorted(result.matched) == sorted(executions)
+    assert result.deleted == [] and result.failed == []
+    assert stored_ids(server) == before
+
+def test_delete(api, server, test, executions):
+    progress = []
+    result = delete_executions(api, criteria_of(test), jobs=3,
+                               progress=lambda *args: progress.append(args))
+    assert sorted(result.deleted) == sorted(executions)
+    assert result.failed == []
+    assert sorted(done for done, _, _, _ in progress) == list(range(1, 7))
+    assert all(total == 6 and success for _, total, _, success in progress)
+    #only the execution of the other test is left
+    assert len(server.get_executions()) == 1
+    assert str(result) == "matched 6, deleted 6, failed 0"
+
+def test_failed_deletes(api, server, test, executions):
+    failing = "rest/testExecution/%s" % executions[2]
+    server.error_rate = lambda method, path: \
+        500 if method == "DELETE" and path == failing else None
+    result = delete_executions(api, criteria_of(test), jobs=2)
+    assert result.failed == [executions[2]]
+    assert len(result.deleted) == 5
+    assert executions[2] in stored_ids(server)
+
+def test_rate(api, test, executions):
+    start = time.time()
+    result = delete_executions(api, criteria_of(test), jobs=6, rate=20)
+    assert len(result.deleted) == 6
+    #the bucket starts full with one token
+    assert time.time() - start >= 5 / 20.0 * 0.9
+
+def test_refuses_empty_criteria(api):
+    with pytest.raises(BulkException):
+        delete_executions(api, PerfRepoTestExecutionSearch())
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid("test1")
+    with pytest.raises(BulkException):
+        delete_executions(api, criteria, jobs=0)
@@ -0,0 +1,93 @@
+"""
+Tests of record/replay cassettes.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import os
+import time
+import pytest
+from perfrepo import PerfRepoRESTAPI, PerfRepoTestExecutionSearch
+from perfrepo.Cassette import CassetteException, load_cassette
+from perfrepo.FakeServer import PerfRepoFakeServer
+from conftest import create_execution
+
+def search_ids(api, criteria):
+    return [texec.get_id() for texec in api.testExecution_search(criteria)]
+
+def test_record_replay_search(api, server, test, tmp_path):
+    for i in range(3):
+        create_execution(api, test, "exec%d" % i,
+                         "2015-01-0%dT00:00:00" % (i + 1))
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    path = str(tmp_path / "cassette.gz")
+
+    recorder = api.record(path)
+    expected = search_ids(api, criteria)
+    streamed = [texec.get_id()
+                for texec in api.testExecution_search_iter(criteria)]
+    recorder.save()
+    assert len(expected) == 3
+    assert streamed == expected
+
+    interactions = load_cassette(path)
+    assert len(interactions) == 2
+    assert all(i["path"] == "rest/testExecution/search"
+               for i in interactions)
+    #credentials aren't recorded
+    assert all("Authorization" not in i["request_headers"]
+               for i in interactions)
+
+    #the replay doesn't need the server
+    url = server.get_url()
+    server.stop()
+    replayed = PerfRepoRESTAPI(url, "user", "password")
+    player = replayed.replay(path)
+    assert search_ids(replayed, criteria) == expected
+    assert [texec.get_id() for texec in
+            replayed.testExecution_search_iter(criteria)] == expected
+    assert player.get_remaining() == 0
+    with pytest.raises(CassetteException):
+        replayed.testExecution_search(criteria)
+
+def test_record_large_attachment(api, server, test, tmp_path):
+    exec_id = create_execution(api, test, "exec").get_id()
+    content = os.urandom(3 * 1024 * 1024)
+    att_id = api.testExecution_add_attachment(exec_id, content, "big.bin")
+    path = str(tmp_path / "cassette.gz")
+
+    recorder = api.record(path)
+    assert b"".join(api.testExecution_get_attachment(att_id)) == content
+    #saves the cassette
+    recorder.close()
+
+    replayed = PerfRepoRESTAPI(server.get_url(), "user", "password")
+    replayed.replay(path)
+    assert b"".join(replayed.testExecution_get_attachment(att_id)) == content
+
+def test_replay_speed(tmp_path):
+    path = str(tmp_path / "cassette.gz")
+    with PerfRepoFakeServer(latency=0.3) as server:
+        api = PerfRepoRESTAPI(server.get_url(), "user", "password")
+        recorder = api.record(path)
+        api.get_version()
+        recorder.save()
+
+    #nothing listens on port 1
+    replayed = PerfRepoRESTAPI("http://127.0.0.1:1/", "user", "password")
+    replayed.replay(path)
+    start = time.time()
+    replayed.get_version()
+    assert time.time() - start < 0.2
+
+    replayed.replay(path, speed=2.0)
+    start = time.time()
+    replayed.get_version()
+    assert 0.1 < time.time() - start < 0.3
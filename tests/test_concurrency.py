@@ -0,0 +1,112 @@
+"""
+Tests of the rate and concurrency limits.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import time
+import threading
+import pytest
+from perfrepo import PerfRepoException
+from perfrepo.Common import timer
+from perfrepo.Concurrency import TokenBucket, ConcurrencyController
+from perfrepo.Concurrency import _size_class
+from conftest import create_execution
+
+def test_token_bucket():
+    bucket = TokenBucket(50)
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    start = time.time()
+    for i in range(5):
+        bucket.acquire()
+    assert time.time() - start >= 5 / 50.0 * 0.9
+    with pytest.raises(PerfRepoException):
+        TokenBucket(0)
+
+def test_size_class():
+    assert _size_class(None) is None
+    assert _size_class(40) == _size_class(120)
+    assert _size_class(40) != _size_class(100 * 1024)
+
+def test_growth_and_backoff():
+    controller = ConcurrencyController(initial=4, maximum=8)
+    #a fully used limit grows
+    for i in range(4):
+        starts = [controller.acquire("e") for j in range(4)]
+        for start in starts:
+            controller.release("e", start, 200, 100)
+    limit = controller.get_limit()
+    assert limit > 4
+    #an unused one doesn't
+    for i in range(20):
+        controller.release("e", controller.acquire("e"), 200, 100)
+    assert controller.get_limit() == limit
+
+    controller.release("e", controller.acquire("e") - 0.5, 503)
+    assert controller.get_limit() == limit // 2
+    #at most once per round, i.e. per smoothed latency
+    controller.release("e", controller.acquire("e") - 0.5, None)
+    assert controller.get_limit() == limit // 2
+    assert controller.get_inflight() == 0
+
+def test_latency_by_size():
+    controller = ConcurrencyController(initial=8)
+    now = timer()
+    #slow large uploads don't make small requests look congested
+    for i in range(5):
+        controller.release("e", now - 0.01, 200, 100)
+    for i in range(5):
+        controller.release("e", now - 0.5, 200, 100, sent=10 * 1024 * 1024)
+    assert controller.get_limit() >= 8
+
+    #the same latency for a small request is congestion
+    controller.release("e", now - 0.5, 200, 100)
+    assert controller.get_limit() == 4
+
+def test_non_adaptive_doesnt_gate():
+    controller = ConcurrencyController(initial=1, adaptive=False)
+    starts = [controller.acquire("e") for i in range(10)]
+    assert controller.get_inflight() == 10
+    for start in starts:
+        controller.release("e", start, 503)
+    assert controller.get_limit() == 1
+
+def test_adaptive_gates():
+    controller = ConcurrencyController(initial=1, maximum=1)
+    start = controller.acquire("e")
+    acquired = threading.Event()
+    thread = threading.Thread(target=lambda: (controller.acquire("e"),
+                                              acquired.set()))
+    thread.start()
+    assert not acquired.wait(0.1)
+    controller.release("e", start, 200)
+    assert acquired.wait(1)
+    thread.join()
+
+def test_backoff_on_server_errors(api, server, test):
+    controller = ConcurrencyController(initial=8)
+    api.set_concurrency_controller(controller)
+    texec = create_execution(api, test, "exec")
+    assert controller.get_limit() == 8
+
+    server.error_rate = lambda method, path: 503
+    assert api.testExecution_get(texec.get_id(), log=False) is None
+    assert controller.get_limit() == 4
+    assert controller.get_inflight() == 0
+
+def test_rate_limit(api, test):
+    api.set_concurrency_controller(
+        ConcurrencyController(rates={"rest/testExecution/{id}": 20},
+                              adaptive=False))
+    texec = create_execution(api, test, "exec")
+    start = time.time()
+    for i in range(4):
+        api.testExecution_get(texec.get_id())
+    assert time.time() - start >= 3 / 20.0 * 0.9
@@ -0,0 +1,92 @@
+"""
+Tests of the time ordered execution index.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import datetime
+import pytest
+from perfrepo import PerfRepoException, PerfRepoTestExecution
+from perfrepo import PerfRepoTestExecutionSearch
+from perfrepo.ExecutionIndex import ExecutionIndex
+from conftest import create_execution
+
+def make_execution(name, started, tags=()):
+    texec = PerfRepoTestExecution()
+    texec.set_name(name)
+    texec.set_started(started)
+    for tag in tags:
+        texec.add_tag(tag)
+    return texec
+
+def names(texecs):
+    return [texec.get_name() for texec in texecs]
+
+@pytest.fixture
+def index():
+    return ExecutionIndex([
+        make_execution("d", "2015-01-12T10:00:00", ["x"]),
+        make_execution("a", "2015-01-01T10:00:00", ["x"]),
+        make_execution("c", "2015-01-05T00:00:00", ["y"]),
+        make_execution("b", "2015-01-01T10:00:00", ["x", "y"]),
+        make_execution("e", "2015-01-13T23:59:59", ["y"])])
+
+def test_order(index):
+    #equal dates keep the order they were added in
+    assert names(index) == ["a", "b", "c", "d", "e"]
+    index.add(make_execution("a2", "2015-01-01T10:00:00"))
+    assert names(index[:3]) == ["a", "b", "a2"]
+    assert index.get_started(0) == datetime.datetime(2015, 1, 1, 10)
+
+def test_range(index):
+    assert names(index.range("2015-01-01T10:00:00", "2015-01-12T10:00:00"))\
+           == ["a", "b", "c"]
+    assert names(index.range(after=datetime.datetime(2015, 1, 5))) == \
+           ["c", "d", "e"]
+    assert names(index.range(before="2015-01-01")) == []
+    assert index.count("2015-01-13", "2015-01-01") == 0
+    assert index.count() == 5
+
+def test_windows(index):
+    days = [(start.day, names(texecs)) for start, texecs in index.windows()]
+    assert days == [(1, ["a", "b"]), (5, ["c"]), (12, ["d"]), (13, ["e"])]
+    #weeks start on Monday
+    weeks = [(start.date(), names(texecs))
+             for start, texecs in index.windows("week")]
+    assert weeks == [(datetime.date(2014, 12, 29), ["a", "b"]),
+                     (datetime.date(2015, 1, 5), ["c"]),
+                     (datetime.date(2015, 1, 12), ["d", "e"])]
+    custom = [names(texecs) for start, texecs in
+              index.windows(datetime.timedelta(days=5),
+                            after="2015-01-02")]
+    assert custom == [["c"], ["d", "e"]]
+    with pytest.raises(PerfRepoException):
+        list(index.windows("month"))
+
+def test_latest(index):
+    assert index.latest().get_name() == "e"
+    assert index.latest("2015-01-05").get_name() == "b"
+    assert index.latest("2015-01-01") is None
+    latest = index.latest_per_tags(before="2015-01-13")
+    assert dict((tuple(sorted(key)), texec.get_name())
+                for key, texec in latest.items()) == \
+           {("x",): "d", ("y",): "c", ("x", "y"): "b"}
+    latest = index.latest_per_tags(["x"])
+    assert names([latest[frozenset(["x"])], latest[frozenset()]]) == \
+           ["d", "e"]
+
+def test_search_results(api, test):
+    for i, day in enumerate([3, 1, 2]):
+        create_execution(api, test, "exec%d" % i,
+                         "2015-01-%02dT00:00:00" % day)
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    index = ExecutionIndex(api.testExecution_search_iter(criteria))
+    assert names(index) == ["exec1", "exec2", "exec0"]
+    assert names(index.range("2015-01-02", "2015-01-03")) == ["exec2"]
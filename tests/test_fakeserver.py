@@ -0,0 +1,72 @@
+"""
+Tests of the in-process fake PerfRepo server.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import time
+from multiprocessing.pool import ThreadPool
+from perfrepo import PerfRepoRESTAPI, PerfRepoValue
+from perfrepo import PerfRepoTestExecutionSearch
+from perfrepo.FakeServer import PerfRepoFakeServer
+from conftest import create_execution
+
+def test_crud(api, server, test):
+    texec = create_execution(api, test, "exec")
+    assert api.get_version() == "1.4-fake"
+    assert api.test_get_by_uid(test.get_uid()).get_id() == test.get_id()
+    assert api.testExecution_get(texec.get_id()).get_name() == "exec"
+    assert [e.get("name") for e in server.get_executions()] == ["exec"]
+    assert api.testExecution_delete(texec.get_id())
+    assert api.testExecution_get(texec.get_id(), log=False) is None
+
+def test_errors(api, server):
+    server.error_rate = lambda method, path: 500 if "version" in path \
+                                             else None
+    assert api.get_version(log=False) is None
+    server.error_rate = 0.0
+    assert api.get_version() is not None
+
+def test_requests_served_in_parallel():
+    with PerfRepoFakeServer(latency=0.2) as server:
+        api = PerfRepoRESTAPI(server.get_url(), "user", "password")
+        api.set_pool_size(8)
+        pool = ThreadPool(8)
+        try:
+            start = time.time()
+            versions = pool.map(lambda i: api.get_version(log=False),
+                                range(8))
+            elapsed = time.time() - start
+        finally:
+            pool.close()
+            pool.join()
+    assert versions == ["1.4-fake"] * 8
+    #serialized requests would take 1.6 seconds
+    assert elapsed < 1.0
+
+def test_concurrent_changes(api, test):
+    texec = create_execution(api, test, "exec")
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+
+    def add(i):
+        value = PerfRepoValue()
+        value.set_metricName("m1")
+        value.set_result(i)
+        api.testExecution_add_value(texec.get_id(), [value], log=False)
+        return len(api.testExecution_search(criteria)[0].get_values())
+
+    pool = ThreadPool(8)
+    try:
+        counts = pool.map(add, range(40))
+    finally:
+        pool.close()
+        pool.join()
+    assert all(1 <= count <= 40 for count in counts)
+    assert len(api.testExecution_get(texec.get_id()).get_values()) == 40
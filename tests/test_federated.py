@@ -0,0 +1,110 @@
+"""
+Tests of the federated client.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import logging
+import pytest
+from perfrepo import PerfRepoRESTAPI, PerfRepoFederatedAPI
+from perfrepo import PerfRepoTestExecutionSearch
+from perfrepo.FakeServer import PerfRepoFakeServer
+from conftest import create_test, create_execution
+
+@pytest.fixture
+def other_server():
+    with PerfRepoFakeServer() as srv:
+        yield srv
+
+@pytest.fixture
+def other(other_server):
+    return PerfRepoRESTAPI(other_server.get_url(), "user", "password")
+
+@pytest.fixture
+def dead():
+    #nothing listens on port 1
+    return PerfRepoRESTAPI("http://127.0.0.1:1/", "user", "password")
+
+def test_not_found_isnt_failure(api, other, test):
+    texec = create_execution(api, test, "exec")
+    fed = PerfRepoFederatedAPI([("a", api), ("b", other)])
+
+    tests = fed.test_get_by_uid(test.get_uid())
+    assert [t.get_instance() for t in tests] == ["a"]
+    assert fed.test_get_by_uid("missing") == []
+
+    texecs = fed.testExecution_get_many([("a", texec.get_id()),
+                                         ("b", texec.get_id())])
+    assert [(t.get_instance(), t.get_id()) for t in texecs] == \
+           [("a", texec.get_id())]
+
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    assert [t.get_id() for t in fed.testExecution_search(criteria)] == \
+           [texec.get_id()]
+
+def test_merged_search(api, other, test):
+    other_test = create_test(other)
+    for i in range(4):
+        target, target_test = (api, test) if i % 2 else (other, other_test)
+        create_execution(target, target_test, "exec%d" % i,
+                         "2015-01-0%dT00:00:00" % (i + 1))
+    fed = PerfRepoFederatedAPI([("a", api), ("b", other)])
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    texecs = fed.testExecution_search(criteria)
+    assert [t.get_name() for t in texecs] == ["exec0", "exec1", "exec2",
+                                              "exec3"]
+    assert [t.get_instance() for t in texecs] == ["b", "a", "b", "a"]
+
+    criteria.set_limit_from(1)
+    criteria.set_howmany(2)
+    texecs = fed.testExecution_search(criteria)
+    assert [t.get_name() for t in texecs] == ["exec1", "exec2"]
+
+def test_unreachable_instance(api, dead, test):
+    create_execution(api, test, "exec")
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+
+    strict = PerfRepoFederatedAPI([("a", api), ("dead", dead)])
+    assert strict.testExecution_search_iter(criteria) is None
+    assert strict.test_get_by_uid(test.get_uid()) is None
+
+    partial = PerfRepoFederatedAPI([("a", api), ("dead", dead)],
+                                   partial=True)
+    assert [t.get_name() for t in partial.testExecution_search(criteria)] \
+           == ["exec"]
+    assert len(partial.test_get_by_uid(test.get_uid())) == 1
+
+def test_failed_search(api, other, other_server, test, caplog):
+    create_execution(api, test, "exec")
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    #the instance is reachable, but its search doesn't succeed
+    other_server.error_rate = lambda method, path: \
+        500 if path == "rest/testExecution/search" else None
+
+    strict = PerfRepoFederatedAPI([("a", api), ("b", other)])
+    assert strict.testExecution_search_iter(criteria, log=False) is None
+
+    partial = PerfRepoFederatedAPI([("a", api), ("b", other)],
+                                   partial=True)
+    with caplog.at_level(logging.WARNING):
+        texecs = partial.testExecution_search(criteria, log=False)
+    assert [t.get_instance() for t in texecs] == ["a"]
+    assert "'b'" in caplog.text
+
+def test_failed_version(api, other, other_server):
+    other_server.error_rate = lambda method, path: 500
+    assert PerfRepoFederatedAPI([("a", api), ("b", other)])\
+               .get_version(log=False) is None
+    versions = PerfRepoFederatedAPI([("a", api), ("b", other)],
+                                    partial=True).get_version(log=False)
+    assert list(versions) == ["a"]
@@ -0,0 +1,39 @@
+"""
+Tests of result file import.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import json
+from perfrepo.Importer import execution_from_dict, import_directory
+
+def test_numeric_fields(api, test, tmp_path):
+    data = {"name": 1, "testUid": test.get_uid(), "comment": 2.5,
+            "tags": ["tag", 3],
+            "parameters": {"threads": 4, "ratio": 0.5},
+            "values": [{"metricName": "m1", "result": 10,
+                        "parameters": {"cpu": 0}}]}
+    (tmp_path / "result.json").write_text(json.dumps(data))
+
+    result = import_directory(api, str(tmp_path), processes=1, jobs=1)
+    assert result.failed == {}
+    texec = api.testExecution_get(result.imported["result.json"])
+    assert texec.get_name() == "1"
+    assert texec.get_comment() == "2.5"
+    assert sorted(texec.get_tags()) == ["3", "tag"]
+    assert sorted(texec.get_parameters()) == [("ratio", "0.5"),
+                                              ("threads", "4")]
+    value = texec.get_value("m1")
+    assert value.get_result() == 10.0
+    assert value.get_parameters() == [("cpu", "0")]
+
+def test_numeric_test_id():
+    texec = execution_from_dict({"name": "exec", "testId": 7})
+    assert texec.get_testId() == "7"
+    assert texec.get_testUid() is None
@@ -0,0 +1,87 @@
+"""
+Tests of the client-side instrumentation.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+from perfrepo import PerfRepoInstrumentation, PerfRepoTestExecutionSearch
+from perfrepo.Instrumentation import Histogram
+from conftest import create_execution
+
+def test_histogram():
+    hist = Histogram((0.1, 1.0))
+    for value in [0.05, 0.5, 0.5, 5.0]:
+        hist.observe(value)
+    assert hist.get_count() == 4
+    assert hist.get_sum() == 6.05
+    assert hist.get_buckets() == [(0.1, 1), (1.0, 3), (float("inf"), 4)]
+    assert hist.quantile(0.5) == 1.0
+    assert Histogram().quantile(0.5) is None
+
+def requests_of(instr):
+    return dict(((req["endpoint"], req["method"]), req)
+                for req in instr.snapshot()["requests"])
+
+def test_requests(api, test):
+    instr = PerfRepoInstrumentation()
+    events = []
+    instr.add_callback(events.append)
+    api.set_instrumentation(instr)
+
+    texec = create_execution(api, test, "exec")
+    api.testExecution_get(texec.get_id())
+    api.testExecution_get(texec.get_id())
+    api.testExecution_get("1234", log=False)
+    att_id = api.testExecution_add_attachment(texec.get_id(), b"x" * 5000,
+                                              "f.txt")
+    assert b"".join(api.testExecution_get_attachment(att_id)) == b"x" * 5000
+
+    requests = requests_of(instr)
+    get = requests[("rest/testExecution/{id}", "GET")]
+    assert get["count"] == 3
+    assert get["status"] == {200: 2, 404: 1}
+    assert get["latency"]["count"] == 3
+    assert get["bytes_received"] > 0
+    create = requests[("rest/testExecution/create", "POST")]
+    assert create["bytes_sent"] > 0
+    upload = requests[("rest/testExecution/{id}/addAttachment", "POST")]
+    assert upload["bytes_sent"] == 5000
+    #streamed downloads are measured once the body is read
+    download = requests[("rest/testExecution/attachment/{id}", "GET")]
+    assert download["bytes_received"] == 5000
+
+    snapshot = instr.snapshot()
+    assert "rest/testExecution/{id}" in snapshot["parse"]
+    assert "rest/testExecution/create" in snapshot["serialize"]
+    totals = instr.totals()
+    assert totals["requests"] == len([e for e in events
+                                      if e["type"] == "request"])
+    assert totals["network"] > 0
+
+    prometheus = instr.to_prometheus()
+    assert 'perfrepo_client_requests_total{endpoint="rest/testExecution/'\
+           '{id}",method="GET",status="404"} 1' in prometheus
+    assert "perfrepo_client_xml_parse_duration_seconds_count" in prometheus
+
+def test_streamed_search_parse(api, test):
+    for i in range(3):
+        create_execution(api, test, "exec%d" % i)
+    instr = PerfRepoInstrumentation()
+    api.set_instrumentation(instr)
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    assert len(list(api.testExecution_search_iter(criteria))) == 3
+
+    search = requests_of(instr)[("rest/testExecution/search", "POST")]
+    assert search["bytes_received"] > 0
+    assert instr.snapshot()["parse"]["rest/testExecution/search"]\
+                           ["count"] == 3
+
+    instr.reset()
+    assert instr.totals()["requests"] == 0
@@ -0,0 +1,87 @@
+"""
+Tests of the structured TestExecution output.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import io
+import csv
+import json
+import pytest
+from perfrepo import PerfRepoException, PerfRepoValue, PerfRepoTestExecution
+from perfrepo.Output import ExecutionWriter, parse_fields
+
+@pytest.fixture
+def texec(api, test):
+    texec = PerfRepoTestExecution()
+    texec.set_name("exec")
+    texec.set_testId(test.get_id())
+    texec.set_started("2015-01-01T00:00:00")
+    texec.set_comment("a, b")
+    texec.add_tag("t1")
+    texec.add_tag("t2")
+    texec.add_parameter("kernel", "4.2")
+    value = PerfRepoValue()
+    value.set_metricName("m1")
+    value.set_result(1.5)
+    texec.add_value(value)
+    assert api.testExecution_create(texec, log=False) is not None
+    return api.testExecution_get(texec.get_id())
+
+def test_parse_fields():
+    assert parse_fields("id, name,,param:kernel,value:m1") == \
+           ["id", "name", "param:kernel", "value:m1"]
+    for fields in ["id,bogus", "param:", "value:"]:
+        with pytest.raises(PerfRepoException):
+            parse_fields(fields)
+
+def test_jsonl(texec):
+    out = io.StringIO()
+    ExecutionWriter(out, "jsonl").write(texec)
+    obj = json.loads(out.getvalue())
+    assert obj["id"] == texec.get_id()
+    assert obj["testUid"] == "test1"
+    assert obj["parameters"] == {"kernel": "4.2"}
+    assert [value["metricName"] for value in obj["values"]] == ["m1"]
+
+    out = io.StringIO()
+    writer = ExecutionWriter(out, "jsonl",
+                             ["name", "param:kernel", "param:missing",
+                              "value:m1", "value:m2"])
+    writer.write(texec)
+    writer.write(texec)
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 2
+    assert json.loads(lines[0]) == {"name": "exec", "param:kernel": "4.2",
+                                    "param:missing": None, "value:m1": 1.5,
+                                    "value:m2": None}
+
+def test_csv(texec):
+    out = io.StringIO()
+    writer = ExecutionWriter(out, "csv")
+    #the header is written before any execution
+    assert out.getvalue().strip() == "id,name,started,testUid,tags"
+    writer.write(texec)
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows[1] == [texec.get_id(), "exec", "2015-01-01T00:00:00",
+                       "test1", "t1,t2"]
+
+    out = io.StringIO()
+    ExecutionWriter(out, "csv", ["comment", "parameters",
+                                 "value:m2"]).write(texec)
+    rows = list(csv.reader(io.StringIO(out.getvalue())))
+    assert rows == [["comment", "parameters", "value:m2"],
+                    ["a, b", "kernel=4.2", ""]]
+
+def test_text(texec):
+    out = io.StringIO()
+    ExecutionWriter(out, "text", ["id", "tags"]).write(texec)
+    assert out.getvalue() == "%s t1,t2\n" % texec.get_id()
+    with pytest.raises(PerfRepoException):
+        ExecutionWriter(out, "xml")
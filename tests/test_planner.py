@@ -0,0 +1,87 @@
+"""
+Tests of the client side search planner.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import datetime
+import pytest
+from perfrepo import PerfRepoTestExecution, PerfRepoTestExecutionSearch
+from perfrepo.Planner import SearchPlanner, PlannerException, order_key
+from conftest import create_execution
+
+@pytest.fixture
+def executions(api, test):
+    return [create_execution(api, test, "exec%d" % i,
+                             "2015-01-%02dT12:00:00" % (i + 1)).get_id()
+            for i in range(10)]
+
+def search_ids(planner, criteria):
+    return [texec.get_id() for texec in planner.search_iter(criteria)]
+
+def test_split_ids(api, server, executions):
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_ids(executions[:7] + ["9999"])
+    criteria.add_tag("t1")
+    planner = SearchPlanner(api, max_ids=3)
+    chunks = planner.plan(criteria)
+    assert [chunk.get_ids() for chunk in chunks] == \
+           [executions[0:3], executions[3:6], [executions[6], "9999"]]
+    #the chunks don't share the lists of the original criteria
+    chunks[0].add_tag("t2")
+    assert criteria.get_tags() == ["t1"]
+
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_ids(executions[:7] + ["9999"])
+    requests = server.get_request_count()
+    assert sorted(search_ids(planner, criteria), key=int) == executions[:7]
+    assert server.get_request_count() - requests == 3
+
+def test_split_dates(api, test, executions):
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    criteria.set_after_date("2015-01-01")
+    criteria.set_before_date("2015-01-11")
+    planner = SearchPlanner(api, window=datetime.timedelta(days=3))
+    chunks = planner.plan(criteria)
+    assert [(chunk.get_after_date(), chunk.get_before_date())
+            for chunk in chunks] == \
+           [("2015-01-01T00:00:00", "2015-01-04T00:00:01"),
+            ("2015-01-04T00:00:00", "2015-01-07T00:00:01"),
+            ("2015-01-07T00:00:00", "2015-01-10T00:00:01"),
+            ("2015-01-10T00:00:00", "2015-01-11T00:00:00")]
+    #overlapping windows don't duplicate results
+    assert sorted(search_ids(planner, criteria), key=int) == executions
+
+    #ranges within the window aren't split
+    assert len(SearchPlanner(api, window=datetime.timedelta(days=30))
+               .plan(criteria)) == 1
+
+def test_failed_chunk(api, server, executions):
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_ids(executions)
+    server.error_rate = lambda method, path: 500
+    with pytest.raises(PlannerException):
+        search_ids(SearchPlanner(api, max_ids=4), criteria)
+
+def test_undated_executions_first():
+    dated = PerfRepoTestExecution()
+    dated.set_id("1")
+    dated.set_started("2015-01-01T00:00:00")
+    undated = PerfRepoTestExecution()
+    undated.set_id("2")
+    undated.set_started("unknown")
+    texecs = sorted([dated, undated], key=order_key("DATE_ASC"))
+    assert [texec.get_id() for texec in texecs] == ["2", "1"]
+
+def test_invalid_planner(api):
+    with pytest.raises(PlannerException):
+        SearchPlanner(api, max_ids=0)
+    with pytest.raises(PlannerException):
+        SearchPlanner(api, jobs=0)
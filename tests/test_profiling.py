@@ -0,0 +1,77 @@
+"""
+Tests of the perfrepo-cli profiler.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import io
+import os
+import re
+import sys
+import importlib
+import subprocess
+from perfrepo.Output import ExecutionWriter
+from perfrepo.Profiling import CLIProfiler
+from conftest import create_execution
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                   "perfrepo-cli")
+
+def test_importlib_imports(tmp_path, monkeypatch):
+    (tmp_path / "slow_module.py").write_text(u"import time\n"
+                                             u"time.sleep(0.05)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "slow_module", raising=False)
+
+    meta_path = list(sys.meta_path)
+    profiler = CLIProfiler()
+    profiler.start()
+    module = importlib.import_module("slow_module")
+    profiler.stop()
+    assert sys.meta_path == meta_path
+    assert profiler._times["imports"] >= 0.05
+    #the module doesn't see the timing wrapper
+    assert module.__loader__ is module.__spec__.loader
+    assert type(module.__loader__).__name__ == "SourceFileLoader"
+
+def test_output_wrappers():
+    profiler = CLIProfiler()
+    out = io.StringIO()
+    profiler.wrap_print(print)("text", file=out)
+    writer = profiler.wrap_writer(ExecutionWriter)(out, "text", ["id"])
+    assert isinstance(writer, ExecutionWriter)
+    assert profiler._times["output formatting"] > 0
+
+def profiled_times(stderr):
+    times = {}
+    for line in stderr.splitlines():
+        match = re.match(r"^    (\S.*?)\s+([0-9.]+) ms", line)
+        if match:
+            times[match.group(1)] = float(match.group(2))
+    return times
+
+def test_cli_profile(server, api, test):
+    for i in range(3):
+        create_execution(api, test, "exec%d" % i)
+    result = subprocess.run([sys.executable, CLI, "-u", server.get_url(),
+                             "-n", "user", "-p", "password", "--profile",
+                             "--format", "jsonl", "testexec", "search",
+                             "testuid", test.get_uid()],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    assert result.returncode == 0
+    assert len(result.stdout.splitlines()) == 3
+
+    times = profiled_times(result.stderr)
+    #the commands print through the profiled writer
+    assert times["output formatting"] > 0
+    #the search command imports its modules lazily
+    assert times["imports"] > 0
+    assert times["network"] > 0
+    assert re.search(r"requests\s+1$", result.stderr, re.M)
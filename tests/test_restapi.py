@@ -0,0 +1,72 @@
+"""
+Tests of PerfRepoRESTAPI requests.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import pytest
+from perfrepo import PerfRepoValue
+from perfrepo.PerfRepoRESTAPI import PartialAddException
+from conftest import create_execution
+
+def make_values(count):
+    values = []
+    for i in range(count):
+        value = PerfRepoValue()
+        value.set_metricName("m1")
+        value.set_result(i)
+        values.append(value)
+    return values
+
+def fail_add_value(number):
+    requests = [0]
+    def error(method, path):
+        if path.endswith("addValue"):
+            requests[0] += 1
+            if requests[0] == number:
+                return 500
+        return None
+    return error
+
+def test_add_value(api, test):
+    texec = create_execution(api, test, "exec")
+    values = make_values(3)
+    assert api.testExecution_add_value(texec, values) == values
+    assert texec.get_values() == values
+    assert len(api.testExecution_get(texec.get_id()).get_values()) == 3
+
+    value = make_values(1)[0]
+    assert api.testExecution_add_value(texec.get_id(), value) == [value]
+    assert len(api.testExecution_get(texec.get_id()).get_values()) == 4
+
+def test_add_value_first_fails(api, server, test):
+    texec = create_execution(api, test, "exec")
+    values = make_values(3)
+    server.error_rate = fail_add_value(1)
+    with pytest.raises(PartialAddException) as info:
+        api.testExecution_add_value(texec, values)
+    assert info.value.added == []
+    assert info.value.failed is values[0]
+    assert texec.get_values() == []
+
+def test_add_value_partial_failure(api, server, test):
+    texec = create_execution(api, test, "exec")
+    values = make_values(5)
+    server.error_rate = fail_add_value(3)
+    with pytest.raises(PartialAddException) as info:
+        api.testExecution_add_value(texec, values)
+    assert info.value.added == values[:2]
+    assert info.value.failed is values[2]
+    assert info.value.status_code == 500
+    assert texec.get_values() == values[:2]
+
+    #a retry with the rest doesn't duplicate the added values
+    assert api.testExecution_add_value(texec, values[2:]) == values[2:]
+    stored = api.testExecution_get(texec.get_id()).get_values()
+    assert [value.get_result() for value in stored] == [0, 1, 2, 3, 4]
@@ -0,0 +1,78 @@
+"""
+Tests of the memory bounded store of search results.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import os
+import pytest
+from perfrepo import PerfRepoTestExecution, PerfRepoTestExecutionSearch
+from perfrepo.ResultStore import ExecutionStore, estimate_size
+from conftest import create_execution
+
+def make_executions(count):
+    texecs = []
+    for i in range(count):
+        texec = PerfRepoTestExecution()
+        texec.set_id(str(i))
+        texec.set_name("exec%d" % i)
+        #dates in reverse order of the ids
+        texec.set_started("2015-01-01T00:%02d:%02d" % (59 - i // 60,
+                                                       59 - i % 60))
+        texecs.append(texec)
+    return texecs
+
+def ids(texecs):
+    return [texec.get_id() for texec in texecs]
+
+def test_in_memory():
+    texecs = make_executions(10)
+    with ExecutionStore.collect(texecs) as store:
+        assert not store.is_spilled()
+        assert len(store) == 10
+        assert store[3] is texecs[3]
+        store.sort_by_started()
+        assert ids(store) == [str(i) for i in range(9, -1, -1)]
+
+def test_spill(tmp_path):
+    texecs = make_executions(600)
+    budget = estimate_size(texecs[0]) * 10
+    store = ExecutionStore.collect(texecs, budget, str(tmp_path))
+    assert store.is_spilled()
+    assert len(os.listdir(str(tmp_path))) == 1
+    assert len(store) == 600
+    assert ids(store) == ids(texecs)
+    assert store[-1].get_id() == "599"
+    assert ids(store[5:8]) == ["5", "6", "7"]
+    with pytest.raises(IndexError):
+        store[600]
+
+    store.sort_by_started()
+    assert store[0].get_id() == "599"
+    assert ids(store) == [str(i) for i in range(599, -1, -1)]
+    store.sort_by_started(reverse=True)
+    assert ids(store)[:3] == ["0", "1", "2"]
+
+    store.close()
+    assert os.listdir(str(tmp_path)) == []
+    assert len(store) == 0
+
+def test_search_max_memory(api, test, tmp_path):
+    for i in range(20):
+        create_execution(api, test, "exec%d" % i)
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    expected = ids(api.testExecution_search(criteria))
+
+    store = api.testExecution_search(criteria, max_memory=2000)
+    try:
+        assert store.is_spilled()
+        assert ids(store) == expected
+    finally:
+        store.close()
@@ -0,0 +1,93 @@
+"""
+Tests of ordered and paged TestExecution searches.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import datetime
+import pytest
+from perfrepo import PerfRepoException, PerfRepoTestExecution
+from perfrepo import PerfRepoTestExecutionSearch
+from perfrepo.Planner import SearchPlanner, PlannerException
+
+@pytest.fixture
+def executions(api, test):
+    #names and versions are ordered differently from the dates
+    ids = []
+    for i, (name, version) in enumerate([("c", "1.10"), ("a", "1.2"),
+                                         ("d", "1.9"), ("b", "2.0"),
+                                         ("e", "1.1")]):
+        texec = PerfRepoTestExecution()
+        texec.set_name(name)
+        texec.set_testId(test.get_id())
+        texec.set_started("2015-01-%02dT00:00:00" % (i + 1))
+        texec.add_parameter("version", version)
+        assert api.testExecution_create(texec, log=False) is not None
+        ids.append(texec.get_id())
+    return ids
+
+def names(texecs):
+    return [texec.get_name() for texec in texecs]
+
+def ordered(test, order_by, parameter=None, limit_from=None, howmany=None):
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    criteria.set_order_by(order_by, parameter)
+    criteria.set_limit_from(limit_from)
+    criteria.set_howmany(howmany)
+    return criteria
+
+def test_server_order(api, test, executions):
+    assert names(api.testExecution_search(ordered(test, "NAME_ASC"))) == \
+           ["a", "b", "c", "d", "e"]
+    assert names(api.testExecution_search(ordered(test, "DATE_DESC"))) == \
+           ["e", "b", "d", "a", "c"]
+    assert names(api.testExecution_search(
+                    ordered(test, "VERSION_ASC", "version"))) == \
+           ["e", "a", "d", "c", "b"]
+
+def test_server_paging(api, test, executions):
+    criteria = ordered(test, "NAME_ASC", limit_from=1, howmany=2)
+    assert names(api.testExecution_search(criteria)) == ["b", "c"]
+    assert names(api.testExecution_search_iter(criteria)) == ["b", "c"]
+
+    #the criteria survive the round trip through XML
+    parsed = PerfRepoTestExecutionSearch(criteria.to_xml())
+    assert parsed.get_order_by() == "NAME_ASC"
+    assert parsed.get_limit_from() == 1
+    assert parsed.get_howmany() == 2
+
+def test_invalid_order():
+    criteria = PerfRepoTestExecutionSearch()
+    with pytest.raises(PerfRepoException):
+        criteria.set_order_by("SIZE_ASC")
+    with pytest.raises(PerfRepoException):
+        criteria.set_order_by("PARAMETER_ASC")
+
+@pytest.mark.parametrize("order_by", ["DATE_ASC", "DATE_DESC", "NAME_DESC",
+                                      "VERSION_DESC"])
+def test_split_search_paging(api, test, executions, order_by):
+    parameter = "version" if order_by.startswith("VERSION") else None
+    criteria = ordered(test, order_by, parameter, limit_from=1, howmany=3)
+    criteria.set_after_date("2015-01-01")
+    criteria.set_before_date("2015-01-06")
+    expected = names(api.testExecution_search(criteria))
+    assert len(expected) == 3
+
+    planner = SearchPlanner(api, window=datetime.timedelta(days=1))
+    assert len(planner.plan(criteria)) == 5
+    #the merged page matches the page of a single search
+    assert names(planner.search_iter(criteria)) == expected
+
+def test_split_search_paging_requires_order(api, test, executions):
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_ids(executions)
+    criteria.set_howmany(2)
+    with pytest.raises(PlannerException):
+        SearchPlanner(api, max_ids=2).plan(criteria)
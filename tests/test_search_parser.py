@@ -0,0 +1,79 @@
+"""
+Tests of the process-pool search response parser.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import pytest
+from xml.etree import ElementTree
+from perfrepo import PerfRepoException, PerfRepoValue
+from perfrepo import PerfRepoTestExecutionSearch
+from perfrepo.SearchParser import split_search_response, \
+                                  parse_search_response
+from conftest import create_execution
+
+def make_value(metric, result):
+    value = PerfRepoValue()
+    value.set_metricName(metric)
+    value.set_result(result)
+    return value
+
+@pytest.fixture
+def texecs(api, test):
+    for i in range(12):
+        values = [make_value("m1", i)]
+        if i % 3 == 0:
+            values.append(make_value("m2", -i))
+        create_execution(api, test, "exec%d" % i,
+                         "2015-01-%02dT00:00:00" % (i + 1), values)
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    return api.testExecution_search(criteria)
+
+def response_of(texecs):
+    root = ElementTree.Element("testExecutions")
+    for texec in texecs:
+        root.append(texec.to_xml())
+    return b"<?xml version='1.0' encoding='UTF-8'?>\n" + \
+           ElementTree.tostring(root)
+
+def test_split(texecs):
+    content = response_of(texecs)
+    chunks = split_search_response(content, chunk_size=1)
+    assert len(chunks) == 12
+    assert all(chunk.startswith(b"<?xml") for chunk in chunks)
+    assert len(split_search_response(content)) == 1
+    assert split_search_response(b"<testExecutions/>") == []
+    with pytest.raises(PerfRepoException):
+        split_search_response(b"<testExecutions><testExecution id='1'/>")
+
+def test_parallel_parse(texecs):
+    content = response_of(texecs)
+    parsed = parse_search_response(content, processes=2, chunk_size=500)
+    assert [texec.to_dict() for texec in parsed] == \
+           [texec.to_dict() for texec in texecs]
+
+def test_columnar(texecs):
+    columns = parse_search_response(response_of(texecs), processes=2,
+                                    columnar=True, chunk_size=500)
+    assert columns["id"] == [texec.get_id() for texec in texecs]
+    assert columns["value:m1"] == list(range(12))
+    #executions without the metric have None
+    assert columns["value:m2"] == [-i if i % 3 == 0 else None
+                                   for i in range(12)]
+    assert all(len(column) == 12 for column in columns.values())
+
+def test_api_processes(api, test, texecs):
+    criteria = PerfRepoTestExecutionSearch()
+    criteria.set_testUid(test.get_uid())
+    parsed = api.testExecution_search(criteria, processes=2)
+    assert [texec.to_dict() for texec in parsed] == \
+           [texec.to_dict() for texec in texecs]
+    columns = api.testExecution_search(criteria, columnar=True)
+    assert columns["name"] == ["exec%d" % i for i in range(12)]
@@ -0,0 +1,105 @@
+"""
+Tests of the incremental metric summaries.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import random
+import pytest
+from perfrepo import PerfRepoValue, PerfRepoTestExecution
+from perfrepo.Summary import QuantileSketch, SummaryStore, SummaryException
+from conftest import create_execution
+
+def make_value(metric, result):
+    value = PerfRepoValue()
+    value.set_metricName(metric)
+    value.set_result(result)
+    return value
+
+def exact_quantile(results, q):
+    return sorted(results)[int(q * (len(results) - 1))]
+
+def test_sketch_accuracy():
+    rand = random.Random(42)
+    results = [rand.lognormvariate(0, 2) for i in range(5000)] + \
+              [-rand.expovariate(1) for i in range(500)] + [0.0] * 100
+    sketch = QuantileSketch(0.01)
+    for result in results:
+        sketch.add(result)
+    assert sketch.get_count() == 5600
+    for q in [0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0]:
+        exact = exact_quantile(results, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * abs(exact)
+    assert (sketch.get_min(), sketch.get_max()) == (min(results),
+                                                    max(results))
+    assert QuantileSketch().quantile(0.5) is None
+    with pytest.raises(SummaryException):
+        sketch.quantile(2)
+
+def test_sketch_merge():
+    rand = random.Random(1)
+    first = [rand.uniform(1, 100) for i in range(1000)]
+    second = [rand.uniform(50, 500) for i in range(1000)]
+    merged = QuantileSketch(0.02)
+    whole = QuantileSketch(0.02)
+    part = QuantileSketch(0.02)
+    for result in first:
+        merged.add(result)
+        whole.add(result)
+    for result in second:
+        part.add(result)
+        whole.add(result)
+    merged.merge(part)
+    assert merged.to_dict() == whole.to_dict()
+    restored = QuantileSketch.from_dict(merged.to_dict())
+    assert restored.quantile(0.5) == whole.quantile(0.5)
+    with pytest.raises(SummaryException):
+        merged.merge(QuantileSketch(0.01))
+
+def test_sync_watermark(api, test, tmp_path):
+    for i in range(3):
+        create_execution(api, test, "exec%d" % i,
+                         "2015-01-0%dT00:00:00" % (i + 1),
+                         [make_value("m1", i + 1)])
+    path = str(tmp_path / "summary.json")
+    store = SummaryStore(path)
+    assert store.sync(api, test.get_uid()) == 3
+    assert store.sync(api, test.get_uid()) == 0
+    store.save()
+
+    #started at the watermark, but not folded in yet
+    create_execution(api, test, "same", "2015-01-03T00:00:00",
+                     [make_value("m1", 10)])
+    create_execution(api, test, "later", "2015-01-04T00:00:00",
+                     [make_value("m1", 20)])
+    store = SummaryStore(path)
+    assert store.sync(api, test.get_uid()) == 2
+    assert store.get_watermark(test.get_uid()).day == 4
+    summary = store.get(test.get_uid(), "m1")
+    assert summary.to_dict()["sketch"]["count"] == 5
+    assert store.sync(api, test.get_uid()) == 0
+
+def test_executions_without_id(tmp_path):
+    texec = PerfRepoTestExecution()
+    texec.set_started("2015-01-01T00:00:00")
+    texec.add_value(make_value("m1", 1))
+    other = PerfRepoTestExecution()
+    other.set_id("5")
+    other.set_started("2015-01-01T00:00:00")
+    other.add_value(make_value("m1", 2))
+
+    store = SummaryStore(str(tmp_path / "summary.json"))
+    store.add_execution(texec, "test1")
+    store.add_execution(other, "test1")
+    assert store.to_dict()["watermarks"]["test1"]["ids"] == ["5"]
+    store.save()
+    loaded = SummaryStore(str(tmp_path / "summary.json"))
+    summary = loaded.merged("test1", "m1")
+    assert summary.sketch.get_count() == 2
+    assert summary.quantile(1.0) == pytest.approx(2.0, rel=0.01)
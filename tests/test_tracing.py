@@ -0,0 +1,91 @@
+"""
+Tests of the tracing hooks.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import pytest
+from perfrepo import Tracing
+from perfrepo import PerfRepoTestExecution
+from conftest import create_execution
+
+@pytest.fixture
+def global_tracer():
+    tracer = Tracing.RecordingTracer()
+    Tracing.set_tracer(tracer)
+    yield tracer
+    Tracing.set_tracer(None)
+
+def by_name(tracer):
+    spans = {}
+    for span in tracer.get_spans():
+        spans.setdefault(span.name, []).append(span)
+    return spans
+
+def test_api_tracer(api, test):
+    tracer = Tracing.RecordingTracer()
+    api.set_tracer(tracer)
+    texec = create_execution(api, test, "exec")
+    api.testExecution_get(texec.get_id())
+
+    spans = by_name(tracer)
+    create = spans["perfrepo.testExecution_create"][0]
+    get = spans["perfrepo.testExecution_get"][0]
+    assert get.attributes["object_id"] == texec.get_id()
+
+    serialize = [s for s in spans["perfrepo.serialize"]
+                 if s.parent is create][0]
+    to_xml = spans["perfrepo.to_xml"][0]
+    assert to_xml.parent is serialize
+    assert to_xml.attributes["class"] == "PerfRepoTestExecution"
+
+    parse = [s for s in spans["perfrepo.parse"] if s.parent is get][0]
+    from_xml = [s for s in spans["perfrepo.from_xml"]
+                if s.parent is parse][0]
+    assert from_xml.attributes["class"] == "PerfRepoTestExecution"
+
+    network = [s for s in spans["perfrepo.network"] if s.parent is get][0]
+    assert network.attributes["http.method"] == "GET"
+    assert network.attributes["endpoint"] == "rest/testExecution/{id}"
+    assert all(span.end is not None for span in tracer.get_spans())
+
+    #the process wide tracer isn't used
+    assert Tracing.get_tracer() is None
+
+def test_model_conversion(global_tracer):
+    texec = PerfRepoTestExecution()
+    texec.set_name("exec")
+    xml = texec.to_xml_string()
+    PerfRepoTestExecution(xml)
+    PerfRepoTestExecution()
+
+    spans = by_name(global_tracer)
+    assert len(spans["perfrepo.to_xml"]) == 1
+    assert len(spans["perfrepo.from_xml"]) == 1
+
+def test_nested_objects_not_traced(api, test, global_tracer):
+    global_tracer.clear()
+    api.test_get_by_id(test.get_id())
+    #the metrics of the test don't get spans of their own
+    from_xml = by_name(global_tracer)["perfrepo.from_xml"]
+    assert [span.attributes["class"] for span in from_xml] == \
+           ["PerfRepoTest"]
+
+def test_caller_context(api, global_tracer):
+    context = object()
+    with Tracing.use_span(context):
+        api.get_version()
+    version = by_name(global_tracer)["perfrepo.get_version"][0]
+    assert version.parent is context
+
+def test_failed_request_span(api, server, global_tracer):
+    server.error_rate = lambda method, path: 503
+    assert api.get_version(log=False) is None
+    network = by_name(global_tracer)["perfrepo.network"][0]
+    assert network.attributes["http.status_code"] == 503
@@ -0,0 +1,99 @@
+"""
+Tests of value arrays and the values of parsed executions.
+
+Copyright 2015 Red Hat, Inc.
+Licensed under the GNU General Public License, version 2 as
+published by the Free Software Foundation; see COPYING for details.
+"""
+
+__author__ = """
+olichtne@redhat.com (Ondrej Lichtner)
+"""
+
+import pytest
+from xml.etree import ElementTree
+from perfrepo import PerfRepoException, PerfRepoTestExecution
+from perfrepo import PerfRepoValue, PerfRepoValueArray
+from perfrepo.PerfRepoTestExecution import VALUE_ARRAY_THRESHOLD
+
+def make_execution():
+    texec = PerfRepoTestExecution()
+    texec.set_id("1")
+    texec.set_name("exec")
+    texec.set_testId("1")
+    #interleaved metrics, enough samples of "lat" for an array
+    for i in range(VALUE_ARRAY_THRESHOLD * 2):
+        value = PerfRepoValue()
+        value.set_metricName("lat" if i % 3 else "tput")
+        value.set_comparator("LB")
+        value.set_result(i)
+        value.add_parameter("cpu", str(i % 4))
+        texec.add_value(value)
+    return texec
+
+def value_dicts(values):
+    return [value.to_dict() for value in values]
+
+def test_append_validates_first():
+    array = PerfRepoValueArray("lat", "LB")
+    array.append(1.0, [("cpu", "0")])
+    with pytest.raises(PerfRepoException):
+        array.append(2.0, [("iter", "1"), ("iter", "2")])
+    assert len(array) == 1
+    assert array.get_parameter_names() == ["cpu"]
+    assert array.get_parameter_column("cpu") == ["0"]
+
+    array.append(3.0, [("iter", "1")])
+    assert list(array.get_results()) == [1.0, 3.0]
+    assert array.get_parameters(0) == [("cpu", "0")]
+    assert array.get_parameters(1) == [("iter", "1")]
+
+def test_append_xml_comparator_mismatch():
+    array = PerfRepoValueArray("lat")
+    array.append_xml(ElementTree.fromstring(
+        '<value metricName="lat" metricComparator="LB" result="1.0"/>'))
+    with pytest.raises(PerfRepoException):
+        array.append_xml(ElementTree.fromstring(
+            '<value metricName="lat" metricComparator="HB" result="2.0"/>'))
+    assert len(array) == 1
+    assert array.get_comparator() == "LB"
+
+def test_values_stay_live_and_ordered():
+    texec = make_execution()
+    parsed = PerfRepoTestExecution(texec.to_xml_string())
+    assert parsed.get_value_arrays() == []
+    assert value_dicts(parsed.get_values()) == value_dicts(texec.get_values())
+
+    parsed.get_values()[0].set_result(100.0)
+    assert parsed.get_values()[0].get_result() == 100.0
+
+def test_value_arrays_round_trip():
+    texec = make_execution()
+    parsed = PerfRepoTestExecution(texec.to_xml_string(), value_arrays=True)
+    arrays = parsed.get_value_arrays()
+    assert [array.get_metricName() for array in arrays] == ["lat"]
+    assert len(arrays[0]) == len([v for v in texec.get_values()
+                                  if v.get_metricName() == "lat"])
+
+    again = PerfRepoTestExecution(parsed.to_xml_string())
+    key = lambda value: (value["metricName"], value["result"])
+    assert sorted(value_dicts(again.get_values()), key=key) == \
+           sorted(value_dicts(texec.get_values()), key=key)
+
+def test_serialize_none_attributes():
+    array = PerfRepoValueArray()
+    array.append(1.0, [("cpu", None), (None, "x")])
+    array.append(2.0, [("cpu", "1")])
+    from_bytes = ElementTree.fromstring(b"<values>" + array.to_xml_bytes() +
+                                        b"</values>")
+    from_elements = ElementTree.Element("values")
+    array.to_xml_elements(from_elements)
+    assert [(elem.tag, elem.attrib) for elem in from_bytes.iter()] == \
+           [(elem.tag, elem.attrib) for elem in from_elements.iter()]
+
+    #the attributes PerfRepoValue.to_xml leaves out as well
+    value = from_bytes.find("value")
+    assert sorted(value.attrib) == ["result"]
+    assert [param.attrib for param in value.iter("parameter")] == \
+           [{"value": "x"}]
+    assert sorted(array.get_value(0).to_xml().attrib) == ["result"]